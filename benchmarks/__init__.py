@@ -0,0 +1,19 @@
+"""
+Benchmark suite for TinyQsim.
+
+Run from the top-level directory of the repository:
+
+    python -m benchmarks                      # All workloads, default sizes
+    python -m benchmarks --quick              # Smallest sizes only
+    python -m benchmarks qft grover -s 8 10   # Selected workloads and sizes
+    python -m benchmarks --output run.json    # Save the results
+    python -m benchmarks --update-baseline    # Store results as the baseline
+
+The results are compared with the stored baseline (if any) and the exit
+status is 1 if any time or memory figure regressed by more than the
+tolerance. Timings depend on the machine, so the baseline should be
+recorded on the machine where the comparison is made.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
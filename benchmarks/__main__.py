@@ -0,0 +1,79 @@
+"""
+Command-line entry point: python -m benchmarks
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks.runner import (HEADER, TOLERANCE, compare, format_row, load_results, measure,
+                               measure_import, save_results)
+from benchmarks.workloads import WORKLOADS
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks.
+    :param argv: command-line arguments (None => sys.argv)
+    :return: exit status (1 if any regression)
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('workloads', nargs='*',
+                        help=f"workloads to run: {', '.join(WORKLOADS)}, import (default: all)")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        help='sizes to run (default: per workload)')
+    parser.add_argument('-q', '--quick', action='store_true',
+                        help='run the smallest default size of each workload')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of timed executions (default: 3)')
+    parser.add_argument('-o', '--output', help='JSON file for the results')
+    parser.add_argument('-b', '--baseline', default=BASELINE,
+                        help='JSON file of baseline results (default: benchmarks/baseline.json)')
+    parser.add_argument('-t', '--tolerance', type=float, default=TOLERANCE,
+                        help=f'allowed fractional regression (default: {TOLERANCE})')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='save the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    names = args.workloads or [*WORKLOADS, 'import']
+    for name in names:
+        if name not in WORKLOADS and name != 'import':
+            parser.error(f'Unknown workload: {name}')
+
+    print(HEADER)
+    print('-' * len(HEADER))
+    results = []
+    for name in names:
+        if name == 'import':
+            results.append(measure_import(repeat=args.repeat))
+            print(format_row(results[-1]), flush=True)
+            continue
+        builder, sizes = WORKLOADS[name]
+        for size in args.sizes or (sizes[:1] if args.quick else sizes):
+            results.append(measure(name, builder, size, args.repeat))
+            print(format_row(results[-1]), flush=True)
+
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not Path(args.baseline).exists():
+        print(f'No baseline: {args.baseline}')
+        return 0
+    regressions = compare(results, load_results(args.baseline), args.tolerance)
+    for r in regressions:
+        print(f'REGRESSION: {r}')
+    if not regressions:
+        print('No regressions')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
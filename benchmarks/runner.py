@@ -0,0 +1,177 @@
+"""
+Measurement of benchmark workloads and comparison with a baseline.
+
+The run time is the best of several executions of the complete circuit,
+including initialization of the state. Peak memory is measured in a
+separate execution with tracemalloc, because tracing slows down the
+interpreter. The maximum RSS is the peak for the whole process so far.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from os import PathLike
+from time import perf_counter
+
+import numpy as np
+
+import tinyqsim
+
+TOLERANCE = 0.25  # Allowed fractional increase before flagging a regression
+MIN_TIME = 1e-3  # Time differences below this (seconds) are never regressions
+METRICS = ('run_s', 'peak_bytes')  # Metrics compared with the baseline
+HEADER = (f"{'workload':<8} {'size':>5} {'qubits':>6} {'gates':>7} {'build ms':>9} "
+          f"{'run ms':>9} {'us/gate':>8} {'gates/s':>9} {'peak MB':>8}")
+
+
+def max_rss() -> int | None:
+    """Return the peak resident set size of this process in bytes.
+    :return: peak RSS, or None if not available on this platform
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(workload: str, builder, size: int, repeat: int = 3) -> dict:
+    """Build and run a workload circuit and record its performance.
+    :param workload: name of workload
+    :param builder: function size -> QCircuit
+    :param size: workload size (usually the number of qubits)
+    :param repeat: number of timed executions
+    :return: dictionary of results
+    """
+    t0 = perf_counter()
+    qc = builder(size)
+    build = perf_counter() - t0
+
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        qc.execute()
+        times.append(perf_counter() - t0)
+    run = min(times)
+
+    tracemalloc.start()
+    qc.execute()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    gates = len(qc._model)
+    return {'workload': workload, 'size': size, 'qubits': qc.n_qubits, 'gates': gates,
+            'build_s': build, 'run_s': run, 'per_gate_s': run / max(gates, 1),
+            'gates_per_s': gates / run if run > 0 else None,
+            'peak_bytes': peak, 'max_rss_bytes': max_rss()}
+
+
+def measure_import(module: str = 'tinyqsim.qcircuit', repeat: int = 5) -> dict:
+    """Measure the time to import a module in a fresh interpreter.
+    The start-up time of the interpreter itself is subtracted.
+    :param module: name of module
+    :param repeat: number of timed imports
+    :return: dictionary of results
+    """
+
+    def best(code):
+        times = []
+        for _ in range(repeat):
+            t0 = perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True)
+            times.append(perf_counter() - t0)
+        return min(times)
+
+    run = max(0.0, best(f'import {module}') - best('pass'))
+    return {'workload': 'import', 'size': 0, 'qubits': 0, 'gates': 0, 'build_s': 0.0,
+            'run_s': run, 'per_gate_s': None, 'gates_per_s': None,
+            'peak_bytes': None, 'max_rss_bytes': None}
+
+
+def environment() -> dict:
+    """Return a description of the environment for the results file.
+    :return: dictionary of environment details
+    """
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'tinyqsim': tinyqsim.__version__, 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine()}
+
+
+def save_results(path: str | PathLike, results: list[dict]) -> None:
+    """Save results to a JSON file.
+    :param path: file path
+    :param results: list of results
+    """
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+def load_results(path: str | PathLike) -> list[dict]:
+    """Load results from a JSON file.
+    :param path: file path
+    :return: list of results
+    """
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(results: list[dict], baseline: list[dict],
+            tolerance: float = TOLERANCE) -> list[str]:
+    """Compare results with a baseline.
+    A metric regresses if it exceeds the baseline by more than the
+    fractional tolerance. Results without a baseline entry are ignored.
+    :param results: list of results
+    :param baseline: list of baseline results
+    :param tolerance: allowed fractional increase
+    :return: list of descriptions of regressions
+    """
+    base = {(r['workload'], r['size']): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r['workload'], r['size']))
+        if b is None:
+            continue
+        for metric in METRICS:
+            new, old = r.get(metric), b.get(metric)
+            if new is None or not old:
+                continue
+            if new > old * (1 + tolerance) and (metric != 'run_s' or new - old > MIN_TIME):
+                regressions.append(f"{r['workload']}({r['size']}) {metric}: "
+                                   f"{old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _fmt(x, scale: float = 1.0) -> str:
+    """Format a number to 3 significant figures.
+    :param x: number (or None)
+    :param scale: scaling factor
+    :return: formatted number, or '-' for None
+    """
+    return '-' if x is None else f'{x * scale:.3g}'
+
+
+def format_row(r: dict) -> str:
+    """Format a result as a row of a text table (see HEADER).
+    :param r: result
+    :return: row
+    """
+    return (f"{r['workload']:<8} {r['size']:>5} {r['qubits']:>6} {r['gates']:>7} "
+            f"{_fmt(r['build_s'], 1e3):>9} {_fmt(r['run_s'], 1e3):>9} "
+            f"{_fmt(r['per_gate_s'], 1e6):>8} {_fmt(r['gates_per_s']):>9} "
+            f"{_fmt(r['peak_bytes'], 1e-6):>8}")
+
+
+def format_table(results: list[dict]) -> str:
+    """Format results as a text table.
+    :param results: list of results
+    :return: table
+    """
+    return '\n'.join([HEADER, '-' * len(HEADER)] + [format_row(r) for r in results])
@@ -0,0 +1,147 @@
+"""
+Benchmark workloads.
+
+Each workload is a function that builds a circuit for a given size. The
+QFT, QPE and Shor circuits come from the examples library and Grover's
+search follows the Grover notebook. Where the library creates the circuit
+itself (QPE and Shor), it is built with auto_exec enabled, so the build
+time includes one execution.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import sys
+from functools import partial
+from math import ceil, gcd, log2
+from pathlib import Path
+
+import numpy as np
+
+from tinyqsim.gates import Z, cu
+from tinyqsim.qcircuit import QCircuit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'examples'))
+from examples_lib import create_qpe_circuit, qft  # noqa: E402
+
+QPE_PHASE = 1 / 3  # Phase of the QPE eigenvalue (not exactly representable)
+SEED = 1234  # Seed for random circuits
+
+
+def qft_circuit(n: int) -> QCircuit:
+    """Quantum Fourier Transform on n qubits.
+    :param n: number of qubits
+    :return: circuit
+    """
+    qc = QCircuit(n, auto_exec=False)
+    qft(qc)
+    return qc
+
+
+def qpe_circuit(n: int) -> QCircuit:
+    """Quantum Phase Estimation of a phase gate, with n-1 control qubits.
+    :param n: number of qubits
+    :return: circuit
+    """
+
+    def unitary(k):
+        return np.diag([1, np.exp(2j * np.pi * QPE_PHASE * k)])
+
+    return create_qpe_circuit(unitary, n - 1, 1)
+
+
+def grover_circuit(n: int) -> QCircuit:
+    """Grover search for one secret n-bit key.
+    :param n: number of qubits
+    :return: circuit
+    """
+    secret = [i % 2 for i in range(n)]
+    zeros = [i for i, s in enumerate(secret) if s == 0]
+    mcz = cu(Z, n - 1)
+    qubits = list(range(n))
+    qc = QCircuit(n, auto_exec=False)
+    qc.h(qubits)
+    for _ in range(int(np.sqrt(2 ** n) * np.pi / 4)):
+        qc.x(zeros)  # Oracle
+        qc.u(mcz, 'MCZ', *qubits)
+        qc.x(zeros)
+        qc.h(qubits)  # Diffusion
+        qc.x(qubits)
+        qc.u(mcz, 'MCZ', *qubits)
+        qc.x(qubits)
+        qc.h(qubits)
+    return qc
+
+
+def _modexp_unitary(a: int, N: int, t: int, k: int) -> np.ndarray:
+    """Unitary for modular exponentiation: |i> -> |a^k i mod N>.
+    :param a: base, coprime with N
+    :param N: modulus
+    :param t: number of bits required to represent N
+    :param k: exponent
+    :return: unitary matrix
+    """
+    m = np.eye(2 ** t, dtype=int)
+    m[[(a ** k * i) % N for i in range(N)]] = m[range(N)]
+    return m
+
+
+def shor_circuit(N: int) -> QCircuit:
+    """Order-finding circuit of Shor's algorithm for modulus N.
+    The size is the number to be factored, not the number of qubits.
+    :param N: number to be factored
+    :return: circuit
+    """
+    a = next(a for a in range(2, N) if gcd(a, N) == 1)
+    t = N.bit_length()
+    m = ceil(2 * log2(N)) + 1
+    return create_qpe_circuit(partial(_modexp_unitary, a, N, t), m, t, eigenvec=1)
+
+
+def random_circuit(n: int) -> QCircuit:
+    """Random circuit of n layers of single-qubit gates and CX gates.
+    Each layer has a random 1-qubit gate on every qubit, followed by CX
+    gates on random disjoint pairs of qubits.
+    :param n: number of qubits
+    :return: circuit
+    """
+    rng = np.random.default_rng(SEED)
+    names, qubits, angles = [], [], []
+    for _ in range(n):
+        names += rng.choice(['H', 'T', 'S', 'RX', 'RZ'], n).tolist()
+        qubits += [[q, -1] for q in range(n)]
+        angles += rng.uniform(0, 2 * np.pi, n).tolist()
+        perm = rng.permutation(n)
+        names += ['CX'] * (n // 2)
+        qubits += perm[:n // 2 * 2].reshape(-1, 2).tolist()
+        angles += [0.0] * (n // 2)
+    qc = QCircuit(n, auto_exec=False)
+    qc.extend(names, qubits, angles)
+    return qc
+
+
+def sparse_circuit(n: int) -> QCircuit:
+    """Permutation-heavy circuit on the sparse backend.
+    The state never has more than two nonzero amplitudes.
+    :param n: number of qubits
+    :return: circuit
+    """
+    qc = QCircuit(n, auto_exec=False, backend='sparse')
+    qc.x(list(range(0, n, 2)))
+    for i in range(n - 1):
+        qc.cx(i, i + 1)
+        qc.ccx(i, i + 1, (i + 2) % n)
+        qc.swap(i, n - 1 - i)
+    qc.h(0)
+    return qc
+
+
+# Workload name -> (builder, default sizes)
+WORKLOADS = {
+    'qft': (qft_circuit, (8, 12, 16, 20)),
+    'qpe': (qpe_circuit, (8, 12, 16, 20)),
+    'grover': (grover_circuit, (4, 6, 8, 10)),
+    'shor': (shor_circuit, (15, 21, 35)),
+    'random': (random_circuit, (8, 12, 16, 20)),
+    'sparse': (sparse_circuit, (20, 40, 60)),
+}
@@ -0,0 +1,57 @@
+"""
+Pytest unit tests for the benchmarks package.
+These check the mechanics of the suite, not the timings.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import json
+
+import pytest
+
+from benchmarks.__main__ import main
+from benchmarks.runner import compare, format_table, measure
+from benchmarks.workloads import WORKLOADS
+
+
+def _result(workload, size, run_s, peak_bytes=1000):
+    return {'workload': workload, 'size': size, 'run_s': run_s, 'peak_bytes': peak_bytes}
+
+
+@pytest.mark.parametrize('name', list(WORKLOADS))
+def test_workloads(name):
+    builder, sizes = WORKLOADS[name]
+    r = measure(name, builder, sizes[0], repeat=1)
+    assert r['gates'] > 0
+    assert r['qubits'] == (sizes[0] if name != 'shor' else 13)
+    assert r['run_s'] > 0 and r['peak_bytes'] > 0
+    assert len(format_table([r]).splitlines()) == 3
+
+
+def test_compare():
+    baseline = [_result('qft', 8, 0.100), _result('qft', 12, 0.0001)]
+    assert compare([_result('qft', 8, 0.110), _result('qft', 16, 9.0)], baseline) == []
+    assert len(compare([_result('qft', 8, 0.200)], baseline)) == 1
+    assert len(compare([_result('qft', 8, 0.100, 2000)], baseline)) == 1
+    assert compare([_result('qft', 12, 0.0005)], baseline) == []  # Below MIN_TIME
+    assert compare([_result('qft', 8, 0.200)], baseline, tolerance=2) == []
+
+
+def test_main(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    output = tmp_path / 'out.json'
+    args = ['qft', '-s', '4', '-r', '1', '-b', str(baseline)]
+    assert main(args + ['--update-baseline']) == 0
+    assert main(args + ['-o', str(output)]) in (0, 1)
+    results = json.loads(output.read_text())['results']
+    assert [(r['workload'], r['size']) for r in results] == [('qft', 4)]
+
+    # Force a regression by shrinking the baseline
+    data = json.loads(baseline.read_text())
+    data['results'][0]['peak_bytes'] = 1
+    baseline.write_text(json.dumps(data))
+    assert main(args) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main(['nosuch'])
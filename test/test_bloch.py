@@ -10,7 +10,13 @@ from math import sqrt, pi
 import numpy as np
 from numpy.testing import (assert_array_almost_equal)
 
-from tinyqsim.bloch import (bloch_to_qubit, qubit_to_bloch)
+import matplotlib
+import matplotlib.pyplot as plt
+
+from tinyqsim.bloch import (bloch_to_qubit, qubit_to_bloch, density_to_bloch, bloch_vectors,
+                            plot_bloch_vectors, _sphere_mesh)
+
+matplotlib.use('Agg')
 
 DECIMAL = 15  # Require precision (decimal places)
 ENABLE_STATS_TESTS = True  # Enable stochastic tests that may occasionally fail
@@ -59,3 +65,30 @@ def test_qubit_to_bloch():
                               (pi / 2, pi / 2), decimal=DECIMAL)
     assert_array_almost_equal(qubit_to_bloch(KETL),
                               (3 * pi / 2, pi / 2), decimal=DECIMAL)
+
+
+def test_density_to_bloch():
+    """ Test density_to_bloch."""
+    for ket, v in [(KET0, [0, 0, 1]), (KET1, [0, 0, -1]), (KETP, [1, 0, 0]),
+                   (KETM, [-1, 0, 0]), (KETR, [0, 1, 0]), (KETL, [0, -1, 0])]:
+        assert_array_almost_equal(density_to_bloch(np.outer(ket, ket.conj())), v, decimal=DECIMAL)
+    assert_array_almost_equal(density_to_bloch(np.eye(2) / 2), [0, 0, 0], decimal=DECIMAL)
+
+
+def test_bloch_vectors():
+    """ Test bloch_vectors of product and entangled states."""
+    state = np.kron(np.kron(KETR, KET1), KETM)
+    assert_array_almost_equal(bloch_vectors(state), [[0, 1, 0], [0, 0, -1], [-1, 0, 0]],
+                              decimal=DECIMAL)
+    assert_array_almost_equal(bloch_vectors(state, [2, 0]), [[-1, 0, 0], [0, 1, 0]],
+                              decimal=DECIMAL)
+    bell = np.array([1, 0, 0, 1]) * RT2I
+    assert_array_almost_equal(bloch_vectors(bell), np.zeros((2, 3)), decimal=DECIMAL)
+
+
+def test_plot_bloch_vectors():
+    """ Test that the spheres of a grid share one mesh."""
+    plot_bloch_vectors(np.eye(3), labels=['a', 'b', 'c'], ncols=2, show=False)
+    assert len(plt.gcf().axes) == 3
+    assert _sphere_mesh() is _sphere_mesh()
+    plt.close('all')
@@ -0,0 +1,54 @@
+"""
+Pytest unit tests for compiler module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import pi
+
+from numpy.testing import assert_array_almost_equal
+
+from tinyqsim.compiler import compile_items
+from tinyqsim.gates import H, S, T
+from tinyqsim.model import Model
+from tinyqsim.simulator import Simulator
+
+
+def run(nqubits, items):
+    sim = Simulator(nqubits)
+    sim.run(items)
+    return sim.state_vector
+
+
+def test_fuse():
+    m = Model(2)
+    m.add_gate('H', [0])
+    m.add_gate('T', [0])
+    m.add_gate('X', [1])
+    m.add_gate('S', [0])
+    m.add_gate('CX', [0, 1], {'controls': 1})
+    m.add_gate('RZ', [1], {'args': pi / 3, 'label': 'pi/3'})
+    items = compile_items(m.items)
+    assert [name for name, _, _ in items] == ['U', 'X', 'CX', 'RZ']
+    assert_array_almost_equal(items[0][2]['unitary'], S @ T @ H)
+    assert_array_almost_equal(run(2, items), run(2, m.items))
+
+
+def test_identity_dropped():
+    m = Model(1)
+    m.add_gate('H', [0])
+    m.add_gate('H', [0])
+    assert compile_items(m.items) == []
+
+
+def test_measure_breaks_run():
+    m = Model(2)
+    m.add_gate('X', [0])
+    m.add_gate('X', [1])
+    m.add_gate('measure', [0])
+    m.add_gate('X', [0])
+    m.add_gate('X', [1])
+    m.add_gate('barrier', [0, 1], {'label': None})
+    items = compile_items(m.items)
+    assert [(name, qs) for name, qs, _ in items] == [('X', [0]), ('measure', [0]), ('X', [0])]
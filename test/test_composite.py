@@ -0,0 +1,104 @@
+"""
+Pytest unit tests for composite module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import pi
+
+import pytest
+from numpy.testing import assert_allclose
+
+from tinyqsim import utils
+from tinyqsim.composite import CACHE, UnitaryCache, structural_hash
+from tinyqsim.qcircuit import QCircuit
+
+PI = '\u03C0'  # PI unicode
+
+
+def qft(qc, n: int, start: int = 0):
+    """ N-qubit QFT starting at qubit index 'start'."""
+    for i in range(n):
+        j = i + start
+        qc.h(j)
+        for k in range(1, n - i):
+            qc.cp(pi / 2 ** k, f'{PI}/{2 ** k}', j, j + k)
+    for i in range(n // 2):  # Reverse order of qubits
+        qc.swap(start + i, start + n - i - 1)
+
+
+def qft_circuit(n: int) -> QCircuit:
+    qc = QCircuit(n, auto_exec=False)
+    qft(qc, n)
+    return qc
+
+
+def test_structural_hash():
+    h1 = structural_hash(qft_circuit(3)._model)
+    assert structural_hash(qft_circuit(3)._model) == h1
+    assert structural_hash(qft_circuit(4)._model) != h1
+
+    qc1 = QCircuit(1, auto_exec=False)
+    qc1.p(pi / 3, 'a', 0)
+    qc2 = QCircuit(1, auto_exec=False)
+    qc2.p(pi / 3, 'b', 0)  # Labels are ignored
+    qc3 = QCircuit(1, auto_exec=False)
+    qc3.p(pi / 4, 'a', 0)
+    assert structural_hash(qc1._model) == structural_hash(qc2._model)
+    assert structural_hash(qc1._model) != structural_hash(qc3._model)
+
+
+def test_composite_matches_expansion():
+    qc1 = QCircuit(5, init='random')
+    sv = qc1.state_vector
+    qc1.composite(qft_circuit(3), 'QFT', 1, 2, 3)
+    qc1.composite(qft_circuit(3), 'QFT', 4, 0, 2)
+
+    qc2 = QCircuit(5)
+    qc2.state_vector = sv
+    qft(qc2, 3, 1)
+    qc3 = QCircuit(5)
+    qc3.state_vector = qc2.state_vector
+    qc3.u(qft_circuit(3).to_unitary(), 'QFT', 4, 0, 2)
+    assert_allclose(qc1.state_vector, qc3.state_vector, atol=1e-12)
+
+
+def test_cache_hits():
+    CACHE.clear()
+    qc = QCircuit(4)
+    for _ in range(5):
+        qc.composite(qft_circuit(2), 'QFT', 0, 3)
+    assert CACHE.misses == 1
+    assert CACHE.hits == 4
+
+
+def test_lru_eviction():
+    cache = UnitaryCache(maxsize=2)
+    m2, m3, m4 = (qft_circuit(n)._model for n in (2, 3, 4))
+    cache.unitary(m2)
+    cache.unitary(m3)
+    cache.unitary(m2)  # m2 is now most recently used
+    cache.unitary(m4)  # Evicts m3
+    assert len(cache) == 2
+    cache.unitary(m2)
+    assert cache.hits == 2
+    cache.unitary(m3)
+    assert cache.misses == 4
+
+
+def test_wrong_qubits():
+    qc = QCircuit(3)
+    with pytest.raises(ValueError):
+        qc.composite(qft_circuit(2), 'QFT', 0)
+
+
+def test_cached_unitary_checked_once(monkeypatch):
+    calls = []
+    is_unitary = utils.is_unitary
+    monkeypatch.setattr(utils, 'is_unitary', lambda u: calls.append(1) or is_unitary(u))
+    CACHE.clear()
+    qc = QCircuit(3)
+    for _ in range(3):
+        qc.composite(qft_circuit(2), 'QFT', 0, 2)
+    assert len(calls) == 1
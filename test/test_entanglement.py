@@ -0,0 +1,83 @@
+"""
+Pytest unit tests for entanglement module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import sqrt
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from pytest import approx
+
+from tinyqsim.entanglement import (schmidt_values, entropy, entanglement_entropy,
+                                   cut_schmidt_values, cut_entropies)
+from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_state, state_to_tensor
+
+BELL = np.array([1, 0, 0, 1]) / sqrt(2)
+KET0 = np.array([1, 0])
+KETP = np.array([1, 1]) / sqrt(2)
+
+
+def _svd_values(state, a):
+    nq = len(state).bit_length() - 1
+    b = [q for q in range(nq) if q not in a]
+    m = np.transpose(state_to_tensor(state), a + b).reshape(2 ** len(a), -1)
+    return np.linalg.svd(m, compute_uv=False)
+
+
+def test_schmidt_values():
+    state = np.kron(np.kron(BELL, KETP), KET0)  # Qubits 0, 1 entangled
+    assert_allclose(schmidt_values(state, [0]), [1 / sqrt(2)] * 2)
+    assert_allclose(schmidt_values(state, [2, 3]), [1, 0, 0, 0], atol=1e-8)
+    a = random_state(5)
+    for part in ([0], [4, 1], [0, 2, 3], [1, 2, 3, 4]):
+        assert_allclose(schmidt_values(a, part), _svd_values(a, part), atol=1e-7)
+        assert_allclose(schmidt_values(a, part, method='svd'), _svd_values(a, part), atol=1e-14)
+    with pytest.raises(ValueError):
+        schmidt_values(a, [0], method='qr')
+
+
+def test_entropy():
+    assert entropy(np.array([1, 0])) == 0
+    assert entropy(np.ones(4) / 2) == approx(2)
+    assert entropy(np.ones(4) / 2, base=np.e) == approx(np.log(4))
+
+
+def test_entanglement_entropy():
+    state = np.kron(BELL, BELL)
+    assert entanglement_entropy(state, [0]) == approx(1)
+    assert entanglement_entropy(state, [0, 2]) == approx(2)
+    assert entanglement_entropy(state, [0, 1]) == approx(0, abs=1e-7)
+    assert entanglement_entropy(state, [0, 2], method='svd') == approx(2)
+
+
+@pytest.mark.parametrize('nq', [1, 2, 5, 6])
+def test_cut_schmidt_values(nq):
+    a = random_state(nq)
+    values = cut_schmidt_values(a)
+    assert len(values) == nq - 1
+    for k in range(1, nq):
+        assert_allclose(values[k - 1], _svd_values(a, list(range(k))), atol=1e-7)
+
+
+def test_cut_entropies():
+    ghz = np.zeros(2 ** 6)
+    ghz[[0, -1]] = 1 / sqrt(2)
+    assert_allclose(cut_entropies(ghz), np.ones(5))
+    product = np.kron(np.kron(BELL, KETP), BELL)
+    assert_allclose(cut_entropies(product), [1, 0, 0, 1], atol=1e-7)
+
+
+def test_qcircuit_entanglement():
+    qc = QCircuit(4)
+    qc.h(0)
+    qc.cx(0, 2)
+    qc.x(3)
+    assert qc.entanglement_entropy([0]) == approx(1)
+    assert qc.entanglement_entropy([0, 2]) == approx(0, abs=1e-7)
+    assert_allclose(qc.entanglement_entropy(), [1, 1, 0], atol=1e-7)
+    assert_allclose(qc.schmidt_values([2]), [1 / sqrt(2)] * 2)
@@ -8,7 +8,7 @@ Copyright (c) 2024 Jon Brumfitt
 import numpy as np
 from numpy.testing import (assert_equal)
 
-from tinyqsim.format import format_float, format_complex, state_kets, latex_array
+from tinyqsim.format import format_float, format_complex, state_kets, latex_array, format_table
 
 RANGLE = '\u27E9'  # Unicode right angle-bracket
 
@@ -242,3 +242,26 @@ def test_latex_array():
     a = np.array([[1.2, 3.4], [5.6, 7.8]])
     ltx = latex_array(a)
     assert ltx == '\\begin{bmatrix}1.2&3.4\\\\5.6&7.8 \\end{bmatrix}'
+
+
+def test_format_table():
+    """Test format_table with and without zeros."""
+    a = np.array([0.5, 0, 0, 0.25, 0, 0, 0, 0.25])
+    s = format_table(a, decimals=2, edge=2).replace(RANGLE, '>')
+    assert s == '|000>  0.5\n|011>  0.25\n|111>  0.25'
+    s = format_table(a, decimals=2, edge=1).replace(RANGLE, '>')
+    assert s == '|000>  0.5\n...\n|111>  0.25'
+    s = format_table(a, decimals=2, include_zeros=True, edge=2).replace(RANGLE, '>')
+    assert s == '|000>  0.5\n|001>  0\n...\n|110>  0\n|111>  0.25'
+    s = format_table(-a, decimals=2, edge=0).replace(RANGLE, '>')
+    assert s == '|000> -0.5\n|011> -0.25\n|111> -0.25'
+
+
+def test_format_large_state():
+    """Test formatting a GHZ state with many qubits."""
+    psi = np.zeros(2 ** 20)
+    psi[0] = psi[-1] = np.sqrt(0.5)
+    s = state_kets(psi, decimals=3).replace(RANGLE, '>')
+    assert s == f'0.707|{"0" * 20}> + 0.707|{"1" * 20}>'
+    s = format_table(psi, decimals=3, include_zeros=True, edge=1).replace(RANGLE, '>')
+    assert s == f'|{"0" * 20}>  0.707\n...\n|{"1" * 20}>  0.707'
@@ -138,3 +138,37 @@ def test_cu():
     cu_aux(2)
     cu_aux(4)
     cu_aux(8)
+
+
+def test_gate_info():
+    info = gate_info('CX')
+    assert_array_equal(info.matrix, CX)
+    assert info.tensor.shape == (2, 2, 2, 2)
+    assert info.kind == 'permutation'
+    assert info.controls == 1
+    assert info.clifford
+    assert gate_info('T').kind == 'diagonal'
+    assert not gate_info('T').clifford
+    assert gate_info('H').kind == 'general'
+    assert gate_info('CH').kind == 'controlled'
+
+
+def test_gate_info_param():
+    assert_array_almost_equal(gate_info('RY', pi / 3).matrix, RY(pi / 3))
+    assert gate_info('RZ', pi / 2).clifford
+    assert not gate_info('RZ', pi / 3).clifford
+    assert gate_info('CP', pi).clifford
+    assert not gate_info('CP', pi / 2).clifford
+
+
+def test_gate_info_cached():
+    assert gate_info('H') is gate_info('H')
+    assert gate_info('P', 0.25) is gate_info('P', 0.25)
+    assert gate_info('P', 0.25) is not gate_info('P', 0.5)
+
+
+def test_gate_info_read_only():
+    info = gate_info('X')
+    assert not info.matrix.flags.writeable
+    assert not info.tensor.flags.writeable
+    assert info.matrix.flags.c_contiguous
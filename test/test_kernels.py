@@ -0,0 +1,60 @@
+"""
+Pytest unit tests for kernels module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from tinyqsim.gates import CX, CCX, CP, CSWAP, H, RX, SWAP, T, cu, matrix_info
+from tinyqsim.kernels import (apply_gate, apply_general, gate_kind, n_controls)
+from tinyqsim.quantum import random_state, random_unitary, state_to_tensor
+
+U2 = random_unitary(2)
+
+
+def test_gate_kind():
+    assert gate_kind(T) == 'diagonal'
+    assert gate_kind(CP(0.3)) == 'diagonal'
+    assert gate_kind(CX) == 'permutation'
+    assert gate_kind(SWAP) == 'permutation'
+    assert gate_kind(cu(H)) == 'controlled'
+    assert gate_kind(H) == 'general'
+    assert gate_kind(U2) == 'general'
+
+
+def test_n_controls():
+    assert n_controls(H) == 0
+    assert n_controls(CX) == 1
+    assert n_controls(CCX) == 2
+    assert n_controls(CSWAP) == 1
+    assert n_controls(cu(cu(U2))) == 2
+
+
+def test_kernels_match_general():
+    ts = state_to_tensor(random_state(5))
+    cases = [(T, [3]), (CP(0.7), [4, 1]), (CX, [2, 0]), (SWAP, [1, 3]),
+             (CCX, [4, 0, 2]), (CSWAP, [3, 4, 0]), (cu(H), [1, 2]),
+             (cu(U2), [0, 4, 2]), (cu(cu(RX(0.4))), [2, 0, 3]), (U2, [3, 1])]
+    for u, qubits in cases:
+        assert_allclose(apply_gate(ts, u, qubits), apply_general(ts, u, qubits),
+                        atol=1e-12, err_msg=f'qubits {qubits}')
+
+
+def test_batch_axis():
+    batch = np.stack([random_state(3) for _ in range(4)], axis=-1)
+    ts = batch.reshape([2, 2, 2, 4])
+    for u, qubits in [(CX, [2, 0]), (T, [1]), (cu(H), [0, 2]), (U2, [1, 2])]:
+        result = apply_gate(ts, u, qubits)
+        for i in range(4):
+            expected = apply_general(ts[..., i], u, qubits)
+            assert_allclose(result[..., i], expected, atol=1e-12)
+
+
+def test_precomputed_tensor():
+    ts = state_to_tensor(random_state(3))
+    info = matrix_info(U2)
+    assert_allclose(apply_gate(ts, info.matrix, [2, 0], info.kind, info.tensor),
+                    apply_general(ts, U2, [2, 0]), atol=1e-12)
@@ -5,6 +5,10 @@ Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
 from tinyqsim.model import Model
 
 
@@ -14,3 +18,50 @@ def test_apply_tensor():
     m.add_gate('Y', [2], {'label': 'def'})
     assert m.items[1] == ('Y', [2], {'label': 'def'})
     assert len(m.items) == 2
+
+
+def test_params():
+    m = Model(3)
+    m.add_gate('measure', [0, 1])
+    m.add_gate('barrier', [0, 2], {'label': None})
+    m.add_gate('CP', [1, 0], {'label': 'pi/2', 'args': np.pi / 2, 'controls': 1})
+    m.add_gate('Z', [1], {'other': [1, 2]})
+    assert list(m.items) == [('measure', [0, 1], {}),
+                             ('barrier', [0, 2], {'label': None}),
+                             ('CP', [1, 0], {'label': 'pi/2', 'args': np.pi / 2, 'controls': 1}),
+                             ('Z', [1], {'other': [1, 2]})]
+
+
+def test_items_view():
+    m = Model(2)
+    for i in range(100):
+        m.add_gate('P', [i % 2], {'args': float(i)})
+    items = m.items
+    assert len(items) == 100
+    assert items[-1] == ('P', [1], {'args': 99.0})
+    assert items[10:13] == [('P', [0], {'args': 10.0}), ('P', [1], {'args': 11.0}),
+                            ('P', [0], {'args': 12.0})]
+    assert items[90::5] == [('P', [0], {'args': 90.0}), ('P', [1], {'args': 95.0})]
+    assert items[5:2] == []
+    with pytest.raises(IndexError):
+        _ = items[100]
+
+
+def test_unitary_pool():
+    m = Model(2)
+    u = np.array([[0, 1], [1, 0]])
+    for _ in range(1000):
+        m.add_gate('U', [0], {'label': 'V', 'unitary': u})
+    m.add_gate('U', [1], {'label': 'W', 'unitary': np.eye(2)})
+    assert len(m._matrix_pool) == 2
+    assert len(m._label_pool) == 2
+    _, _, params = m.items[0]
+    assert_array_equal(params['unitary'], u)
+    assert not params['unitary'].flags.writeable
+
+
+def test_compact():
+    m = Model(10)
+    for i in range(10000):
+        m.add_gate('CX', [i % 10, (i + 1) % 10], {'controls': 1})
+    assert m.nbytes < 100 * len(m)
@@ -0,0 +1,90 @@
+"""
+Pytest unit tests for plotting module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from tinyqsim.plotting import _envelope, _labeler, _select, plot_bars
+from tinyqsim.qcircuit import QCircuit
+
+matplotlib.use('Agg')
+
+
+def test_labeler():
+    assert _labeler(3)(5) == '101'
+    assert _labeler(['a', 'b'])(1) == 'b'
+
+
+def test_select_bars():
+    labels, data = _select(2, [np.arange(4)], 'bars', 2, 2, 'sum')
+    assert labels == ['00', '01', '10', '11']
+    assert_array_equal(data[0], np.arange(4))
+
+
+def test_select_top():
+    d = np.array([0.1, 0.4, 0.0, 0.5])
+    labels, data = _select(2, [d, -d], 'top', 2, 2, 'sum')
+    assert labels == ['11', '01']
+    assert_allclose(data[0], [0.5, 0.4])
+    assert_allclose(data[1], [-0.5, -0.4])
+
+
+def test_select_bins():
+    d = np.arange(8.0)
+    labels, data = _select(3, [d], 'bins', 0, 5, 'sum')  # Rounded down to 4 bins
+    assert labels == ['00…', '01…', '10…', '11…']
+    assert_allclose(data[0], [1, 5, 9, 13])
+    _, data = _select(3, [d], 'bins', 0, 4, 'mean')
+    assert_allclose(data[0], [0.5, 2.5, 4.5, 6.5])
+
+
+def test_select_invalid():
+    with pytest.raises(ValueError):
+        _select(1, [np.zeros(2)], 'pie', 1, 1, 'sum')
+
+
+def test_envelope():
+    d = np.zeros(16)
+    d[5] = 1
+    d[10] = -1
+    values, edges, baseline = _envelope(d, 4)
+    assert_allclose(values, [0, 1, 0, 0])
+    assert_allclose(baseline, [0, 0, -1, 0])
+    assert_allclose(edges, [-0.5, 3.5, 7.5, 11.5, 15.5])
+    values, edges, baseline = _envelope(d, 16)
+    assert values is d and baseline == 0
+
+
+@pytest.mark.parametrize('style, n_bars', [('top', 4), ('bins', 8)])
+def test_plot_bars_styles(style, n_bars):
+    plot_bars(6, [np.ones(64)], show=False, style=style, k=4, bins=8)
+    ax = plt.gcf().axes[0]
+    assert len(ax.patches) == n_bars
+    assert len(ax.get_xticks()) == n_bars
+    plt.close('all')
+
+
+def test_plot_bars_line():
+    plot_bars(12, [np.ones(4096)], show=False, style='line')
+    ax = plt.gcf().axes[0]
+    assert len(ax.patches) == 1
+    assert len(ax.get_xticks()) == 16
+    plt.close('all')
+
+
+def test_plot_methods():
+    qc = QCircuit(4)
+    qc.h([0, 1, 2, 3])
+    for style in ('bars', 'top', 'bins', 'line'):
+        qc.plot_probabilities(show=False, style=style, k=4, bins=4)
+        qc.plot_real_imag(show=False, style=style, k=4, bins=4)
+        qc.plot_mag_phase(show=False, style=style, k=4, bins=4)
+        qc.plot_counts(0, 1, show=False, style=style, k=4, bins=4, runs=100)
+        plt.close('all')
@@ -0,0 +1,111 @@
+"""
+Pytest unit tests for profiler module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import json
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from tinyqsim.gates import CX
+from tinyqsim.profiler import Profiler
+from tinyqsim.qcircuit import QCircuit
+
+
+def _circuit(**kwargs) -> QCircuit:
+    qc = QCircuit(3, **kwargs)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.ccx(0, 1, 2)
+    qc.t(2)
+    qc.u(CX, 'U', 1, 2)
+    return qc
+
+
+def test_record():
+    p = Profiler()
+    with p.record('H', [0], 'general', 64):
+        pass
+    with p.phase('initialize'):
+        pass
+    assert len(p) == 2
+    summary = p.summary()
+    assert summary['H']['count'] == 1
+    assert summary['H']['bytes'] == 64
+    assert sum(s['fraction'] for s in summary.values()) == pytest.approx(1)
+    with pytest.raises(ValueError):
+        p.summary(by='qubit')
+    p.clear()
+    assert len(p) == 0
+
+
+def test_set_profiler():
+    qc = _circuit()
+    p = Profiler()
+    qc.set_profiler(p)
+    qc.execute()
+    gates = [e for e in p.chrome_trace()['traceEvents'] if e['cat'] == 'gate']
+    assert [e['name'] for e in gates] == ['H', 'CX', 'CCX', 'T', 'U']
+    assert [e['args']['kernel'] for e in gates] == \
+           ['general', 'permutation', 'permutation', 'diagonal', 'permutation']
+    assert p.summary(by='kernel')['permutation']['count'] == 3
+    assert gates[1]['args']['bytes'] == 8 * 16  # Complex state of 3 qubits
+
+    # No further records once disabled
+    qc.set_profiler(None)
+    n = len(p)
+    qc.execute()
+    qc.x(0)
+    assert len(p) == n
+
+
+def test_profile_state_unchanged():
+    qc = _circuit()
+    state = qc.state_vector.copy()
+    table = qc.profile()
+    lines = table.splitlines()
+    assert lines[0].split()[0] == 'name'
+    assert {line.split()[0] for line in lines[2:]} == {'H', 'CX', 'CCX', 'T', 'U', 'initialize'}
+    assert_allclose(qc.state_vector, state)
+    assert qc._profiler is None
+
+
+def test_controlled_bytes():
+    qc = QCircuit(3)
+    qc.h(0)
+    qc.ch(0, 1)
+    p = Profiler()
+    qc.set_profiler(p)
+    qc.execute()
+    event = p.chrome_trace()['traceEvents'][-1]
+    assert event['args'] == {'qubits': [0, 1], 'kernel': 'controlled', 'bytes': 8 * 16 // 2}
+
+
+def test_profile_sparse_and_lazy():
+    qc = QCircuit(10, backend='sparse')
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.ccx(0, 1, 2)
+    table = qc.profile(by='kernel')
+    assert 'sparse-permutation' in table and 'sparse-general' in table
+    qc = _circuit(lazy=True)
+    p = Profiler()
+    qc.set_profiler(p)
+    qc.probability_array()
+    assert 'compile' in p.summary()
+
+
+def test_chrome_trace(tmp_path):
+    path = tmp_path / 'trace.json'
+    qc = _circuit()
+    qc.profile(trace=path)
+    trace = json.loads(path.read_text())
+    events = trace['traceEvents']
+    assert len(events) == 6
+    for e in events:
+        assert e['ph'] == 'X' and e['dur'] >= 0
+    assert np.all(np.diff([e['ts'] for e in events]) >= 0)
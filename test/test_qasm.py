@@ -5,9 +5,18 @@ Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
-from math import pi
+from cmath import exp
+from io import StringIO
+from math import pi, sin, cos
 
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from tinyqsim import qasm
+from tinyqsim.gates import CCX, SWAP
 from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_unitary
 
 PI = '\u03C0'  # Unicode pi
 
@@ -93,3 +102,151 @@ y q[1];
 z q[2];
 """
     assert qasm == exp
+
+
+def test_from_qasm():
+    text = """OPENQASM 3;
+include "stdgates.inc";
+// Comment
+qubit[2] q;
+qubit r;  /* block
+   comment */ bit[3] c;
+h q[0]; cx q[0], q[1];
+cp(pi/2) q[1],r;
+rx(-2*pi/3 + 0.5) r[0];
+ry(0.25) q[0];
+barrier q, r;
+c[0] = measure q[0];
+measure r -> c[2];
+reset q[1];
+ccx q[0],q[1],
+    r;
+"""
+    model = qasm.from_qasm(text.splitlines(keepends=True))
+    assert model.n_qubits == 3
+    assert list(model.items) == [
+        ('H', [0], {}),
+        ('CX', [0, 1], {'controls': 1}),
+        ('CP', [1, 2], {'label': f'{PI}/2', 'args': pi / 2, 'controls': 1}),
+        ('RX', [2], {'label': f'-2*{PI}/3+0.5', 'args': -2 * pi / 3 + 0.5}),
+        ('RY', [0], {'label': '0.25', 'args': 0.25}),
+        ('barrier', [0, 2], {'label': None}),
+        ('measure', [0], {}),
+        ('measure', [2], {}),
+        ('reset', [1], {}),
+        ('CCX', [0, 1, 2], {'controls': 2}),
+    ]
+
+
+def test_from_qasm_comment_order():
+    model = qasm.from_qasm(['OPENQASM 3;\n', 'qubit[2] q;\n', 'h q[0]; // see /* note\n',
+                            'cx q[0], q[1]; /* a // b */ x q[1];\n'])
+    assert [name for name, _, _ in model.items] == ['H', 'CX', 'X']
+    with pytest.raises(ValueError, match='Unterminated comment'):
+        qasm.from_qasm(['OPENQASM 3;\n', 'qubit[2] q;\n', 'h q[0]; /* note\n', 'x q[1];\n'])
+
+
+def test_from_qasm_lines_without_newlines():
+    model = qasm.from_qasm(['OPENQASM 3;', 'qubit[2] q;', 'reset', 'q[0]; cx q[0],', 'q[1];'])
+    assert list(model.items) == [('reset', [0], {}), ('CX', [0, 1], {'controls': 1})]
+
+
+def test_from_qasm_roundtrip(tmp_path):
+    qc = QCircuit(4)
+    qc.ccx(0, 1, 2)
+    qc.cp(2 * pi / 5, f'2{PI}/5', 2, 3)
+    qc.sdg(1)
+    qc.swap(2, 3)
+    qc.crz(2 * pi / 3, f'2{PI}/3', 0, 1)
+    path = tmp_path / 'circuit.qasm'
+    path.write_text(qc.to_qasm())
+    qc2 = QCircuit.from_qasm(path)
+    assert qc2.to_qasm() == qc.to_qasm()
+    assert_allclose(qc2.state_vector, qc.state_vector)
+
+
+def test_from_qasm_chunks(monkeypatch):
+    monkeypatch.setattr(qasm, 'CHUNK', 4)
+    lines = ['qreg q[2];\n'] + ['x q[0];\n', 'cx q[0],q[1];\n'] * 5 + ['measure q;\n']
+    model = qasm.from_qasm(lines)
+    assert len(model.items) == 11
+    assert model.items[9] == ('CX', [0, 1], {'controls': 1})
+    assert model.items[10] == ('measure', [0, 1], {})
+
+
+def test_from_qasm_errors():
+    for text in ['qreg q[2]; x q[2];', 'qreg q[2]; cx q[0];', 'qreg q[2]; cx q[1],q[1];',
+                 'qreg q[2]; rx(__import__) q[0];', 'qreg q[2]; foo q[0];',
+                 'qreg q[2]; x q[0]', 'x q[0];', 'qreg q[2]; rx q[0];']:
+        with pytest.raises(ValueError):
+            qasm.from_qasm([text])
+
+
+def test_to_qasm_all_operations():
+    qc = QCircuit(3)
+    qc.i(0)
+    qc.cs(0, 1)
+    qc.ct(1, 2)
+    qc.barrier()
+    qc.measure(0, 2)
+    qc.reset(1)
+    qasm_text = qc.to_qasm()
+
+    exp = """OPENQASM 3;
+include "stdgates.inc";
+qreg q[3];
+bit[3] c;
+id q[0];
+ctrl @ s q[0],q[1];
+ctrl @ t q[1],q[2];
+barrier q;
+c[0] = measure q[0];
+c[2] = measure q[2];
+reset q[1];
+"""
+    assert qasm_text == exp
+    qc2 = QCircuit.from_qasm(qasm_text.splitlines(keepends=True))
+    assert qc2.to_qasm() == qasm_text
+
+
+def test_to_qasm_unitary():
+    v = random_unitary(2)
+    qc = QCircuit(3)
+    qc.u(v, 'V', 0, 2)
+    qc.u(v, 'V', 1, 0)
+    lines = qc.to_qasm().splitlines()
+    assert lines[3] == 'gate u0 a0, a1 {'
+    assert lines.count('gate u0 a0, a1 {') == 1
+    assert lines[-2:] == ['u0 q[0],q[2];', 'u0 q[1],q[0];']
+
+
+def test_decompose_unitary():
+    for u in [random_unitary(1), random_unitary(2), random_unitary(3), CCX, SWAP]:
+        n = len(u)
+        m = np.eye(n, dtype=complex)
+        for (s0, bit, g) in qasm.decompose_unitary(u):
+            assert not s0 & (1 << bit)
+            t = np.eye(n, dtype=complex)
+            t[np.ix_([s0, s0 | (1 << bit)], [s0, s0 | (1 << bit)])] = g
+            m = t @ m
+        assert_allclose(m, u, atol=1e-12)
+
+
+def test_u_angles():
+    v = random_unitary(1)
+    alpha, theta, phi, lam = qasm._u_angles(v)
+    u = np.array([[cos(theta / 2), -exp(1j * lam) * sin(theta / 2)],
+                  [exp(1j * phi) * sin(theta / 2), exp(1j * (phi + lam)) * cos(theta / 2)]])
+    assert_allclose(exp(1j * alpha) * u, v, atol=1e-12)
+
+
+def test_write_qasm():
+    qc = QCircuit(2)
+    for _ in range(10):
+        qc.h(0)
+        qc.cx(0, 1)
+    chunks = list(qasm.iter_qasm(qc._model, chunk_lines=4))
+    assert len(chunks) > 1
+    f = StringIO()
+    qasm.write_qasm(qc._model, f)
+    assert f.getvalue() == ''.join(chunks) == qc.to_qasm()
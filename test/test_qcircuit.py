@@ -5,6 +5,8 @@ Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+import subprocess
+import sys
 from math import pi, sqrt
 
 import numpy as np
@@ -261,3 +263,190 @@ def test_param_multi_gate():
     qc.rx(-pi, '-pi', [0])
     qc.rx(-pi, '-pi', [2])
     assert_array_almost_equal(qc.state_vector, [1, 0, 0, 0, 0, 0, 0, 0])
+
+
+def test_extend():
+    qc1 = QCircuit(3)
+    qc1.h(0)
+    qc1.cx(0, 1)
+    qc1.rz(pi / 3, 'pi/3', 2)
+    qc1.ccx(0, 1, 2)
+    qc1.cp(pi / 4, 'pi/4', 2, 0)
+    qc1.swap(0, 2)
+
+    qc2 = QCircuit(3)
+    qc2.extend(['H', 'CX', 'RZ', 'CCX', 'CP', 'SWAP'],
+               [[0], [0, 1], [2], [0, 1, 2], [2, 0], [0, 2]],
+               angles=[0, 0, pi / 3, 0, pi / 4, 0],
+               labels=[None, None, 'pi/3', None, 'pi/4', None])
+    assert list(qc2._model.items) == list(qc1._model.items)
+    assert_array_almost_equal(qc2.state_vector, qc1.state_vector)
+
+
+def test_extend_array():
+    qc1 = QCircuit(4)
+    for q in range(4):
+        qc1.ry(0.5 * q, '', q)
+    qc2 = QCircuit(4)
+    qc2.extend(np.full(4, 'RY'), np.arange(4), angles=0.5 * np.arange(4))
+    assert qc2._model.items[2] == ('RY', [2], {'label': '1', 'args': 1.0})
+    assert_array_almost_equal(qc2.state_vector, qc1.state_vector)
+
+
+def test_extend_deferred():
+    qc = QCircuit(2, auto_exec=False)
+    qc.extend(['H', 'CX'], [[0, -1], [0, 1]])
+    qc.execute()
+    assert_array_almost_equal(qc.state_vector, [RT2I, 0, 0, RT2I])
+
+
+def test_extend_invalid():
+    qc = QCircuit(3)
+    for args in [(['H'], [[3]]), (['H'], [[-1]]), (['CX'], [[0]]), (['CX'], [[1, 1]]),
+                 (['H'], [[0, 1]]), (['FOO'], [[0]]), (['RX'], [[0]])]:
+        with pytest.raises(ValueError):
+            qc.extend(*args)
+    assert len(qc._model.items) == 0
+
+
+def lazy_circuit(qc):
+    qc.h([0, 1, 2])
+    qc.t(0)
+    qc.rx(pi / 3, 'pi/3', 0)
+    qc.cx(0, 1)
+    qc.s([1, 2])
+    qc.sdg(2)
+    qc.barrier()
+    qc.ry(pi / 5, 'pi/5', 1)
+    qc.swap(1, 2)
+    qc.x(0)
+
+
+def test_lazy():
+    qc1 = QCircuit(3)
+    lazy_circuit(qc1)
+    qc2 = QCircuit(3, lazy=True)
+    lazy_circuit(qc2)
+    assert qc2._sim is None
+    assert_array_almost_equal(qc2.state_vector, qc1.state_vector)
+    assert list(qc2._model.items) == list(qc1._model.items)
+    qc1.h(2)
+    qc2.h(2)
+    assert qc2.probability_dict() == approx(qc1.probability_dict())
+
+
+def test_lazy_measure():
+    qc = QCircuit(2, lazy=True)
+    qc.x(0)
+    qc.cx(0, 1)
+    assert_equal(qc.measure(0, 1), [1, 1])
+    qc.reset(0)
+    qc.x(1)
+    assert_almost_equal(qc.state_vector, [1, 0, 0, 0])
+
+
+def test_lazy_execute():
+    qc = QCircuit(2, lazy=True)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.execute()
+    assert_array_almost_equal(qc.state_vector, [RT2I, 0, 0, RT2I])
+
+
+def test_checkpoints():
+    qc = QCircuit(3, auto_exec=False)
+    qc.set_checkpoints()
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.barrier()
+    qc.rx(pi / 3, 'pi/3', 2)
+    qc.execute()
+    sim = qc._simulator
+    assert len(sim._checkpoints) == 1
+
+    # Re-execution resumes after the barrier
+    executed = []
+    run_item = sim._run_item
+    sim._run_item = lambda *item: executed.append(item[0]) or run_item(*item)
+    qc.cx(1, 2)
+    qc.execute()
+    assert executed == ['RX', 'CX']
+
+    qc2 = QCircuit(3)
+    qc2.h(0)
+    qc2.cx(0, 1)
+    qc2.rx(pi / 3, 'pi/3', 2)
+    qc2.cx(1, 2)
+    assert_array_almost_equal(qc.state_vector, qc2.state_vector)
+
+
+def test_checkpoints_budget():
+    qc = QCircuit(3, auto_exec=False)
+    sim = qc._simulator
+    qc.set_checkpoints(every=1, max_bytes=3 * sim._state.nbytes)
+    qc.x([0, 1, 2, 0, 1])
+    qc.execute()
+    assert len(sim._checkpoints) == 3
+    qc.set_checkpoints(max_bytes=0)
+    qc.execute()
+    assert len(sim._checkpoints) == 0
+
+    assert_equal(qc.state_vector, [0, 1, 0, 0, 0, 0, 0, 0])
+
+
+def test_headless_import():
+    # Importing and simulating must not load the visualization libraries
+    code = ('import sys; from tinyqsim.qcircuit import QCircuit; '
+            'qc = QCircuit(2); qc.h(0); qc.cx(0, 1); qc.counts(); qc.to_svg(); '
+            'loaded = {m.split(".")[0] for m in sys.modules}; '
+            'assert not loaded & {"matplotlib", "mpl_toolkits", "IPython"}, loaded')
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_counts_array():
+    qc = QCircuit(3)
+    qc.x(1)
+    outcomes, counts = qc.counts_array(runs=10)
+    assert outcomes.tolist() == [2]
+    assert counts.tolist() == [10]
+    outcomes, counts = qc.counts_array(2, 1, runs=10, mode='repeat')
+    assert outcomes.tolist() == [1]
+
+    qc = QCircuit(2)
+    qc.x(0)
+    qc.measure(0, 1)
+    outcomes, counts = qc.counts_array(runs=5, mode='measure')
+    assert outcomes.tolist() == [2]
+    assert counts.tolist() == [5]
+
+
+def test_counts_mapping():
+    qc = QCircuit(2)
+    qc.x(1)
+    m = qc.counts_mapping(runs=10)
+    assert m == {'01': 10}
+    m = qc.counts_mapping(runs=10, include_zeros=True)
+    assert m == {'00': 0, '01': 10, '10': 0, '11': 0}
+    p = qc.probability_mapping(1)
+    assert p == {'0': 0, '1': 1}
+
+
+def test_bloch_vectors():
+    qc = QCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.x(2)
+    assert_almost_equal(qc.bloch_vectors(), [[0, 0, 0], [0, 0, 0], [0, 0, -1]])
+    assert_almost_equal(qc.bloch_vectors(2), [[0, 0, -1]])
+
+
+def test_reduced_density_matrix():
+    qc = QCircuit(3)
+    qc.h(0)
+    qc.cx(0, 2)
+    qc.x(1)
+    assert_almost_equal(qc.reduced_density_matrix(0), np.eye(2) / 2)
+    assert_almost_equal(qc.reduced_density_matrix(1), [[0, 0], [0, 1]])
+    bell = np.array([1, 0, 0, 1]) / sqrt(2)
+    assert_almost_equal(qc.reduced_density_matrix(0, 2), np.outer(bell, bell))
+    assert qc.reduced_density_matrix().shape == (8, 8)
@@ -15,13 +15,15 @@ from numpy.testing import assert_array_equal, assert_allclose
 from pytest import approx
 
 from test.config import ENABLE_STATS_TESTS
+from tinyqsim import quantum
 from tinyqsim.gates import ID, CX, X, H, SWAP
 from tinyqsim.quantum import (n_qubits, basis_names, random_state, zeros_state,
                               random_unitary, unitary_to_tensor, tensor_to_state,
                               tensor_to_unitary, state_to_tensor, apply_tensor,
                               compose_tensor, state_dict, probabilities,
                               probability_dict, swap_vector_endianness,
-                              swap_unitary_endianness)
+                              swap_unitary_endianness, BitstringMapping, counts_array,
+                              counts_dict, qubit_density_matrices, partial_trace)
 from tinyqsim.utils import kron_n, normalize, is_unitary
 
 CX_BIG = np.array([[1, 0, 0, 0],  # Big-endian CX gate
@@ -183,3 +185,70 @@ def test_probability_dict():
         assert_allclose(dic[k], exp[k])
 
 # Note: Measurement tests are now in a separate module
+
+
+def test_bitstring_mapping():
+    m = BitstringMapping(3, np.array([5, 7]), np.array([1, 6]))
+    assert len(m) == 2
+    assert list(m) == ['001', '110']
+    assert m['110'] == 7
+    assert m == {'001': 5, '110': 7}
+    assert '000' not in m
+    assert '11' not in m
+    assert 'x01' not in m
+    assert_array_equal(m.indices, [1, 6])
+
+    d = BitstringMapping(2, np.array([0.5, 0, 0, 0.5]))
+    assert d.to_dict() == {'00': 0.5, '01': 0, '10': 0, '11': 0.5}
+    assert d['11'] == 0.5
+    assert isinstance(d['11'], float)
+    assert_array_equal(d.indices, range(4))
+
+
+def test_counts_array():
+    a = np.array([0, 0, 0.6, 0.8])
+    outcomes, counts = counts_array(a, [0, 1], runs=100)
+    assert outcomes.tolist() in ([2, 3], [2], [3])
+    assert sum(counts) == 100
+    outcomes, counts = counts_array(a, [0], runs=10)
+    assert outcomes.tolist() == [1]
+    assert counts.tolist() == [10]
+    assert counts_dict(a, [0], runs=10) == {'0': 0, '1': 10}
+
+
+def _reduced_qubit(state: ndarray, q: int) -> ndarray:
+    t = np.moveaxis(state_to_tensor(state), q, 0).reshape(2, -1)
+    return t @ t.conj().T
+
+
+@pytest.mark.parametrize('chunk_bits', [1, 2, 16])
+def test_qubit_density_matrices(chunk_bits, monkeypatch):
+    monkeypatch.setattr(quantum, 'CHUNK_BITS', chunk_bits)
+    for nq in (1, 2, 5):
+        a = random_state(nq)
+        rho = qubit_density_matrices(a)
+        assert rho.shape == (nq, 2, 2)
+        for q in range(nq):
+            assert_allclose(rho[q], _reduced_qubit(a, q), atol=1e-14)
+    assert_allclose(qubit_density_matrices(a, [3, 1]), rho[[3, 1]])
+
+
+@pytest.mark.parametrize('chunk_bits', [1, 3, 16])
+def test_partial_trace(chunk_bits, monkeypatch):
+    monkeypatch.setattr(quantum, 'CHUNK_BITS', chunk_bits)
+    a = random_state(5)
+    t = state_to_tensor(a)
+    for keep in ([], [2], [4, 0], [1, 3, 2], [0, 1, 2, 3, 4]):
+        rest = [q for q in range(5) if q not in keep]
+        m = np.transpose(t, keep + rest).reshape(2 ** len(keep), -1)
+        rho = partial_trace(a, keep)
+        assert_allclose(rho, m @ m.conj().T, atol=1e-14)
+        if keep:
+            assert_allclose(np.diag(rho).real, probabilities(a, keep), atol=1e-14)
+    assert_allclose(partial_trace(a, [3])[None], qubit_density_matrices(a, [3]), atol=1e-14)
+
+
+def test_partial_trace_bell():
+    bell = np.array([1, 0, 0, 1]) / sqrt(2)
+    assert_allclose(partial_trace(bell, [0]), np.eye(2) / 2)
+    assert_allclose(partial_trace(bell, [1, 0]), np.outer(bell, bell))
@@ -0,0 +1,81 @@
+"""
+Pytest unit tests for render module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import subprocess
+import sys
+from io import StringIO
+from xml.dom import minidom
+
+from tinyqsim import render
+from tinyqsim.qcircuit import QCircuit
+
+
+def circuit():
+    qc = QCircuit(3, auto_exec=False)
+    qc.h(0)
+    qc.cx(0, 2)
+    qc.swap(1, 2)
+    qc.measure(1)
+    return qc
+
+
+def test_to_text():
+    exp = """    ┌───┐
+q0 ─┤ H ├────●──────────────────
+    └───┘    │
+             │
+             │           ┌───┐
+q1 ──────────┼──────╳────┤ ↗ ├──
+             │      │    └───┘
+             │      │
+             │      │
+q2 ──────────⊕──────╳───────────
+"""
+    assert circuit().to_text() == exp
+
+
+def test_text_labels():
+    qc = QCircuit(2, auto_exec=False)
+    qc.qubit_labels({1: 'anc'}, numbers=False)
+    qc.rx(1.5, '1.5', 1)
+    qc.cu(qc._gates['X'], 'V', 0, 1)
+    exp = """     ──────────●────
+               │
+               │
+      ┌───┐  ┌─┴─┐
+anc  ─┤ RX├──┤ V ├──
+      └───┘  └───┘
+       1.5
+"""
+    assert qc.to_text() == exp
+
+
+def test_to_svg():
+    svg = circuit().to_svg()
+    doc = minidom.parseString(svg)
+    assert len(doc.getElementsByTagName('rect')) == 2
+    assert len(doc.getElementsByTagName('circle')) == 2
+    texts = [t.firstChild.data for t in doc.getElementsByTagName('text')]
+    assert texts == ['H', '+', 'q0', 'q1', 'q2']
+
+
+def test_write_stream():
+    qc = circuit()
+    f = StringIO()
+    render.write_svg(qc._schematic, qc._model, f)
+    assert f.getvalue() == qc.to_svg()
+    f = StringIO()
+    render.write_text(qc._schematic, qc._model, f)
+    assert f.getvalue() == qc.to_text()
+
+
+def test_no_matplotlib():
+    code = ('import sys; from tinyqsim import render, model, schematic; '
+            'm = model.Model(2); m.add_gate("CX", [0, 1]); '
+            'render.to_svg(schematic.Schematic(2), m); '
+            'assert "matplotlib" not in sys.modules')
+    subprocess.run([sys.executable, '-c', code], check=True)
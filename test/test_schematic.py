@@ -0,0 +1,95 @@
+"""
+Pytest unit tests for schematic module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from tinyqsim.qcircuit import QCircuit
+from tinyqsim.schematic import Canvas, Scheduler, Schematic, XSTEP
+
+matplotlib.use('Agg')
+
+
+def test_scheduler():
+    s = Scheduler()
+    assert s.schedule([0]) == 0
+    assert s.schedule([2, 3]) == 0
+    assert s.schedule([1]) == 0
+    assert s.schedule([0, 2]) == 1  # Spans qubit 1
+    assert s.schedule([3]) == 1
+    assert s.schedule([1]) == 2
+    assert s.schedule([5]) == 2
+    assert s.schedule([0, 1, 2, 3, 4, 5]) == 3
+
+
+def test_canvas():
+    qc = QCircuit(3, auto_exec=False)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.swap(1, 2)
+    qc.measure(2)
+    qc.barrier('B')
+    schematic = Schematic(3)
+    schematic._canvas = Canvas()
+    for (name, qubits, params) in qc._model.items:
+        schematic.draw_gate(name, 0, [], qubits, params)
+    canvas = schematic._canvas
+    assert len(canvas.rects) == 2  # H and meter
+    assert len(canvas.circles) == 2  # CX dot and target
+    assert len(canvas.lines['symbol']) == 4  # Swap crosses
+    assert len(canvas.lines['meter']) == 2
+    assert len(canvas.lines['barrier']) == 1
+    assert [t[2] for t in canvas.texts] == ['H', '+', 'B']
+
+
+def test_draw():
+    qc = QCircuit(3, auto_exec=False)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.rx(1.0, '1.0', 2)
+    qc.measure(0, 1)
+    qc.draw(show=False)
+    ax = plt.gcf().axes[0]
+    assert len(ax.collections) == 4  # Qubit lines, meters, rectangles and circles
+    plt.close('all')
+
+
+def test_schedule_incremental():
+    qc = QCircuit(3, auto_exec=False)
+    qc.h(0)
+    qc.cx(0, 1)
+    schematic = qc._schematic
+    assert schematic.schedule(qc._model).tolist() == [0, 1]
+    qc.x(2)
+    qc.cx(1, 2)
+    assert schematic.schedule(qc._model).tolist() == [0, 1, 1, 2]
+    assert schematic.n_slots(qc._model) == 3
+
+
+def test_layout_window():
+    qc = QCircuit(2, auto_exec=False)
+    for _ in range(10):
+        qc.h(0)
+        qc.cx(0, 1)
+    canvas, n_slots = qc._schematic.layout(qc._model, 4, 8)
+    assert n_slots == 4
+    assert len(canvas.rects) == 2  # H gates in slots 4 and 6
+    assert len(canvas.circles) == 4  # CX gates in slots 5 and 7
+    assert min(r[0] for r in canvas.rects) < XSTEP
+
+
+def test_draw_pages():
+    qc = QCircuit(2, auto_exec=False)
+    for _ in range(10):
+        qc.h(0)
+    plt.close('all')
+    qc.draw(show=False, page_width=3)
+    assert len(plt.get_fignums()) == 4
+    plt.close('all')
+    qc.draw(show=False, start=2, stop=5)
+    assert len(plt.get_fignums()) == 1
+    plt.close('all')
@@ -0,0 +1,132 @@
+"""
+Pytest unit tests for sparse_sim module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import pi
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_unitary
+from tinyqsim.sparse_sim import SparseSimulator
+
+PI = '\u03C0'  # PI unicode
+V = random_unitary(2)
+
+
+def circuit(qc):
+    """Circuit mixing permutation, diagonal and dense gates."""
+    qc.x(0)
+    qc.ccx(0, 2, 3)
+    qc.h(1)
+    qc.cx(1, 4)
+    qc.cp(pi / 3, f'{PI}/3', 4, 0)
+    qc.swap(2, 4)
+    qc.ry(pi / 5, f'{PI}/5', 3)
+    qc.cswap(3, 0, 2)
+    qc.ch(0, 3)
+    qc.cu(V, 'V', 2, 1, 4)
+
+
+def test_matches_dense():
+    qc1 = QCircuit(5)
+    circuit(qc1)
+    qc2 = QCircuit(5, backend='sparse')
+    circuit(qc2)
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+    assert_allclose(qc2.probability_array(1, 3), qc1.probability_array(1, 3), atol=1e-12)
+
+
+def test_execute():
+    qc1 = QCircuit(5, auto_exec=False)
+    circuit(qc1)
+    qc1.execute()
+    qc2 = QCircuit(5, auto_exec=False, backend='sparse')
+    circuit(qc2)
+    qc2.execute()
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+
+
+def test_switch_to_dense():
+    h = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+    sim = SparseSimulator(6)
+    sim.apply(h, [0])
+    assert not sim.is_dense
+    for q in range(1, 6):
+        sim.apply(h, [q])
+    assert sim.is_dense
+    assert_allclose(sim.state_vector, np.full(64, 1 / 8))
+
+
+def test_sparse_state():
+    qc = QCircuit(4, backend='sparse')
+    qc.x(3)
+    qc.h(0)
+    indices, values = qc._simulator.sparse_state()
+    assert_array_equal(indices, [1, 9])
+    assert_allclose(values, [1 / np.sqrt(2)] * 2)
+
+
+def test_measure_and_reset():
+    qc = QCircuit(3, backend='sparse')
+    qc.h(0)
+    qc.cx(0, 1)
+    m = qc.measure(0, 1)
+    assert m[0] == m[1]
+    qc.reset(0)
+    qc.reset(1)
+    assert_allclose(qc.state_vector, [1, 0, 0, 0, 0, 0, 0, 0])
+
+
+def test_large_permutation_circuit():
+    nq = 40
+    qc = QCircuit(nq, backend='sparse')
+    qc.x(list(range(0, nq, 2)))
+    for i in range(nq - 1):
+        qc.cx(i, i + 1)
+        qc.ccx(i, i + 1, (i + 2) % nq)
+        qc.swap(i, nq - 1 - i)
+    qc.h(0)
+    indices, values = qc._simulator.sparse_state()
+    assert len(indices) == 2
+    assert_allclose(np.abs(values) ** 2, [0.5, 0.5])
+    assert sum(qc.probability_array(0)) == pytest.approx(1)
+    counts = qc.counts(runs=100)
+    assert sum(counts.values()) == 100
+    assert len(counts) <= 2
+
+
+def test_invalid_qubits():
+    qc = QCircuit(3, backend='sparse')
+    for qubits in [[3], [-1], [0, 0]]:
+        with pytest.raises(ValueError):
+            qc.probability_array(*qubits)
+
+
+def test_too_many_qubits():
+    with pytest.raises(ValueError):
+        SparseSimulator(64)
+
+
+def test_init_none_rejected():
+    for backend in ['dense', 'sparse']:
+        with pytest.raises(ValueError):
+            QCircuit(2, init='none', backend=backend)
+
+
+def test_checkpoints():
+    qc1 = QCircuit(5, auto_exec=False, backend='sparse')
+    qc1.set_checkpoints(every=3)
+    circuit(qc1)
+    qc1.execute()
+    qc1.h(2)
+    qc1.execute()
+    qc2 = QCircuit(5)
+    circuit(qc2)
+    qc2.h(2)
+    assert_allclose(qc1.state_vector, qc2.state_vector, atol=1e-12)
@@ -0,0 +1,155 @@
+"""
+Pytest unit tests for storage module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import pi
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from tinyqsim import composite
+from tinyqsim.model import Model
+from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_unitary
+from tinyqsim.storage import (load_arrays, load_model, load_state, save_arrays, save_model,
+                              save_state)
+
+PI = '\u03C0'  # PI unicode
+V = random_unitary(2)
+
+
+def circuit(qc):
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cp(pi / 3, f'{PI}/3', 1, 2)
+    qc.u(V, 'V', 1, 2)
+    qc.barrier()
+    qc.u(V, 'V', 0, 2)
+    qc.measure(2)
+    qc.reset(2)
+
+
+def test_save_load(tmp_path):
+    path = tmp_path / 'circuit.npz'
+    qc1 = QCircuit(3, auto_exec=False)
+    circuit(qc1)
+    qc1.save(path)
+    qc2 = QCircuit.load(path)
+    assert qc2.n_qubits == 3
+    for (name1, qubits1, params1), (name2, qubits2, params2) in zip(qc1._model.items,
+                                                                    qc2._model.items):
+        assert (name2, qubits2) == (name1, qubits1)
+        assert_array_equal(params2.pop('unitary', 0), params1.pop('unitary', 0))
+        assert params2 == params1
+    assert len(qc2._model._matrix_pool) == 1
+    assert isinstance(qc2._model._ops, np.memmap)
+
+
+def test_load_is_lazy(tmp_path):
+    path = tmp_path / 'circuit.npz'
+    qc1 = QCircuit(3)
+    qc1.h(0)
+    qc1.cx(0, 1)
+    qc1.u(V, 'V', 1, 2)
+    qc1.save(path)
+    qc2 = QCircuit.load(path)
+    assert qc2._sim is None
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+
+    # Gates can be appended to a loaded circuit
+    qc1.x(2)
+    qc2.x(2)
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+
+
+def test_empty_model(tmp_path):
+    path = tmp_path / 'empty.npz'
+    save_model(Model(2), path)
+    m = load_model(path)
+    assert m.n_qubits == 2
+    assert len(m.items) == 0
+
+
+def test_arrays(tmp_path):
+    path = tmp_path / 'arrays.npz'
+    a = np.arange(12, dtype=float).reshape(3, 4)
+    save_arrays(path, {'a': a, 'b': np.asfortranarray(a)}, {'x': 1})
+    arrays, meta = load_arrays(path)
+    assert meta == {'x': 1}
+    assert isinstance(arrays['a'], np.memmap)
+    assert_array_equal(arrays['a'], a)
+    assert_array_equal(arrays['b'], a)
+    arrays, _ = load_arrays(path, mmap=False)
+    assert not isinstance(arrays['a'], np.memmap)
+
+
+def test_not_circuit(tmp_path):
+    path = tmp_path / 'arrays.npz'
+    save_arrays(path, {}, {})
+    with pytest.raises(ValueError):
+        load_model(path)
+
+
+def test_save_load_state(tmp_path):
+    path = tmp_path / 'state.npz'
+    qc1 = QCircuit(3)
+    circuit(qc1)
+    qc1.save_state(path)
+
+    qc2 = QCircuit(3)
+    circuit(qc2)  # The measurement outcome may differ
+    meta = qc2.load_state(path)
+    assert meta['nqubits'] == 3
+    assert meta['qubit_order'] == 'big-endian'
+    assert meta['model_hash'] == composite.structural_hash(qc2._model)
+    assert isinstance(qc2._simulator._state, np.memmap)
+    assert_array_equal(qc2.state_vector, qc1.state_vector)
+
+    # Gates can be applied to a loaded state without changing the file
+    qc1.h(1)
+    qc2.h(1)
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+    state, _ = load_state(path)
+    assert not np.allclose(state, qc2.state_vector)
+
+
+def test_load_state_lazy(tmp_path):
+    path = tmp_path / 'state.npz'
+    qc1 = QCircuit(2)
+    qc1.h(0)
+    qc1.cx(0, 1)
+    qc1.save_state(path)
+
+    qc2 = QCircuit(2, lazy=True)
+    qc2.h(0)
+    qc2.cx(0, 1)
+    qc2.load_state(path, mmap=False)  # The queued gates are not executed
+    qc2.x(0)
+    qc1.x(0)
+    assert_allclose(qc2.state_vector, qc1.state_vector, atol=1e-12)
+
+
+def test_load_state_sparse(tmp_path):
+    path = tmp_path / 'state.npz'
+    qc1 = QCircuit(3)
+    qc1.x(0)
+    qc1.cx(0, 2)
+    qc1.save_state(path)
+    qc2 = QCircuit(3, backend='sparse')
+    qc2.load_state(path)
+    assert_array_equal(qc2.state_vector, qc1.state_vector)
+
+
+def test_load_state_errors(tmp_path):
+    path = tmp_path / 'state.npz'
+    save_state(np.array([1, 0, 0, 0], dtype=complex), path)
+    with pytest.raises(ValueError):
+        QCircuit(3).load_state(path)
+    with pytest.raises(ValueError):
+        load_model(path)
+    with pytest.raises(ValueError):
+        save_state(np.ones(3), path)
@@ -0,0 +1,89 @@
+"""
+Pytest unit tests for tensor_net module.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from math import pi, sqrt
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_unitary
+from tinyqsim.tensor_net import TensorNetwork, to_bits
+
+PI = '\u03C0'  # PI unicode
+V = random_unitary(2)
+
+
+def circuit(qc):
+    qc.h([0, 2])
+    qc.cx(0, 1)
+    qc.cp(pi / 3, f'{PI}/3', 2, 3)
+    qc.ry(pi / 5, f'{PI}/5', 3)
+    qc.barrier()
+    qc.ccx(3, 1, 0)
+    qc.u(V, 'V', 1, 3)
+    qc.swap(0, 2)
+
+
+def test_amplitudes_match_state():
+    qc = QCircuit(4)
+    circuit(qc)
+    sv = qc.state_vector
+    assert_allclose(qc.amplitude(range(16)), sv, atol=1e-12)
+    assert qc.amplitude('0110') == pytest.approx(sv[6])
+    assert qc.amplitude(np.int64(6)) == pytest.approx(sv[6])
+
+
+def test_optimal_path():
+    qc = QCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.ry(pi / 5, f'{PI}/5', 1)
+    assert_allclose(qc.amplitude(range(4), method='optimal'), qc.state_vector, atol=1e-12)
+
+
+def test_optimal_path_too_large():
+    qc = QCircuit(5, auto_exec=False)
+    for i in range(8):
+        qc.h(i % 5)
+        qc.cx(i % 5, (i + 1) % 5)
+    with pytest.raises(ValueError):
+        qc.amplitude('00000', method='optimal')
+
+
+def test_untouched_qubits():
+    qc = QCircuit(3)
+    qc.x(1)
+    assert qc.amplitude('010') == pytest.approx(1)
+    assert qc.amplitude('011') == pytest.approx(0)
+
+
+def test_ghz_50_qubits():
+    nq = 50
+    qc = QCircuit(nq, auto_exec=False, backend='sparse')
+    qc.h(0)
+    for i in range(nq - 1):
+        qc.cx(i, i + 1)
+    amps = qc.amplitude(['0' * nq, '1' * nq, '01' * (nq // 2)])
+    assert_allclose(amps, [1 / sqrt(2), 1 / sqrt(2), 0], atol=1e-12)
+
+
+def test_not_unitary():
+    qc = QCircuit(2, auto_exec=False)
+    qc.measure(0)
+    with pytest.raises(ValueError):
+        TensorNetwork(qc._model)
+
+
+def test_to_bits():
+    assert to_bits('0110', 4) == [0, 1, 1, 0]
+    assert to_bits(6, 4) == [0, 1, 1, 0]
+    with pytest.raises(ValueError):
+        to_bits('012', 3)
+    with pytest.raises(ValueError):
+        to_bits(8, 3)
@@ -8,7 +8,10 @@ from math import pi
 
 from numpy.ma.testutils import assert_allclose
 
+from tinyqsim.model import Model
 from tinyqsim.qcircuit import QCircuit
+from tinyqsim.quantum import random_unitary
+from tinyqsim.unitary_sim import UnitarySimulator
 from utils import is_unitary
 
 PI = '\u03C0'  # PI unicode
@@ -57,3 +60,16 @@ def test_to_unitary():
 
     # Compare the 2 results
     assert_allclose(sv2, sv1)
+
+
+def test_to_unitary_chunked():
+    model = Model(4)
+    model.add_gate('H', [0])
+    model.add_gate('CX', [0, 2], {'controls': 1})
+    model.add_gate('CP', [3, 1], {'args': pi / 4, 'controls': 1})
+    model.add_gate('RX', [2], {'args': 0.3})
+    model.add_gate('U', [1, 3], {'unitary': random_unitary(2)})
+    u1 = UnitarySimulator().execute(model)
+    u2 = UnitarySimulator(chunk_bytes=1).execute(model)
+    assert is_unitary(u1)
+    assert_allclose(u2, u1)
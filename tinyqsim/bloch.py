@@ -1,16 +1,18 @@
 """ Prototype Bloch sphere.
 
+Matplotlib is only imported when a sphere is drawn.
+
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+from functools import cache
 from math import atan2, sin, cos, pi
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 
-from tinyqsim.arrow_fix import Arrow3D
+from tinyqsim.quantum import qubit_density_matrices
 
 FIGSIZE = 3  # Default figure size (inches)
 ARROW_FONTSIZE = 11
@@ -46,28 +48,52 @@ def qubit_to_bloch(psi: np.ndarray) -> tuple[float, float]:
     return phi, theta
 
 
-def plot_bloch(psi: np.ndarray, scale=1, azimuth=35, elevation=10,
-               show: bool = True, show_angles=True, save: str = None) -> None:
-    phi, theta = qubit_to_bloch(psi)
-    plot_bloch_angles(phi, theta, scale=scale, azimuth=azimuth, elevation=elevation,
-                      show=show, show_angles=show_angles, save=save)
+def density_to_bloch(rho: np.ndarray) -> np.ndarray:
+    """Convert single-qubit density matrices to Bloch vectors.
+    Pure states lie on the sphere and mixed states inside it.
+    :param rho: density matrix, or array of density matrices of shape (..., 2, 2)
+    :return: Bloch vectors (x, y, z) of shape (..., 3)
+    """
+    rho = np.asarray(rho)
+    off = rho[..., 0, 1]
+    return np.stack([2 * off.real, -2 * off.imag,
+                     (rho[..., 0, 0] - rho[..., 1, 1]).real], axis=-1)
 
 
-def plot_bloch_angles(phi: float, theta: float, scale=1, azimuth=35, elevation=10,
-                      show: bool = True, show_angles=True, save: str = None) -> None:
-    """ Plot bloch sphere.
-        :param phi: State vector 'phi' angle in radians
-        :param theta: State vector 'theta' angle in radians
-        :param scale: scaling factor
-        :param azimuth: view-point azimuth (degrees)
-        :param elevation: view-point elevation (degrees)
-        :param show: show the plot
-        :param show_angles: show the angles
-        :param save: File name to save image (or None)
+def bloch_vectors(state: np.ndarray, qubits=None) -> np.ndarray:
+    """Return the Bloch vector of the reduced state of each qubit.
+    :param state: state vector
+    :param qubits: list of qubits (None => all)
+    :return: array of Bloch vectors of shape (len(qubits), 3)
     """
+    return density_to_bloch(qubit_density_matrices(state, qubits))
+
+
+@cache
+def _sphere_mesh() -> tuple[tuple[np.ndarray, ...], tuple[np.ndarray, ...]]:
+    """Return the coordinates of the sphere surface and wire-frame.
+    The mesh is computed once and shared by all spheres.
+    :return: ((x, y, z) of surface, (x, y, z) of wire-frame)
+    """
+
+    def mesh(n):
+        u, v = np.mgrid[0:2 * np.pi:n, 0:np.pi:n]
+        return np.cos(u) * np.sin(v), np.sin(u) * np.sin(v), np.cos(v)
+
+    return mesh(50j), mesh(37j)
+
+
+def _draw_sphere(ax, vector, scale: float, azimuth: float, elevation: float) -> None:
+    """Draw a Bloch sphere with a state arrow on 3D axes.
+    :param ax: matplotlib 3D axes
+    :param vector: Bloch vector (x, y, z)
+    :param scale: scaling factor
+    :param azimuth: view-point azimuth (degrees)
+    :param elevation: view-point elevation (degrees)
+    """
+    from tinyqsim.arrow_fix import Arrow3D
+
     size = 0.65  # Size in display units
-    figsize = FIGSIZE * scale
-    fig, ax = plt.subplots(subplot_kw={"projection": "3d"}, figsize=(figsize, figsize))
     ax.set_aspect("equal")
     ax.set_axis_off()
     ax.set_xlim((-size, size))
@@ -75,25 +101,11 @@ def plot_bloch_angles(phi: float, theta: float, scale=1, azimuth=35, elevation=1
     ax.set_zlim((-size, size))
     ax.view_init(elev=elevation, azim=azimuth)
 
-    # Draw the sphere
-    u, v = np.mgrid[0:2 * np.pi:50j, 0:np.pi:50j]
-    x = np.cos(u) * np.sin(v)
-    y = np.sin(u) * np.sin(v)
-    z = np.cos(v)
-    ax.plot_surface(x, y, z, color="#E0E0E0", alpha=0.1)
-
-    # Coordinates for state-vector arrow
-    vx = cos(phi) * sin(theta)
-    vy = sin(phi) * sin(theta)
-    vz = cos(theta)
-
-    # Draw wire-frame
-    u, v = np.mgrid[0:2 * np.pi:37j, 0:np.pi:37j]
-    x = np.cos(u) * np.sin(v)
-    y = np.sin(u) * np.sin(v)
-    z = np.cos(v)
-    ax.plot_wireframe(x, y, z, lw=0.5, color="#D0D0D0", rstride=3, cstride=6)  # 3, 6 or 3, 3
-    ax.plot_wireframe(x, y, z, lw=0.7, color="#808080", rstride=9, cstride=18)  # 9, 18
+    # Draw the sphere and wire-frame
+    surface, wire = _sphere_mesh()
+    ax.plot_surface(*surface, color="#E0E0E0", alpha=0.1)
+    ax.plot_wireframe(*wire, lw=0.5, color="#D0D0D0", rstride=3, cstride=6)  # 3, 6 or 3, 3
+    ax.plot_wireframe(*wire, lw=0.7, color="#808080", rstride=9, cstride=18)  # 9, 18
 
     # Draw a point
     ax.scatter([0], [0], [0], color="g", s=10)
@@ -106,31 +118,43 @@ def plot_bloch_angles(phi: float, theta: float, scale=1, azimuth=35, elevation=1
     head_size = 20 * scale  # Arrow head size
 
     # Draw arrows for X, Y, Z axes
-    arrow_prop_dict = dict(mutation_scale=head_size, arrowstyle='-|>', color='b',
-                           shrinkA=0, shrinkB=0)
-    arrow = Arrow3D([0, 1], [0, 0], [0, 0], **arrow_prop_dict)
-    ax.add_artist(arrow)
-    ax.text(1.1, 0, 0, r'$X$', **text_options)  # type: ignore
+    for end, name in zip(np.eye(3), ('X', 'Y', 'Z')):
+        arrow = Arrow3D(*zip((0, 0, 0), end), mutation_scale=head_size, arrowstyle='-|>',
+                        color='b', shrinkA=0, shrinkB=0)
+        ax.add_artist(arrow)
+        ax.text(*(1.1 * end), f'${name}$', **text_options)  # type: ignore
 
-    arrow_prop_dict = dict(mutation_scale=head_size, arrowstyle='-|>', color='b',
-                           shrinkA=0, shrinkB=0)
-    arrow = Arrow3D([0, 0], [0, 1], [0, 0], **arrow_prop_dict)
+    # Draw arrow for state
+    arrow = Arrow3D(*zip((0, 0, 0), vector), mutation_scale=head_size, arrowstyle='-|>',
+                    color='r', lw=2, shrinkA=0, shrinkB=0)
     ax.add_artist(arrow)
-    ax.text(0, 1.1, 0, r'$Y$', **text_options)  # type: ignore
 
-    arrow_prop_dict = dict(mutation_scale=head_size, arrowstyle='-|>', color='b',
-                           shrinkA=0, shrinkB=0)
-    arrow = Arrow3D([0, 0], [0, 0], [0, 1], **arrow_prop_dict)
-    ax.add_artist(arrow)
-    ax.text(0, 0, 1.1, r'$Z$', **text_options)  # type: ignore
 
-    # Draw arrow for state
-    arrow_prop_dict = dict(mutation_scale=head_size, arrowstyle='-|>', color='r', lw=2,
-                           shrinkA=0, shrinkB=0)
+def plot_bloch(psi: np.ndarray, scale=1, azimuth=35, elevation=10,
+               show: bool = True, show_angles=True, save: str = None) -> None:
+    phi, theta = qubit_to_bloch(psi)
+    plot_bloch_angles(phi, theta, scale=scale, azimuth=azimuth, elevation=elevation,
+                      show=show, show_angles=show_angles, save=save)
 
-    arrow = Arrow3D([0, vx], [0, vy], [0, vz], **arrow_prop_dict)
-    ax.add_artist(arrow)
-    # ax.text(vx * 1.1, vy * 1.1, vz * 1.1, u'|\u03C8>', **text_options)
+
+def plot_bloch_angles(phi: float, theta: float, scale=1, azimuth=35, elevation=10,
+                      show: bool = True, show_angles=True, save: str = None) -> None:
+    """ Plot bloch sphere.
+        :param phi: State vector 'phi' angle in radians
+        :param theta: State vector 'theta' angle in radians
+        :param scale: scaling factor
+        :param azimuth: view-point azimuth (degrees)
+        :param elevation: view-point elevation (degrees)
+        :param show: show the plot
+        :param show_angles: show the angles
+        :param save: File name to save image (or None)
+    """
+    import matplotlib.pyplot as plt
+
+    figsize = FIGSIZE * scale
+    fig, ax = plt.subplots(subplot_kw={"projection": "3d"}, figsize=(figsize, figsize))
+    vector = (cos(phi) * sin(theta), sin(phi) * sin(theta), cos(theta))
+    _draw_sphere(ax, vector, scale, azimuth, elevation)
 
     # Annotate with parameter values
     if show_angles:
@@ -145,3 +169,39 @@ def plot_bloch_angles(phi: float, theta: float, scale=1, azimuth=35, elevation=1
 
     if show:
         plt.show()
+
+
+def plot_bloch_vectors(vectors: np.ndarray, labels: list[str] | None = None, ncols: int = 4,
+                       scale=1, azimuth=35, elevation=10, show: bool = True,
+                       save: str = None) -> None:
+    """ Plot a grid of Bloch spheres, e.g. for the reduced state of each qubit.
+        The arrow of a mixed state lies inside the sphere.
+        :param vectors: array of Bloch vectors of shape (n, 3)
+        :param labels: title of each sphere (or None)
+        :param ncols: maximum number of spheres per row
+        :param scale: scaling factor
+        :param azimuth: view-point azimuth (degrees)
+        :param elevation: view-point elevation (degrees)
+        :param show: show the plot
+        :param save: File name to save image (or None)
+    """
+    import matplotlib.pyplot as plt
+
+    vectors = np.asarray(vectors).reshape(-1, 3)
+    n = len(vectors)
+    ncols = max(1, min(ncols, n))
+    nrows = -(-n // ncols)
+    figsize = FIGSIZE * scale
+    fig = plt.figure(figsize=(figsize * ncols, figsize * nrows))
+    for i, vector in enumerate(vectors):
+        ax = fig.add_subplot(nrows, ncols, i + 1, projection='3d')
+        _draw_sphere(ax, vector, scale, azimuth, elevation)
+        if labels is not None:
+            ax.text2D(0.05, 0.08, labels[i], fontsize=TEXT_FONTSIZE, transform=ax.transAxes)
+
+    if save:
+        fname = Path.home() / save
+        fig.savefig(fname, bbox_inches='tight')
+
+    if show:
+        plt.show()
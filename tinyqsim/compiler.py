@@ -0,0 +1,80 @@
+"""
+Circuit optimization before execution.
+
+The compiler rewrites a sequence of model items into an equivalent
+sequence that is cheaper to simulate. Currently it fuses each run of
+single-qubit gates on a qubit into one gate. A single-qubit gate
+commutes with every operation that does not touch its qubit, so the run
+is only broken by a multi-qubit gate, measurement or reset on that qubit.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import numpy as np
+from numpy import ndarray
+
+from tinyqsim.gates import PARAM_GATES, gate_info
+
+NON_UNITARY = ('measure', 'reset', 'barrier')
+
+
+def _matrix(name: str, params: dict) -> ndarray:
+    """Return the unitary matrix of a model item.
+    :param name: name of gate
+    :param params: parameter dictionary
+    :return: unitary matrix
+    """
+    if name == 'U':
+        return params['unitary']
+    if name in PARAM_GATES:
+        return gate_info(name, params['args']).matrix
+    return gate_info(name).matrix
+
+
+def fuse_single_qubit(items) -> list[tuple[str, list[int], dict]]:
+    """Fuse runs of single-qubit gates on each qubit into a single gate.
+    A fused gate is emitted as a custom unitary 'U'. Runs that fuse to
+    the identity are dropped and runs of one gate are left unchanged.
+    :param items: iterable of model items (name, qubits, params)
+    :return: list of model items
+    """
+    out = []
+    runs: dict[int, tuple[ndarray, tuple, int]] = {}  # qubit -> (matrix, first item, count)
+
+    def emit(q: int) -> None:
+        u, item, count = runs.pop(q)
+        if count == 1:
+            out.append(item)
+        elif not np.allclose(u, np.eye(2), rtol=0, atol=1e-14):
+            out.append(('U', [q], {'unitary': u}))
+
+    for item in items:
+        name, qubits, params = item
+        if len(qubits) == 1 and name not in NON_UNITARY:
+            q = qubits[0]
+            u = _matrix(name, params)
+            if q in runs:
+                acc, first, count = runs[q]
+                runs[q] = (u @ acc, first, count + 1)
+            else:
+                runs[q] = (u, item, 1)
+        elif name == 'barrier':
+            continue
+        else:
+            for q in qubits:
+                if q in runs:
+                    emit(q)
+            out.append(item)
+
+    for q in sorted(runs):
+        emit(q)
+    return out
+
+
+def compile_items(items) -> list[tuple[str, list[int], dict]]:
+    """Optimize a sequence of model items for execution.
+    :param items: iterable of model items (name, qubits, params)
+    :return: list of equivalent model items
+    """
+    return fuse_single_qubit(items)
@@ -0,0 +1,95 @@
+"""
+Composite gates defined by sub-circuits.
+
+The unitary of a composite gate is computed once from its sub-circuit
+model and cached, keyed by a structural hash of the model, so repeated
+use of the same subroutine (e.g. a QFT) costs a single fused gate.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+
+from numpy import ndarray
+
+from tinyqsim import utils
+from tinyqsim.model import Model, item_bytes
+from tinyqsim.unitary_sim import UnitarySimulator
+
+CACHE_SIZE = 64  # Maximum number of cached unitaries
+MAX_QUBITS = 12  # Maximum width of a composite gate
+
+
+def structural_hash(model: Model) -> str:
+    """Return a hash of the structure of a circuit model.
+    Two models have the same hash if they have the same gates, applied
+    to the same qubits, with the same parameters. Labels are ignored.
+    :param model: circuit model
+    :return: hash as a hex string
+    """
+    h = blake2b(digest_size=16)
+    h.update(f'{model.n_qubits};'.encode())
+    for item in model.items:
+        h.update(item_bytes(*item))
+    return h.hexdigest()
+
+
+class UnitaryCache:
+    """Size-bounded least-recently-used cache of unitary matrices."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        """Initialize cache.
+        :param maxsize: maximum number of entries
+        """
+        self._maxsize = maxsize
+        self._entries: OrderedDict[str, ndarray] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def unitary(self, model: Model) -> ndarray:
+        """Return the unitary of a model, computing it if not cached.
+        The unitarity of a new matrix is checked once, before it is stored.
+        :param model: circuit model
+        :return: read-only unitary matrix
+        """
+        key = structural_hash(model)
+        u = self._entries.get(key)
+        if u is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return u
+
+        self.misses += 1
+        u = UnitarySimulator().execute(model)
+        if not utils.is_unitary(u):
+            raise ValueError('Matrix must be unitary')
+        u.flags.writeable = False
+        self._entries[key] = u
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        return u
+
+
+CACHE = UnitaryCache()
+"""Cache shared by all circuits"""
+
+
+def composite_unitary(model: Model) -> ndarray:
+    """Return the (cached) unitary matrix of a sub-circuit.
+    :param model: model of the sub-circuit
+    :return: read-only unitary matrix
+    """
+    if model.n_qubits > MAX_QUBITS:
+        raise ValueError(f'Composite gate too wide: {model.n_qubits} qubits')
+    return CACHE.unitary(model)
@@ -85,8 +85,30 @@ def ket(index: int, nqubits=0, kets=True):
     return wrap(bin(index)[2:].zfill(nqubits))
 
 
+def _edge_indices(indices: ndarray, n: int, edge: int) -> tuple[ndarray, ndarray, bool]:
+    """Select the items shown before and after the ellipsis of a table.
+    This is equivalent to scanning forwards and then backwards for up to
+    'edge' items each, but it works on the sorted indices of the items.
+    :param indices: sorted indices of the items that may be shown
+    :param n: length of the array
+    :param edge: number of items before and after ellipsis
+    :return: (indices before ellipsis, indices after ellipsis, ellipsis needed)
+    """
+    pre = indices[:edge]
+    ipre = int(pre[-1]) if len(indices) >= edge else n - 1  # Last index scanned forwards
+    rest = indices[len(pre):]
+    post = rest[-edge:]
+    if len(rest) >= edge:
+        ipost = int(post[0])  # Last index scanned backwards
+    else:
+        ipost = ipre + 1 if ipre < n - 1 else 0
+    return pre, post, ipost > ipre + 1
+
+
 def format_table(values, decimals=5, include_zeros=False, trim=True, edge=5):
     """Format a table of kets and the corresponding values.
+    Only the values that are shown are formatted, so the cost does not
+    depend on the length of the array when 'edge' is small.
     :param values: array of values (e.g. state vector)
     :param decimals: number of decimal places
     :param include_zeros: whether to include zeros
@@ -94,43 +116,31 @@ def format_table(values, decimals=5, include_zeros=False, trim=True, edge=5):
     :param edge: Number of items before and after ellipsis
     :return: table as formatted string
     """
-
+    values = np.asarray(values)
     n = len(values)
     if edge == 0:
         edge = n
+    if n == 0:
+        return ''
 
     sig = 10 ** (-decimals) / 2
     nqubits = int.bit_length(n - 1)
 
-    def format_row(ii, vv):
-        if include_zeros or abs(vv) >= sig:
-            ss, neg = format_complex(vv, decimals=decimals, trim=trim)
-            return f'{ket(ii, nqubits, True)} {' -'[neg]}{ss}'
-        else:
-            return None
-
-    def scan(rng):
-        # Return list of formatted items satisfying option
-        items = []
-        count = 0
-        last_index = 0
-        for i in rng:
-            last_index = i
-            s = format_row(i, values[i])
-            if s:
-                items.append(s)
-                count += 1
-                if count >= edge:
-                    break
-        return last_index, items
-
-    # Process up to 'edge' items from start and end of list
-    ipre, pre = scan(range(n))
-    ipost, post = scan(range(n - 1, ipre, -1))
-
-    # Combine the lists, with an ellipsis if needed
-    sep = ['...'] if ipost > ipre + 1 else []
-    return '\n'.join(pre + sep + list(reversed(post)))
+    if include_zeros:  # Only the first and last 'edge' indices can be shown
+        indices = np.union1d(np.arange(min(edge, n)), np.arange(max(n - edge, 0), n))
+    else:
+        indices = np.flatnonzero(np.abs(values) >= sig)
+    pre, post, sep = _edge_indices(indices, n, edge)
+
+    def format_row(ii):
+        ss, neg = format_complex(values[ii], decimals=decimals, trim=trim)
+        return f'{ket(ii, nqubits, True)} {' -'[neg]}{ss}'
+
+    rows = [format_row(i) for i in pre.tolist()]
+    if sep:
+        rows.append('...')
+    rows += [format_row(i) for i in post.tolist()]
+    return '\n'.join(rows)
 
 
 # ---------- Formatting quantum states ----------
@@ -161,18 +171,24 @@ def state_kets(state: ndarray, prefix: str = '', decimals: int = DEFAULT_DECIMAL
     # The LaTeX mode works for up to about 10 qubits, but it is
     # really only useful for a small number of qubits (say up to 4).
 
-    dic = quantum.state_dict(state)
+    state = np.asarray(state)
+    nqubits = quantum.n_qubits(state)
+    if include_zeros:
+        indices = range(len(state))
+    else:  # Skip values that round to zero without formatting them
+        tol = 10 ** (-decimals) / 2
+        indices = np.flatnonzero((np.abs(state.real) >= tol) | (np.abs(state.imag) >= tol)).tolist()
     ltx = prefix
     first = True
-    for k, v in dic.items():
-        zs, neg = format_complex(v, decimals=decimals, trim=trim)
+    for i in indices:
+        zs, neg = format_complex(state[i], decimals=decimals, trim=trim)
         zero = zs == '0' or zs.rstrip('0').strip('.') == '0'
         if not include_zeros and zero:
             continue
         op = '' if first and not neg else '+-'[neg] + ' '
         if not first:
             ltx += ' '  # No space before first item
-        ltx += op + zs + _ket(k, latex)
+        ltx += op + zs + _ket(bin(i)[2:].zfill(nqubits), latex)
         first = False
     return ltx
 
@@ -6,11 +6,15 @@ Copyright (c) 2024 Jon Brumfitt
 """
 
 from cmath import exp
-from math import sin, cos, sqrt
+from functools import lru_cache
+from math import sin, cos, sqrt, pi, isclose, remainder
+from typing import NamedTuple
 
 import numpy as np
 from numpy import ndarray
 
+from tinyqsim.kernels import gate_kind, n_controls
+
 # Useful constants
 RT2 = sqrt(2)
 
@@ -71,13 +75,11 @@ def cu(u: ndarray, n_controls=1) -> ndarray:
        :param n_controls: Number of controls
        :return: The controlled-U gate
     """
-    n_extra = (2 ** n_controls - 1) * len(u)
-    a = np.array(u)
-    for i in range(n_extra):
-        a = np.insert(a, 0, 0, axis=0)
-        a = np.insert(a, 0, 0, axis=1)
-        a[0][0] = 1
-    return a
+    a = np.asarray(u)
+    k = len(a)
+    c = np.eye(k * 2 ** n_controls, dtype=a.dtype)
+    c[-k:, -k:] = a
+    return c
 
 
 # Controlled versions of gates
@@ -195,3 +197,67 @@ GATES = {
     'Y': Y,
     'Z': Z,
 }
+
+
+# ---------- Gate registry ----------
+
+GATE_CACHE_SIZE = 4096  # Maximum number of cached parameterized gates
+
+PARAM_GATES = ('CP', 'CRX', 'CRY', 'CRZ', 'P', 'RX', 'RY', 'RZ')
+"""Names of parameterized gates"""
+
+CLIFFORD_GATES = ('CX', 'CY', 'CZ', 'H', 'I', 'S', 'Sdg', 'SWAP', 'SX', 'X', 'Y', 'Z')
+"""Names of non-parameterized Clifford gates"""
+
+
+class GateInfo(NamedTuple):
+    """ A gate matrix with structural metadata used to select kernels.
+        The matrix and tensor are read-only and share the same data.
+    """
+    matrix: ndarray  # Contiguous complex unitary matrix
+    tensor: ndarray  # Tensor view of the matrix
+    kind: str  # 'diagonal' | 'permutation' | 'controlled' | 'general'
+    controls: int  # Number of leading control qubits
+    clifford: bool  # True if the gate is a Clifford gate
+
+
+def matrix_info(u: ndarray, clifford: bool = False) -> GateInfo:
+    """Return the GateInfo of a unitary matrix.
+    :param u: unitary matrix
+    :param clifford: whether the gate is known to be Clifford
+    :return: gate information
+    """
+    m = np.array(u, dtype=complex, order='C')
+    m.flags.writeable = False
+    nq = int.bit_length(len(m) - 1)
+    return GateInfo(m, m.reshape([2] * nq * 2), gate_kind(m), n_controls(m), clifford)
+
+
+def _is_clifford(name: str, angle: float) -> bool:
+    """Return True if a parameterized gate is Clifford for the given angle."""
+    step = pi if name.startswith('C') else pi / 2
+    return name in ('CP', 'P', 'RX', 'RY', 'RZ') and isclose(remainder(angle, step), 0, abs_tol=1e-12)
+
+
+@lru_cache(maxsize=None)
+def _fixed_gate_info(name: str) -> GateInfo:
+    """Return the GateInfo of a non-parameterized gate (cached forever)."""
+    return matrix_info(GATES[name], name in CLIFFORD_GATES)
+
+
+@lru_cache(maxsize=GATE_CACHE_SIZE)
+def _param_gate_info(name: str, angle: float) -> GateInfo:
+    """Return the GateInfo of a parameterized gate (bounded LRU cache)."""
+    return matrix_info(GATES[name](angle), _is_clifford(name, angle))
+
+
+def gate_info(name: str, args: float | None = None) -> GateInfo:
+    """Return a gate from the registry, creating it on first use.
+    Parameterized gates are memoized by (name, angle).
+    :param name: name of the gate (key of GATES)
+    :param args: angle for parameterized gates
+    :return: gate information
+    """
+    if name in PARAM_GATES:
+        return _param_gate_info(name, float(args))
+    return _fixed_gate_info(name)
@@ -0,0 +1,157 @@
+"""
+Kernels for applying gates to state tensors.
+
+A gate is applied using the cheapest kernel for its structure:
+diagonal gates are a broadcast multiplication, permutation gates
+(possibly with phases) just reorder slices, and controlled gates only
+touch the slice of the state where all the controls are |1>. Anything
+else uses a general tensor contraction.
+
+The qubit axes are the leading axes of the state tensor. Any trailing
+axes are treated as a batch, so the same kernels can evolve many states
+at once (e.g. the columns of a unitary matrix).
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import numpy as np
+from numpy import ndarray
+
+from tinyqsim.quantum import unitary_to_tensor
+
+
+def n_controls(u: ndarray) -> int:
+    """Return the number of leading control qubits of a gate.
+    A gate with 'c' controls has the form diag(I, V), where V acts on the
+    remaining qubits when all the controls are |1>.
+    :param u: unitary matrix
+    :return: number of controls
+    """
+    n = len(u)
+    c = 0
+    while n > 2:
+        h = n // 2
+        if not (np.array_equal(u[:h, :h], np.eye(h)) and not np.any(u[:h, h:])
+                and not np.any(u[h:, :h])):
+            break
+        u = u[h:, h:]
+        n = h
+        c += 1
+    return c
+
+
+def gate_kind(u: ndarray) -> str:
+    """Classify a gate by its structure.
+    :param u: unitary matrix
+    :return: 'diagonal' | 'permutation' | 'controlled' | 'general'
+    """
+    nonzero = u != 0
+    if not np.any(nonzero & ~np.eye(len(u), dtype=bool)):
+        return 'diagonal'
+    if np.all(np.count_nonzero(nonzero, axis=0) == 1):
+        return 'permutation'
+    if n_controls(u) > 0:
+        return 'controlled'
+    return 'general'
+
+
+def apply_gate(ts: ndarray, u: ndarray, qubits: list[int], kind: str | None = None,
+               tensor: ndarray | None = None) -> ndarray:
+    """Apply a unitary matrix to specified qubits of a state tensor.
+    :param ts: state tensor, optionally with trailing batch axes
+    :param u: unitary matrix
+    :param qubits: list of qubits
+    :param kind: gate structure (see 'gate_kind'), or None to classify it
+    :param tensor: tensor form of the unitary, or None to reshape it
+    :return: updated state tensor
+    """
+    u = np.asarray(u)
+    match kind or gate_kind(u):
+        case 'diagonal':
+            return apply_diagonal(ts, np.diagonal(u), qubits)
+        case 'permutation':
+            return apply_permutation(ts, u, qubits)
+        case 'controlled':
+            return apply_controlled(ts, u, qubits)
+        case _:
+            return apply_general(ts, u, qubits, tensor)
+
+
+def apply_diagonal(ts: ndarray, d: ndarray, qubits: list[int]) -> ndarray:
+    """Apply a diagonal gate by broadcast multiplication.
+    :param ts: state tensor
+    :param d: diagonal of the unitary matrix
+    :param qubits: list of qubits
+    :return: updated state tensor
+    """
+    k = len(qubits)
+    order = np.argsort(qubits)
+    td = np.transpose(d.reshape([2] * k), order)
+    shape = [1] * ts.ndim
+    for q in qubits:
+        shape[q] = 2
+    return ts * td.reshape(shape)
+
+
+def apply_permutation(ts: ndarray, u: ndarray, qubits: list[int]) -> ndarray:
+    """Apply a gate with one nonzero element per column by reordering slices.
+    :param ts: state tensor
+    :param u: unitary matrix
+    :param qubits: list of qubits
+    :return: updated state tensor
+    """
+    k = len(qubits)
+    rows = np.argmax(u != 0, axis=0)  # Output index for each input index
+    source = np.argsort(rows)  # Input index for each output index
+    phases = u[rows[source], source]
+
+    x = np.moveaxis(ts, qubits, range(k))
+    shape = x.shape
+    x = x.reshape(2 ** k, -1)
+    x = x[source]
+    if not np.all(phases == 1):
+        x = x * phases[:, None]
+    return np.moveaxis(x.reshape(shape), range(k), qubits)
+
+
+def apply_controlled(ts: ndarray, u: ndarray, qubits: list[int]) -> ndarray:
+    """Apply a controlled gate to the slice where all controls are |1>.
+    :param ts: state tensor
+    :param u: unitary matrix of the form diag(I, V)
+    :param qubits: list of qubits (controls first)
+    :return: updated state tensor
+    """
+    c = n_controls(u)
+    controls, targets = qubits[:c], qubits[c:]
+    v = u[-2 ** len(targets):, -2 ** len(targets):]
+
+    index = [slice(None)] * ts.ndim
+    for q in controls:
+        index[q] = 1
+    index = tuple(index)
+
+    # Target axes are renumbered as the control axes are removed by indexing
+    sub_targets = [t - sum(1 for q in controls if q < t) for t in targets]
+    result = ts.astype(np.result_type(ts, v), copy=True)
+    result[index] = apply_gate(ts[index], v, sub_targets)
+    return result
+
+
+def apply_general(ts: ndarray, u: ndarray, qubits: list[int],
+                  tensor: ndarray | None = None) -> ndarray:
+    """Apply an arbitrary gate by tensor contraction.
+    :param ts: state tensor
+    :param u: unitary matrix
+    :param qubits: list of qubits
+    :param tensor: tensor form of the unitary, or None to reshape it
+    :return: updated state tensor
+    """
+    n = ts.ndim
+    a = list(range(n))
+    b = [i + n for i in range(len(qubits))]
+    fn = dict(zip(qubits, b))
+    c = [fn.get(i, i) for i in a]
+    if tensor is None:
+        tensor = unitary_to_tensor(u)
+    return np.einsum(ts, a, tensor, b + list(qubits), c, optimize=True)
@@ -1,10 +1,64 @@
 """
 Model for quantum circuit.
 
+The gates are held in an opcode table of parallel NumPy arrays rather than
+as a list of Python objects. Each gate has an opcode (an index into a table
+of gate names), an offset into a flat array of qubits, an optional angle,
+label and number of controls, and an optional index into a pool of custom
+unitary matrices. Labels and matrices are interned, so a matrix that is
+used many times is only stored once.
+
+The 'items' property presents the table as a read-only sequence of
+(name, qubits, params) tuples for compatibility.
+
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+from collections.abc import Sequence
+from hashlib import blake2b
+
+import numpy as np
+from numpy import ndarray
+
+INITIAL_CAPACITY = 64  # Initial number of gates allocated
+
+# Flags indicating which parameters are present
+HAS_LABEL = 1
+HAS_ARGS = 2
+HAS_CONTROLS = 4
+HAS_UNITARY = 8
+HAS_EXTRAS = 16
+
+_KEYS = {'label': HAS_LABEL, 'args': HAS_ARGS, 'controls': HAS_CONTROLS,
+         'unitary': HAS_UNITARY}
+
+
+def item_bytes(name: str, qubits: list[int], params: dict) -> bytes:
+    """Return a byte string identifying the effect of a model item.
+    Items with the same gate, qubits and parameters give the same bytes.
+    Labels are ignored.
+    :param name: name of gate
+    :param qubits: qubits
+    :param params: parameter dictionary
+    :return: byte string
+    """
+    b = f'{name}{qubits}{params.get('args')}{params.get('controls', 0)};'.encode()
+    if 'unitary' in params:
+        b += np.ascontiguousarray(params['unitary'], dtype=complex).tobytes()
+    return b
+
+
+def _grow(a: ndarray, size: int) -> ndarray:
+    """Return a copy of an array enlarged to at least 'size' elements.
+    :param a: array
+    :param size: minimum size
+    :return: enlarged array
+    """
+    b = np.zeros(max(size, 2 * len(a)), dtype=a.dtype)
+    b[:len(a)] = a
+    return b
+
 
 class Model:
     """ Model for quantum circuit. """
@@ -14,15 +68,111 @@ class Model:
             :param nqubits: Number of qubits.
         """
         self._nqubits = nqubits
-        self._items: list[(str, list[int], list)] = []
+        self._n = 0  # Number of gates
+        self._nq = 0  # Number of entries used in '_qubits'
+
+        # Per-gate columns
+        cap = INITIAL_CAPACITY
+        self._ops = np.zeros(cap, dtype=np.int16)  # Opcode
+        self._qstart = np.zeros(cap + 1, dtype=np.int64)  # Offset into '_qubits'
+        self._flags = np.zeros(cap, dtype=np.uint8)  # Parameters present
+        self._args = np.zeros(cap, dtype=float)  # Angle
+        self._labels = np.zeros(cap, dtype=np.int32)  # Index into '_label_pool' (-1 => None)
+        self._controls = np.zeros(cap, dtype=np.int8)  # Number of controls
+        self._unitaries = np.zeros(cap, dtype=np.int32)  # Index into '_matrix_pool'
+
+        self._qubits = np.zeros(2 * cap, dtype=np.int32)  # Flat array of qubits
+
+        # Interned values
+        self._names: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self._label_pool: list[str] = []
+        self._label_ids: dict[str, int] = {}
+        self._matrix_pool: list[ndarray] = []
+        self._matrix_ids: dict[tuple, int] = {}
+        self._extras: dict[int, dict] = {}  # Any other parameters, by gate index
 
     @property
     def n_qubits(self):
         return self._nqubits
 
     @property
-    def items(self):
-        return self._items
+    def items(self) -> 'ModelItems':
+        return ModelItems(self)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def gate_names(self) -> set[str]:
+        """Return the names of the gates used in the model."""
+        return set(self._names)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the approximate memory used by the model in bytes."""
+        arrays = [self._ops, self._qstart, self._flags, self._args, self._labels,
+                  self._controls, self._unitaries, self._qubits]
+        return sum(a.nbytes for a in arrays) + sum(u.nbytes for u in self._matrix_pool)
+
+    # ----------------------- Interning -----------------------
+
+    def _opcode(self, name: str) -> int:
+        """Return the opcode for a gate name, allocating one if new.
+        :param name: name of gate
+        :return: opcode
+        """
+        op = self._name_ids.get(name)
+        if op is None:
+            op = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return op
+
+    def _label_id(self, label: str | None) -> int:
+        """Return the index of a label in the label pool, adding it if new.
+        :param label: label, or None
+        :return: index in the pool (-1 => None)
+        """
+        if label is None:
+            return -1
+        i = self._label_ids.get(label)
+        if i is None:
+            i = self._label_ids[label] = len(self._label_pool)
+            self._label_pool.append(label)
+        return i
+
+    def _matrix_id(self, u: ndarray) -> int:
+        """Return the index of a matrix in the matrix pool, adding it if new.
+        :param u: unitary matrix
+        :return: index in the pool
+        """
+        m = np.array(u, dtype=complex, order='C')
+        key = (m.shape, blake2b(m.tobytes(), digest_size=16).digest())
+        i = self._matrix_ids.get(key)
+        if i is None:
+            m.flags.writeable = False
+            i = self._matrix_ids[key] = len(self._matrix_pool)
+            self._matrix_pool.append(m)
+        return i
+
+    def _reserve(self, ngates: int, nqubits: int) -> None:
+        """Ensure there is room for more gates and qubits.
+        :param ngates: number of gates to be added
+        :param nqubits: number of qubit entries to be added
+        """
+        if self._n + ngates > len(self._ops):
+            size = self._n + ngates
+            self._ops = _grow(self._ops, size)
+            self._flags = _grow(self._flags, size)
+            self._args = _grow(self._args, size)
+            self._labels = _grow(self._labels, size)
+            self._controls = _grow(self._controls, size)
+            self._unitaries = _grow(self._unitaries, size)
+            self._qstart = _grow(self._qstart, len(self._ops) + 1)
+        if self._nq + nqubits > len(self._qubits):
+            self._qubits = _grow(self._qubits, self._nq + nqubits)
+
+    # ----------------------- Adding gates -----------------------
 
     def add_gate(self, name: str, qubits: list[int], params=None):
         """ Add gate to circuit.
@@ -32,4 +182,213 @@ class Model:
         """
         if params is None:
             params = {}
-        self._items.append((name, qubits, params))
+        k = len(qubits)
+        self._reserve(1, k)
+        i, nq = self._n, self._nq
+
+        self._ops[i] = self._opcode(name)
+        self._qubits[nq:nq + k] = qubits
+        self._qstart[i + 1] = nq + k
+
+        flags = 0
+        for key, value in params.items():
+            match key:
+                case 'label':
+                    self._labels[i] = self._label_id(value)
+                case 'args':
+                    self._args[i] = value
+                case 'controls':
+                    self._controls[i] = value
+                case 'unitary':
+                    self._unitaries[i] = self._matrix_id(value)
+                case _:
+                    self._extras.setdefault(i, {})[key] = value
+                    flags |= HAS_EXTRAS
+                    continue
+            flags |= _KEYS[key]
+        self._flags[i] = flags
+
+        self._n += 1
+        self._nq += k
+
+    def add_gates(self, names, qubits: ndarray, nqubits: ndarray, args: ndarray | None = None,
+                  labels=None, controls: ndarray | None = None) -> None:
+        """ Add many gates to the circuit in one step.
+            The arguments must already have been validated.
+            :param names: name of each gate
+            :param qubits: 2D array of qubits, one row per gate (excess columns ignored)
+            :param nqubits: number of qubits of each gate
+            :param args: angle of each gate (NaN => none)
+            :param labels: label of each gate with an angle (None => no label)
+            :param controls: number of controls of each gate (0 => none)
+        """
+        n = len(names)
+        if n == 0:
+            return
+        qubits = np.asarray(qubits).reshape(n, -1)
+        nqubits = np.asarray(nqubits, dtype=np.int64)
+        total = int(np.sum(nqubits))
+        self._reserve(n, total)
+        i0, nq0 = self._n, self._nq
+
+        uniq, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        ops = np.array([self._opcode(name) for name in uniq.tolist()], dtype=np.int16)
+        self._ops[i0:i0 + n] = ops[inverse]
+
+        mask = np.arange(qubits.shape[1]) < nqubits[:, None]
+        self._qubits[nq0:nq0 + total] = qubits[mask]
+        self._qstart[i0 + 1:i0 + n + 1] = nq0 + np.cumsum(nqubits)
+
+        flags = np.zeros(n, dtype=np.uint8)
+        if args is not None:
+            args = np.asarray(args, dtype=float)
+            has_args = ~np.isnan(args)
+            self._args[i0:i0 + n] = np.where(has_args, args, 0)
+            flags[has_args] |= HAS_ARGS
+        if labels is not None:
+            has_label = np.array([s is not None for s in labels], dtype=bool)
+            self._labels[i0:i0 + n] = [self._label_id(s) for s in labels]
+            flags[has_label] |= HAS_LABEL
+        if controls is not None:
+            controls = np.asarray(controls, dtype=np.int8)
+            self._controls[i0:i0 + n] = controls
+            flags[controls > 0] |= HAS_CONTROLS
+        self._flags[i0:i0 + n] = flags
+
+        self._n += n
+        self._nq += total
+
+    # ----------------------- Serialization -----------------------
+
+    def to_arrays(self) -> tuple[dict[str, ndarray], dict]:
+        """Return the opcode table as arrays and metadata for serialization.
+        The unitary matrices are concatenated into one flat array.
+        :return: (dictionary of name -> array, metadata)
+        """
+        if self._extras:
+            raise ValueError('Model has parameters that cannot be serialized')
+        n, nq = self._n, self._nq
+        sizes = np.array([len(u) for u in self._matrix_pool], dtype=np.int64)
+        flat = [u.ravel() for u in self._matrix_pool]
+        arrays = {
+            'ops': self._ops[:n],
+            'qstart': self._qstart[:n + 1],
+            'flags': self._flags[:n],
+            'args': self._args[:n],
+            'labels': self._labels[:n],
+            'controls': self._controls[:n],
+            'unitaries': self._unitaries[:n],
+            'qubits': self._qubits[:nq],
+            'label_pool': np.array(self._label_pool, dtype=str),
+            'matrix_sizes': sizes,
+            'matrix_data': np.concatenate(flat) if flat else np.zeros(0, dtype=complex),
+        }
+        meta = {'nqubits': self._nqubits, 'names': self._names}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, ndarray], meta: dict) -> 'Model':
+        """Create a model from arrays and metadata returned by 'to_arrays'.
+        The arrays are used without copying, so they may be memory-mapped.
+        :param arrays: dictionary of name -> array
+        :param meta: metadata
+        :return: circuit model
+        """
+        model = cls(meta['nqubits'])
+        model._ops = arrays['ops']
+        model._qstart = arrays['qstart']
+        model._flags = arrays['flags']
+        model._args = arrays['args']
+        model._labels = arrays['labels']
+        model._controls = arrays['controls']
+        model._unitaries = arrays['unitaries']
+        model._qubits = arrays['qubits']
+        model._n = len(model._ops)
+        model._nq = len(model._qubits)
+
+        for name in meta['names']:
+            model._opcode(name)
+        for label in arrays['label_pool'].tolist():
+            model._label_id(label)
+        ends = np.cumsum(arrays['matrix_sizes'] ** 2)
+        for size, end in zip(arrays['matrix_sizes'].tolist(), ends.tolist()):
+            u = arrays['matrix_data'][end - size * size:end].reshape(size, size)
+            model._matrix_ids[(u.shape, blake2b(u.tobytes(), digest_size=16).digest())] = \
+                len(model._matrix_pool)
+            model._matrix_pool.append(u)
+        return model
+
+    # ----------------------- Reading gates -----------------------
+
+    def _params(self, i: int, flags: int) -> dict:
+        """Return the parameter dictionary of a gate.
+        :param i: index of gate
+        :param flags: flags of gate
+        :return: parameter dictionary
+        """
+        params = {}
+        if flags & HAS_LABEL:
+            j = int(self._labels[i])
+            params['label'] = self._label_pool[j] if j >= 0 else None
+        if flags & HAS_ARGS:
+            params['args'] = float(self._args[i])
+        if flags & HAS_CONTROLS:
+            params['controls'] = int(self._controls[i])
+        if flags & HAS_UNITARY:
+            params['unitary'] = self._matrix_pool[self._unitaries[i]]
+        if flags & HAS_EXTRAS:
+            params.update(self._extras[i])
+        return params
+
+    def item(self, i: int) -> tuple[str, list[int], dict]:
+        """Return a gate as a tuple (name, qubits, params).
+        :param i: index of gate
+        :return: (name, qubits, params)
+        """
+        qs = self._qubits[self._qstart[i]:self._qstart[i + 1]].tolist()
+        return self._names[self._ops[i]], qs, self._params(i, int(self._flags[i]))
+
+    def iter_items(self, start: int = 0, stop: int | None = None):
+        """Iterate over the gates as tuples (name, qubits, params).
+        The columns are converted to Python lists in one step, so the
+        cost per gate is small.
+        :param start: index of first gate
+        :param stop: index after last gate (None => end)
+        :return: iterator of (name, qubits, params)
+        """
+        stop = self._n if stop is None else stop
+        names = self._names
+        ops = self._ops[start:stop].tolist()
+        flags = self._flags[start:stop].tolist()
+        qstart = self._qstart[start:stop + 1].tolist()
+        qubits = self._qubits[qstart[0]:qstart[-1]].tolist() if ops else []
+        base = qstart[0]
+        for j, op in enumerate(ops):
+            qs = qubits[qstart[j] - base:qstart[j + 1] - base]
+            yield names[op], qs, self._params(start + j, flags[j]) if flags[j] else {}
+
+
+class ModelItems(Sequence):
+    """Read-only sequence view of the gates of a model."""
+
+    def __init__(self, model: Model):
+        self._model = model
+
+    def __len__(self) -> int:
+        return len(self._model)
+
+    def __getitem__(self, index):
+        n = len(self._model)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            if step == 1:
+                return list(self._model.iter_items(start, max(start, stop)))
+            return [self._model.item(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('Gate index out of range')
+        return self._model.item(index)
+
+    def __iter__(self):
+        return self._model.iter_items()
@@ -1,13 +1,14 @@
 """
 Functions for plotting data.
 
+Matplotlib is only imported when a plot is drawn.
+
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 PI = '\u03C0'  # Unicode pi
@@ -19,27 +20,122 @@ BAR_WIDTH = 0.92  # Width of bar / pitch
 H_SPACE = 0.15  # Gap between plots
 TICK_ANGLE = 65  # Angle of tick labels (degrees)
 COLORS = ('#7bc8f6', '#ffa500', '#67a6eb', 'r', 'g', 'b')  # Colors for subplots
+TOP_K = 16  # Default number of bars for 'top' style
+BINS = 64  # Default maximum number of bins for 'bins' style
+MAX_BARS = 64  # Number of bars beyond which the plot width stops growing
+MAX_TICKS = 16  # Number of tick labels for 'line' style
+LINE_STEPS = 2048  # Max steps per line before drawing a min/max envelope
+
+
+def _labeler(keys):
+    """Return a function giving the label of each data index.
+    :param keys: list of labels, or number of bits for binary labels
+    :return: function index -> label
+    """
+    if isinstance(keys, int):
+        return lambda i: bin(i)[2:].zfill(keys)
+    keys = list(keys)
+    return lambda i: keys[i]
+
+
+def _select(keys, data: list[np.ndarray], style: str, k: int, bins: int, agg: str):
+    """Select or aggregate the data to be drawn as bars.
+    :param keys: list of labels, or number of bits for binary labels
+    :param data: list of data arrays
+    :param style: 'bars' | 'top' | 'bins'
+    :param k: number of bars for 'top' style
+    :param bins: maximum number of bins for 'bins' style
+    :param agg: aggregation for 'bins' style: 'sum' | 'mean'
+    :return: (labels, list of data arrays)
+    """
+    n = len(data[0])
+    label = _labeler(keys)
+    match style:
+        case 'bars':
+            return [label(i) for i in range(n)], data
+        case 'top':  # Largest magnitudes of first data set, in decreasing order
+            mag = np.abs(data[0])
+            idx = np.argpartition(-mag, k - 1)[:k] if k < n else np.arange(n)
+            idx = idx[np.argsort(-mag[idx], kind='stable')]
+            return [label(i) for i in idx.tolist()], [d[idx] for d in data]
+        case 'bins':  # Equal ranges of indices (e.g. leading bits for binary labels)
+            nbins = min(n, 2 ** max(0, int(bins).bit_length() - 1))  # Power of 2
+            starts = np.arange(nbins) * n // nbins
+            sizes = np.diff(np.append(starts, n))
+            binned = [np.add.reduceat(d, starts) for d in data]
+            if agg == 'mean':
+                binned = [b / sizes for b in binned]
+            if isinstance(keys, int) and n == 2 ** keys:  # Label bins by their leading bits
+                lead = nbins.bit_length() - 1
+                labels = [bin(i)[2:].zfill(lead)[:lead] for i in range(nbins)]
+            else:
+                labels = [label(i) for i in starts.tolist()]
+            if n > nbins:
+                labels = [t + '\u2026' for t in labels]
+            return labels, binned
+        case _:
+            raise ValueError(f'Invalid style: {style}')
+
+
+def _envelope(d: np.ndarray, steps: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reduce data to at most 'steps' steps for drawing as a filled line.
+    Long data is split into equal ranges of indices and each range is drawn
+    from its minimum to its maximum, so that isolated peaks remain visible.
+    :param d: data array
+    :param steps: maximum number of steps
+    :return: (values, edges, baseline)
+    """
+    n = len(d)
+    if n <= steps:
+        return d, np.arange(n + 1) - 0.5, 0
+    starts = np.arange(steps) * n // steps
+    upper = np.maximum(np.maximum.reduceat(d, starts), 0)
+    lower = np.minimum(np.minimum.reduceat(d, starts), 0)
+    return upper, np.append(starts, n) - 0.5, lower
 
 
 def plot_bars(keys, data, show=True, save: str = False, ylabels=None,
-              ylims: list[list[float]] | None = None, height=1) -> None:
+              ylims: list[list[float]] | None = None, height=1, style: str = 'bars',
+              k: int = TOP_K, bins: int = BINS, agg: str = 'sum') -> None:
     """Plot bar chart with one or more data sets.
-    :param keys: Labels for X ticks
+
+    For many outcomes, the styles 'top', 'bins' and 'line' draw a bounded
+    number of bars or a single line, so the time hardly depends on the
+    length of the data. The labels are then only created where needed.
+    The styles are:
+      - 'bars': one bar per item
+      - 'top': the 'k' items with the largest magnitude in the first data set
+      - 'bins': items aggregated into up to 'bins' equal ranges
+      - 'line': a filled step line per data set, with a limited number of ticks.
+        Long data is drawn as a min/max envelope of at most LINE_STEPS steps.
+    :param keys: Labels for X ticks, or number of bits for binary labels
     :param data: Array of data arrays
     :param show: Show the plot
     :param save: File name to save image (or None)
     :param ylabels: Array of Y axis labels for the subplots
     :param ylims: array of limits for the axes
     :param height: Scaling factor for plot height (default=1)
+    :param style: 'bars' | 'top' | 'bins' | 'line'
+    :param k: number of bars for 'top' style
+    :param bins: maximum number of bins for 'bins' style
+    :param agg: aggregation for 'bins' style: 'sum' | 'mean'
     """
+    import matplotlib.pyplot as plt
+
     nplots = len(data)
+    data = [np.asarray(d if isinstance(d, np.ndarray) else list(d)) for d in data]
 
     # Check that array lengths match
+    if not isinstance(keys, int):
+        keys = list(keys)
+    n_keys = 2 ** keys if isinstance(keys, int) else len(keys)
     for i in range(nplots):
-        assert len(keys) == len(data[i]), f'Array length mismatch for dataset {i}'
+        assert n_keys == len(data[i]), f'Array length mismatch for dataset {i}'
 
-    n_bars = len(keys)
-    width = max(WIDTH_1D, n_bars * 0.5)
+    if style != 'line':
+        keys, data = _select(keys, data, style, k, bins, agg)
+    n_bars = len(data[0]) if style == 'line' else len(keys)
+    width = max(WIDTH_1D, (n_bars if style == 'bars' else min(n_bars, MAX_BARS)) * 0.5)
     height *= HEIGHT_1D * nplots
     fig, ax = plt.subplots(nplots, 1, sharex=True)
     if nplots == 1:
@@ -61,9 +157,17 @@ def plot_bars(keys, data, show=True, save: str = False, ylabels=None,
         ax[i].axhline(y=0, lw=0.5, color='gray')
 
     # Plot the data
-    for i in range(nplots):
-        values = np.array(list(data[i]))
-        ax[i].bar(keys, values, width=BAR_WIDTH, color=COLORS[i])
+    if style == 'line':
+        label = _labeler(keys)
+        ticks = np.unique(np.linspace(0, n_bars - 1, min(n_bars, MAX_TICKS)).round().astype(int))
+        for i in range(nplots):
+            values, edges, baseline = _envelope(data[i], LINE_STEPS)
+            ax[i].stairs(values, edges, baseline=baseline, color=COLORS[i], fill=True)
+        ax[nplots - 1].set_xticks(ticks, [label(t) for t in ticks.tolist()])
+    else:
+        for i in range(nplots):
+            ax[i].bar(range(n_bars), data[i], width=BAR_WIDTH, color=COLORS[i])
+        ax[nplots - 1].set_xticks(range(n_bars), keys)
 
     # Add the tick labels at an angle
     for label in ax[nplots - 1].get_xmajorticklabels():
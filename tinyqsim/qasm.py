@@ -1,56 +1,512 @@
 """
-Export circuit in OpenQASM format (prototype).
+Export and import circuits in OpenQASM format (prototype).
+
+The importer reads its input line by line and buffers the gates in
+fixed-size chunks that are added to the model in bulk, so memory use
+does not depend on the length of the file.
 
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024-25 Jon Brumfitt
 """
 
-from io import StringIO
+import ast
+import cmath
+import math
+import operator
+import re
+from collections.abc import Iterable
+from functools import lru_cache
+from os import PathLike
+from typing import TextIO
+
+import numpy as np
+from numpy import ndarray
 
+from tinyqsim.format import format_float
+from tinyqsim.gates import GATES, PARAM_GATES, gate_info
 from tinyqsim.model import Model
+from tinyqsim.quantum import n_qubits
 
 # QASM = 'OPENQASM 2.0;\ninclude "qelib1.inc";'
 QASM = 'OPENQASM 3;\ninclude "stdgates.inc";'
 
-# Note: u, cu and ccu are omitted as they use angles in OpenQASM instead of matrices.
-#       The i, cs and ct gates are excluded as they are not supported by OpenQASM-3.
+# Note: The i, cs, ct and ccz gates are not in the OpenQASM-3 standard library,
+#       so they are written using the 'id' gate and 'ctrl @' modifiers.
 SIMPLE_GATES = ['ccx', 'ch', 'cp', 'crx', 'cry', 'crz', 'cswap', 'cx', 'cy', 'cz', 'h', 'hs', 'p',
                 'rx', 'ry', 'rz', 's', 'sdg', 'swap', 'sx', 't', 'tdg', 'x', 'y', 'z']
+MODIFIED_GATES = {'i': 'id', 'cs': 'ctrl @ s', 'ct': 'ctrl @ t', 'ccz': 'ctrl @ cz'}
 
+CHUNK_LINES = 1024  # Number of lines per chunk yielded by 'iter_qasm'
+TOL = 1e-12  # Tolerance for the decomposition of unitary matrices
 
-def _write_gate(f: StringIO, name: str, args: str, qubits: list[int]) -> None:
-    """Write a single gate entry to StringIO.
-    :param f: file-like object
+
+def _gate_line(name: str, args, qubits: list[int]) -> str:
+    """Return a single gate statement.
     :param name: gate name
-    :param args: gate arguments
+    :param args: gate arguments ('' => none)
     :param qubits: gate qubits
+    :return: statement
     """
     if args != '':
         args = '(' + str(args) + ')'
-    f.write(f'{name}{args} ')
     qargs = ','.join([f'q[{i}]' for i in qubits])
-    f.write(f'{qargs};\n')
+    return f'{name}{args} {qargs};\n'
+
+
+def _u_angles(v: ndarray) -> tuple[float, float, float, float]:
+    """Return (alpha, theta, phi, lambda) such that v = exp(i alpha) U(theta, phi, lambda),
+    where U is the OpenQASM 3 single-qubit gate.
+    :param v: 2x2 unitary matrix
+    :return: (alpha, theta, phi, lambda)
+    """
+    theta = 2 * math.atan2(abs(v[1, 0]), abs(v[0, 0]))
+    if abs(v[0, 0]) > TOL:
+        alpha = cmath.phase(v[0, 0])
+        w = v * cmath.exp(-1j * alpha)
+        if abs(v[1, 0]) > TOL:
+            phi, lam = cmath.phase(w[1, 0]), cmath.phase(-w[0, 1])
+        else:
+            phi, lam = 0.0, cmath.phase(w[1, 1])
+    else:
+        alpha = cmath.phase(v[1, 0])
+        w = v * cmath.exp(-1j * alpha)
+        phi, lam = 0.0, cmath.phase(-w[0, 1])
+    return alpha, theta, phi, lam
+
+
+def decompose_unitary(u: ndarray) -> list[tuple[int, int, ndarray]]:
+    """Decompose a unitary into two-level unitaries acting on basis states
+    that differ in one bit, i.e. single-qubit gates with all the other
+    qubits as (positive or negative) controls.\n
+    The basis states are taken in Gray-code order, so that adjacent states
+    differ in one bit, and the matrix is reduced to the identity by Givens
+    rotations of adjacent rows followed by phase corrections.
+    :param u: unitary matrix of size 2^k
+    :return: list of (state with target bit 0, target bit position, 2x2 matrix),
+             in circuit order
+    """
+    n = len(u)
+    gray = [i ^ (i >> 1) for i in range(n)]
+    a = np.array(u, dtype=complex)
+    ops = []  # Operations reducing 'a' to the identity
+
+    def two_level(s0: int, s1: int, g: ndarray) -> None:
+        """Apply 2x2 'g' to rows s0, s1 of 'a' and record it."""
+        a[[s0, s1], :] = g @ a[[s0, s1], :]
+        bit = s0 ^ s1
+        if s0 & bit:  # Order the pair by the value of the target bit
+            s0, s1, g = s1, s0, g[::-1, ::-1]
+        ops.append((s0, bit.bit_length() - 1, g))
+
+    for col in range(n - 1):
+        c = gray[col]
+        for r in range(n - 1, col, -1):
+            s0, s1 = gray[r - 1], gray[r]
+            x, y = a[s0, c], a[s1, c]
+            if abs(y) > TOL:
+                norm = math.hypot(abs(x), abs(y))
+                two_level(s0, s1, np.array([[x.conjugate(), y.conjugate()], [-y, x]]) / norm)
+    for r in range(n - 1, -1, -1):
+        s = gray[r]
+        d = a[s, s]
+        if abs(d - 1) > TOL:
+            other = gray[r - 1] if r > 0 else gray[1]
+            two_level(s, other, np.diag([d.conjugate(), 1]))
+
+    # U = O_1^dagger ... O_m^dagger, so apply O_m^dagger first
+    return [(s0, bit, g.conj().T) for (s0, bit, g) in reversed(ops)]
+
+
+def _unitary_definition(name: str, u: ndarray) -> str:
+    """Return an OpenQASM 3 gate definition for a unitary matrix.
+    :param name: name of gate
+    :param u: unitary matrix
+    :return: gate definition
+    """
+    k = n_qubits(u)
+    args = [f'a{j}' for j in range(k)]
+    lines = [f'gate {name} {", ".join(args)} {{\n']
+    for (s0, bit, g) in decompose_unitary(u):
+        target = k - 1 - bit
+        controls = [j for j in range(k) if j != target]
+        mods = ''.join(['ctrl @ ' if s0 >> (k - 1 - j) & 1 else 'negctrl @ ' for j in controls])
+        cargs = [args[j] for j in controls]
+        alpha, theta, phi, lam = _u_angles(g)
+        lines.append(f'  {mods}U({theta}, {phi}, {lam}) {", ".join(cargs + [args[target]])};\n')
+        if abs(alpha) > TOL:
+            if controls:
+                lines.append(f'  {mods}gphase({alpha}) {", ".join(cargs)};\n')
+            else:
+                lines.append(f'  gphase({alpha});\n')
+    lines.append('}\n')
+    return ''.join(lines)
 
 
-def to_qasm(model: Model):
-    """Return an OpenQASM representation of a circuit.
-    This does not currently support measurement, resets or 'U' gates.
-    Gates i, cs & ct are not in the OpenQASM-3 specification.
+def iter_qasm(model: Model, chunk_lines: int = CHUNK_LINES):
+    """Generate an OpenQASM 3 representation of a circuit in chunks.
+    Measurements are written to a 'bit' register 'c' with one bit per qubit.
+    Custom unitaries are written as gate definitions before their first use.
     :param model: Circuit model
-    :return: StringIO representation of circit 'qc'
+    :param chunk_lines: approximate number of lines per chunk
+    :return: iterator of strings
     """
     nq = model.n_qubits
+    lines = [f'{QASM}\n', f'qreg q[{nq}];\n']
+    if 'measure' in model.gate_names:
+        lines.append(f'bit[{nq}] c;\n')
+    defined = {}  # id(unitary) -> gate name
+
+    for (uc_name, qubits, params) in model.items:
+        name = uc_name.lower()
+        args = params.get('args', '')
+        if name in SIMPLE_GATES:
+            lines.append(_gate_line(name, args, qubits))
+        elif name in MODIFIED_GATES:
+            lines.append(_gate_line(MODIFIED_GATES[name], args, qubits))
+        elif name == 'measure':
+            lines.extend([f'c[{i}] = measure q[{i}];\n' for i in qubits])
+        elif name == 'reset':
+            lines.append(_gate_line('reset', '', qubits))
+        elif name == 'barrier':
+            lines.append('barrier q;\n')
+        elif name == 'u':
+            u = params['unitary']
+            gname = defined.get(id(u))
+            if gname is None:
+                gname = defined[id(u)] = f'u{len(defined)}'
+                lines.append(_unitary_definition(gname, u))
+            lines.append(_gate_line(gname, '', qubits))
+        else:
+            raise ValueError(f'Gate not supported: {name}')
+        if len(lines) >= chunk_lines:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_qasm(model: Model, stream: TextIO) -> None:
+    """Write an OpenQASM 3 representation of a circuit to a text stream.
+    The output is written in chunks, so memory use does not depend on the
+    size of the circuit.
+    :param model: Circuit model
+    :param stream: text stream, e.g. an open file
+    """
+    for chunk in iter_qasm(model):
+        stream.write(chunk)
+
+
+def to_qasm(model: Model) -> str:
+    """Return an OpenQASM 3 representation of a circuit.
+    :param model: Circuit model
+    :return: OpenQASM representation of the circuit
+    """
+    return ''.join(iter_qasm(model))
+
+
+# ---------- Import ----------
+
+PI = '\u03C0'  # Unicode pi
+CHUNK = 65536  # Number of gates buffered before adding them to the model
+MAX_ARITY = 3  # Maximum number of qubits of a gate in GATES
+
+""" Map from OpenQASM gate name to TinyQsim gate name."""
+IMPORT_GATES = {name.lower(): name for name in GATES} | {'id': 'I', 'cnot': 'CX'}
+
+""" Number of qubits of each gate."""
+_ARITY = {name: n_qubits(gate_info(name, 0.0 if name in PARAM_GATES else None).matrix)
+          for name in GATES}
 
-    with StringIO() as f:
-        f.write(f'{QASM}\n')
-        f.write(f'qreg q[{nq}];\n')
+_RE_QREG = re.compile(r'qreg\s+(\w+)\s*\[\s*(\d+)\s*]')
+_RE_QUBIT = re.compile(r'qubit\s*(?:\[\s*(\d+)\s*])?\s+(\w+)')
+_RE_CREG = re.compile(r'(?:creg\s+\w+\s*\[\s*\d+\s*]|bit\s*(?:\[\s*\d+\s*])?\s+\w+)')
+_RE_MEASURE = re.compile(r'(?:.*=\s*)?measure\s+(.+?)\s*(?:->.*)?')
+_RE_GATE = re.compile(r'(\w+)\s*(?:\((.*)\)\s*|\s+)(.+)')
+_RE_CTRL = re.compile(r'ctrl\s*(?:\(\s*(\d+)\s*\))?\s*@\s*')
+_RE_PI = re.compile(r'\bpi\b')
+_RE_OPERAND = re.compile(r'(\w+)\s*(?:\[\s*(\d+)\s*])?')
 
-        for (uc_name, qubits, params) in model.items:
-            name = uc_name.lower()
-            args = params.get('args', '')
-            if name in SIMPLE_GATES:
-                _write_gate(f, name, args, qubits)
+_CONSTANTS = {'pi': math.pi, PI: math.pi, 'tau': math.tau, 'euler': math.e}
+_FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'arcsin': math.asin,
+              'arccos': math.acos, 'arctan': math.atan, 'exp': math.exp, 'ln': math.log,
+              'sqrt': math.sqrt}
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+              ast.Div: operator.truediv, ast.Pow: operator.pow,
+              ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+
+def _eval_node(node: ast.AST) -> float:
+    """Evaluate a node of a parsed angle expression.
+    :param node: AST node
+    :return: value
+    """
+    match node:
+        case ast.Constant(value=int() | float() as value):
+            return float(value)
+        case ast.Name(id=name) if name in _CONSTANTS:
+            return _CONSTANTS[name]
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in _OPERATORS:
+            return _OPERATORS[type(op)](_eval_node(left), _eval_node(right))
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in _OPERATORS:
+            return _OPERATORS[type(op)](_eval_node(operand))
+        case ast.Call(func=ast.Name(id=name), args=[arg], keywords=[]) if name in _FUNCTIONS:
+            return _FUNCTIONS[name](_eval_node(arg))
+        case _:
+            raise ValueError('Unsupported expression')
+
+
+def eval_angle(expr: str) -> float:
+    """Evaluate an OpenQASM angle expression safely.
+    Only numbers, the constants pi, tau and euler, arithmetic operators
+    and elementary functions are allowed.
+    :param expr: expression text
+    :return: value
+    """
+    try:
+        return float(expr)
+    except ValueError:
+        pass
+    try:
+        return _eval_node(ast.parse(expr.strip(), mode='eval').body)
+    except (SyntaxError, ValueError, ZeroDivisionError):
+        raise ValueError(f'Invalid angle expression: {expr}') from None
+
+
+@lru_cache(maxsize=4096)
+def _parse_angle(expr: str) -> tuple[float, str]:
+    """Return the value and label of an angle expression.
+    Numbers are labelled with their formatted value and symbolic
+    expressions with their text, e.g. 'pi/2' -> '\u03C0/2'.
+    :param expr: expression text
+    :return: (value, label)
+    """
+    try:
+        value = float(expr)
+        return value, format_float(value, 3, True)
+    except ValueError:
+        return eval_angle(expr), _RE_PI.sub(PI, ''.join(expr.split()))
+
+
+def _statements(lines: Iterable[str]):
+    """Split lines of OpenQASM into statements, removing comments.
+    :param lines: iterable of lines
+    :return: iterator of (statement, line number)
+    """
+    pending = ''
+    in_comment = False
+    for lineno, line in enumerate(lines, 1):
+        if in_comment or '/' in line:
+            # Scan left to right, so whichever of '//' or '/*' comes first wins
+            text = ''
+            while line:
+                if in_comment:
+                    end = line.find('*/')
+                    if end < 0:
+                        line = ''
+                    else:
+                        line, in_comment = line[end + 2:], False
+                else:
+                    block, eol = line.find('/*'), line.find('//')
+                    if block < 0 and eol < 0:
+                        text, line = text + line, ''
+                    elif block < 0 or 0 <= eol < block:
+                        text, line = text + line[:eol], ''
+                    else:
+                        text, line, in_comment = text + line[:block], line[block + 2:], True
+            line = text
+        line = line.rstrip('\n') + '\n'  # Keep statements split across lines apart
+        if ';' not in line:
+            pending += line
+            continue
+        *complete, rest = line.split(';')
+        complete[0] = pending + complete[0]
+        pending = rest
+        for stmt in complete:
+            stmt = stmt.strip()
+            if '\n' in stmt:
+                stmt = ' '.join(stmt.split())
+            if stmt:
+                yield stmt, lineno
+    if in_comment:
+        raise ValueError('Unterminated comment at end of input')
+    if pending.strip():
+        raise ValueError('Unterminated statement at end of input')
+
+
+class _Importer:
+    """State of an OpenQASM import."""
+
+    def __init__(self):
+        self.registers: dict[str, tuple[int, int]] = {}  # name -> (offset, size)
+        self.nqubits = 0
+        self.model = None
+        self.cache: dict[str, list[int]] = {}  # Operand text -> qubits
+        self.names = []  # Buffered gates
+        self.qubits = []
+        self.args = []
+        self.labels = []
+
+    def declare(self, name: str, size: int) -> None:
+        """Declare a quantum register."""
+        if self.model is not None:
+            raise ValueError('Registers must be declared before use')
+        if name in self.registers:
+            raise ValueError(f'Register already declared: {name}')
+        self.registers[name] = (self.nqubits, size)
+        self.nqubits += size
+
+    def operands(self, text: str) -> list[int]:
+        """Return the qubits of a comma-separated list of operands.
+        A register name without an index denotes all its qubits.
+        """
+        qubits = self.cache.get(text)
+        if qubits is not None:
+            return qubits
+        qubits = []
+        for operand in text.split(','):
+            m = _RE_OPERAND.fullmatch(operand.strip())
+            if not m or m[1] not in self.registers:
+                raise ValueError(f'Invalid operand: {operand.strip()}')
+            offset, size = self.registers[m[1]]
+            if m[2] is None:
+                qubits.extend(range(offset, offset + size))
+            elif int(m[2]) < size:
+                qubits.append(offset + int(m[2]))
             else:
-                raise ValueError(f'Gate not supported: {name}')
+                raise ValueError(f'Qubit index out of range: {operand.strip()}')
+        if len(self.cache) >= CHUNK:
+            self.cache.clear()
+        self.cache[text] = qubits
+        return qubits
+
+    def get_model(self) -> Model:
+        """Return the model, creating it when the first operation is added."""
+        if self.model is None:
+            if self.nqubits == 0:
+                raise ValueError('No qubits declared')
+            self.model = Model(self.nqubits)
+        return self.model
+
+    def add_gate(self, name: str, qubits: list[int], angle: float, label: str | None) -> None:
+        """Buffer a gate."""
+        self.names.append(name)
+        self.qubits.extend(qubits)
+        self.args.append(angle)
+        self.labels.append(label)
+        if len(self.names) == CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        """Add the buffered gates to the model in bulk."""
+        n = len(self.names)
+        if n == 0:
+            return
+        names = np.array(self.names)
+        uniq, inverse = np.unique(names, return_inverse=True)
+        nqubits = np.array([_ARITY[u] for u in uniq.tolist()])[inverse]
+        controls = np.array([gate_info(u, 1.0 if u in PARAM_GATES else None).controls
+                             for u in uniq.tolist()])[inverse]
+        used = np.arange(MAX_ARITY) < nqubits[:, None]
+        qubits = np.full((n, MAX_ARITY), -1, dtype=np.int64)
+        qubits[used] = self.qubits
+        distinct = np.sort(np.where(used, qubits, -1 - np.arange(MAX_ARITY)), axis=1)
+        if np.any(distinct[:, 1:] == distinct[:, :-1]):
+            raise ValueError('Repeated qubit indices')
+        self.get_model().add_gates(names, qubits, nqubits, self.args, self.labels, controls)
+        self.names = []
+        self.qubits = []
+        self.args = []
+        self.labels = []
+
+    def add_item(self, name: str, qubits: list[int], params: dict) -> None:
+        """Add a non-gate item to the model, after any buffered gates."""
+        self.flush()
+        self.get_model().add_gate(name, qubits, params)
+
+    def statement(self, stmt: str) -> None:
+        """Process one statement."""
+        body, controls = stmt, 0
+        while body.startswith('ctrl') and (m := _RE_CTRL.match(body)):  # e.g. 'ctrl @ s'
+            controls += int(m[1] or 1)
+            body = body[m.end():]
+        m = _RE_GATE.fullmatch(body)
+        name = IMPORT_GATES.get('c' * controls + m[1]) if m else None
+        if name is not None:
+            self.gate(name, m[2], m[3], stmt)
+            return
+        if controls:
+            raise ValueError(f'Unsupported statement: {stmt}')
 
-        return f.getvalue()
+        keyword = stmt.split(None, 1)[0]
+        match keyword:
+            case 'OPENQASM' | 'include':
+                return
+            case 'qreg':
+                m = _RE_QREG.fullmatch(stmt)
+                if not m:
+                    raise ValueError(f'Invalid declaration: {stmt}')
+                self.declare(m[1], int(m[2]))
+                return
+            case _ if keyword.startswith('qubit'):
+                m = _RE_QUBIT.fullmatch(stmt)
+                if not m:
+                    raise ValueError(f'Invalid declaration: {stmt}')
+                self.declare(m[2], int(m[1] or 1))
+                return
+            case 'reset':
+                for q in self.operands(stmt[5:]):
+                    self.add_item('reset', [q], {})
+                return
+            case 'barrier':
+                self.add_item('barrier', [0, self.get_model().n_qubits - 1], {'label': None})
+                return
+        if _RE_CREG.fullmatch(stmt):
+            return
+        m = _RE_MEASURE.fullmatch(stmt)
+        if m:
+            self.add_item('measure', self.operands(m[1]), {})
+            return
+        raise ValueError(f'Unsupported statement: {stmt}')
+
+    def gate(self, name: str, angle: str | None, operands: str, stmt: str) -> None:
+        """Process a gate statement."""
+        qubits = self.operands(operands)
+        if len(qubits) != _ARITY[name]:
+            raise ValueError(f'Wrong number of qubits: {stmt}')
+        if name in PARAM_GATES:
+            if angle is None:
+                raise ValueError(f'Missing angle: {stmt}')
+            self.add_gate(name, qubits, *_parse_angle(angle))
+        elif angle is not None:
+            raise ValueError(f'Unexpected angle: {stmt}')
+        else:
+            self.add_gate(name, qubits, np.nan, None)
+
+
+def from_qasm(source: str | PathLike | Iterable[str]) -> Model:
+    """Create a circuit model from OpenQASM 2 or 3.
+    The input is read line by line. Gates of GATES, measure, reset and
+    barrier are supported, but not gate definitions or classical control.
+    :param source: path of a file, or iterable of lines
+    :return: circuit model
+    """
+    importer = _Importer()
+    if isinstance(source, (str, PathLike)):
+        with open(source) as f:
+            _import_lines(importer, f)
+    else:
+        _import_lines(importer, source)
+    importer.flush()
+    return importer.get_model()
+
+
+def _import_lines(importer: _Importer, lines: Iterable[str]) -> None:
+    """Process lines of OpenQASM.
+    :param importer: import state
+    :param lines: iterable of lines
+    """
+    for stmt, lineno in _statements(lines):
+        try:
+            importer.statement(stmt)
+        except ValueError as e:
+            raise ValueError(f'Line {lineno}: {e}') from None
@@ -5,19 +5,24 @@ Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+from collections.abc import Iterable
 from math import isclose
+from numbers import Integral
+from os import PathLike
 
 import numpy as np
-from IPython.display import Math, display
 from numpy import ndarray
 from numpy.linalg import norm
 
-from tinyqsim import gates, quantum, utils, format, unitary_sim, qasm, bloch
+from tinyqsim import (gates, quantum, utils, format, unitary_sim, qasm, bloch, tensor_net,
+                      composite, compiler, storage, render, entanglement)
 from tinyqsim.format import state_kets, format_table
 from tinyqsim.model import Model
-from tinyqsim.plotting import plot_bars
+from tinyqsim.plotting import plot_bars, TOP_K, BINS
+from tinyqsim.profiler import Profiler
 from tinyqsim.schematic import Schematic
-from tinyqsim.simulator import Simulator
+from tinyqsim.simulator import Simulator, CHECKPOINT_BYTES
+from tinyqsim.sparse_sim import SparseSimulator
 
 PI = '\u03C0'  # Unicode pi
 
@@ -29,23 +34,78 @@ class QCircuit(object):
         A QCircuit instance represents a quantum circuit, with methods to add
         gates, query the state, plot data and perform quantum measurements.
 
+        Matplotlib and IPython are only imported when they are first used
+        (e.g. by draw, plot_* or display_state), so simulation alone starts quickly.
+
         The big-endian qubit convention is used.
     """
 
-    def __init__(self, nqubits: int, init='zeros', auto_exec=True) -> None:
-        """Initialize QCircuit.
+    def __init__(self, nqubits: int, init='zeros', auto_exec=True, backend='dense',
+                 lazy=False) -> None:
+        """Initialize QCircuit.\n
+        The 'sparse' backend stores only the nonzero amplitudes, switching to
+        'dense' automatically when the state fills up. It suits permutation-heavy
+        circuits (e.g. reversible arithmetic) with many qubits.\n
+        In 'lazy' mode, gates are queued and nothing is allocated until the
+        state is observed (e.g. state_vector, probabilities, counts, measure or
+        plotting). The queued gates are then optimized and executed in one pass.
+        The behavior is otherwise the same as with auto_exec.
            :param: nqubits: number of qubits
            :param: init: initialization mode: 'zeros' or 'random'
            :param: auto_exec: Enable on-the-fly execution
+           :param: backend: simulator backend: 'dense' or 'sparse'
+           :param: lazy: Enable lazy execution
         """
+        if backend not in ('dense', 'sparse'):
+            raise ValueError(f'Invalid backend: {backend}')
+        if init == 'none':
+            raise ValueError(f'Invalid init state: {init}')
         self._nqubits = nqubits
         self._init = init
-        self._auto_exec = auto_exec
+        self._backend = backend
+        self._lazy = lazy
+        self._auto_exec = auto_exec and not lazy
+        self._pending = 0  # Index of first unexecuted gate (lazy mode)
+        self._profiler = None  # Profiler attached to the simulator (None => disabled)
         self._model = Model(nqubits)
         self._schematic = Schematic(nqubits)
-        self._simulator = Simulator(nqubits, init)
+        self._sim = None if lazy else self._new_simulator()
         self._gates = gates.GATES
 
+    def _new_simulator(self) -> Simulator:
+        """Create a simulator for the selected backend.
+        :return: simulator
+        """
+        if self._backend == 'sparse':
+            sim = SparseSimulator(self._nqubits, self._init)
+        else:
+            sim = Simulator(self._nqubits, self._init)
+        sim.profiler = self._profiler
+        return sim
+
+    @property
+    def _simulator(self) -> Simulator:
+        """Return the simulator, first executing any queued gates in lazy mode.
+        :return: simulator
+        """
+        if self._lazy:
+            self._flush()
+        return self._sim
+
+    def _flush(self) -> None:
+        """Execute the queued gates (lazy mode)."""
+        if self._sim is None:
+            self._sim = self._new_simulator()
+        if self._pending < len(self._model):
+            items = self._model.iter_items(self._pending)
+            self._pending = len(self._model)
+            if self._profiler is None:
+                items = compiler.compile_items(items)
+            else:
+                with self._profiler.phase('compile'):
+                    items = compiler.compile_items(items)
+            self._sim.run(items)
+
     # -------------------------- Properties --------------------------
 
     @property
@@ -110,7 +170,7 @@ class QCircuit(object):
         self._check_qubits(qubits)
         self._model.add_gate(name, qubits, params)
         if self._auto_exec:
-            self._simulator.apply(self._gates[name], qubits)
+            self._simulator.apply_info(gates.gate_info(name), qubits)
 
     def _add_gates(self, name: str, qubits: list[int], params: dict = None) -> None:
         """ Add zero or more one-qubit gates to the model.
@@ -121,10 +181,11 @@ class QCircuit(object):
         if len(qubits) == 0:
             return
         self._check_qubits(qubits)
+        info = gates.gate_info(name)
         for q in qubits:
             self._model.add_gate(name, [q], params)
             if self._auto_exec:
-                self._simulator.apply(self._gates[name], [q])
+                self._simulator.apply_info(info, [q])
 
     def _add_param_gate(self, name: str, qubits: list[int], params: dict) -> None:
         """ Add a parameterized gate operating on one or more qubits to the model.
@@ -135,8 +196,7 @@ class QCircuit(object):
         self._check_qubits(qubits)
         self._model.add_gate(name, qubits, params)
         if self._auto_exec:
-            u = self._gates[name](params['args'])
-            self._simulator.apply(u, qubits)
+            self._simulator.apply_info(gates.gate_info(name, params['args']), qubits)
 
     def _add_param_gates(self, name: str, qubits: list[int], params: dict) -> None:
         """ Add zero or more one-qubit parameterized gates to the model.
@@ -147,16 +207,21 @@ class QCircuit(object):
         if len(qubits) == 0:
             return
         self._check_qubits(qubits)
-        u = self._gates[name](params['args'])
+        info = gates.gate_info(name, params['args'])
         for q in qubits:
             self._model.add_gate(name, [q], params)
             if self._auto_exec:
-                self._simulator.apply(u, [q])
+                self._simulator.apply_info(info, [q])
 
     def _add_measure(self, qubits: list[int]) -> ndarray | None:
         """ Add a measurement to the model.
             :param qubits: list of qubits
         """
+        if self._lazy:  # Measurement observes the state
+            sim = self._simulator
+            self._model.add_gate('measure', qubits)
+            self._pending += 1
+            return sim.measure(qubits)
         self._model.add_gate('measure', qubits)
         if self._auto_exec:
             return self._simulator.measure(qubits)
@@ -171,12 +236,14 @@ class QCircuit(object):
         if self._auto_exec:
             self._simulator.reset(qubit)
 
-    def _add_unitary(self, name: str, u: ndarray, qubits: list[int], params: dict) -> None:
+    def _add_unitary(self, name: str, u: ndarray, qubits: list[int], params: dict,
+                     check: bool = True) -> None:
         """ Add a unitary matrix to the model.
             :param name: name of the gate
             :param u: unitary matrix
             :param qubits: qubits
             :param params: Parameter dictionary
+            :param check: check that the matrix is unitary (False if already checked)
         """
         self._check_qubits(qubits)
         if 2 ** len(qubits) != len(u):
@@ -185,11 +252,77 @@ class QCircuit(object):
         params['label'] = name
         params['unitary'] = u
         self._model.add_gate('U', qubits, params)
-        if self._auto_exec:
+        if check and (self._auto_exec or self._lazy):
             if not utils.is_unitary(u):
                 raise ValueError('Matrix must be unitary')
+        if self._auto_exec:
             self._simulator.apply(u, qubits)
 
+    def extend(self, names, qubits, angles=None, labels=None) -> None:
+        """Add many gates to the circuit in one step.\n
+        This is much faster than calling the gate methods in a loop: the
+        arguments are validated in one vectorized pass, appended to the model
+        together and, if auto_exec is enabled, executed together at the end.
+        The qubits may be a 2D array with one row per gate, padded with -1
+        for gates with fewer qubits, or a list of lists.
+        :param names: name of each gate, e.g. 'H', 'CX', 'RZ'
+        :param qubits: qubits of each gate
+        :param angles: angle of each gate (ignored for non-parameterized gates)
+        :param labels: label of each parameterized gate (None => formatted angle)
+        """
+        names = np.asarray(names, dtype=str).ravel()
+        n = len(names)
+        if n == 0:
+            return
+        try:
+            qs = np.asarray(qubits, dtype=np.int64).reshape(n, -1)
+        except ValueError:  # Ragged list of lists
+            rows = [np.atleast_1d(r) for r in qubits]
+            lengths = np.array([len(r) for r in rows])
+            qs = np.full((n, lengths.max()), -1, dtype=np.int64)
+            qs[np.arange(qs.shape[1]) < lengths[:, None]] = np.concatenate(rows)
+
+        # Look up each distinct gate once
+        uniq, inverse = np.unique(names, return_inverse=True)
+        infos = []
+        for name in uniq.tolist():
+            if name not in gates.GATES:
+                raise ValueError(f'Invalid gate: {name}')
+            param = name in gates.PARAM_GATES
+            info = gates.gate_info(name, 1.0 if param else None)
+            infos.append((quantum.n_qubits(info.matrix), info.controls, param))
+        arity, controls, is_param = (np.array(col)[inverse] for col in zip(*infos))
+
+        # Validate qubits
+        k = qs.shape[1]
+        used = np.arange(k) < arity[:, None]
+        if k < np.max(arity) or np.any(qs[~used] != -1):
+            raise ValueError('Wrong number of qubit indices')
+        if np.min(qs[used]) < 0 or np.max(qs[used]) >= self._nqubits:
+            raise ValueError('Qubit indices out of range')
+        distinct = np.sort(np.where(used, qs, -1 - np.arange(k)), axis=1)
+        if np.any(distinct[:, 1:] == distinct[:, :-1]):
+            raise ValueError('Repeated qubit indices')
+
+        # Validate angles and labels
+        args, labs = None, None
+        if np.any(is_param):
+            if angles is None:
+                raise ValueError('Angles required for parameterized gates')
+            args = np.where(is_param, np.asarray(angles, dtype=float).ravel(), np.nan)
+            if np.any(np.isnan(args[is_param])):
+                raise ValueError('Missing angle for parameterized gate')
+            if labels is None:
+                labs = [format.format_float(a, 3, True) if p else None
+                        for a, p in zip(args.tolist(), is_param.tolist())]
+            else:
+                labs = [lab if p else None for lab, p in zip(labels, is_param.tolist())]
+
+        start = len(self._model)
+        self._model.add_gates(names, qs, arity, args, labs, controls)
+        if self._auto_exec:
+            self._simulator.run(self._model.iter_items(start))
+
     # ----------------- Execution of quantum circuit ----------------
 
     def execute(self, init='zeros') -> None:
@@ -197,8 +330,51 @@ class QCircuit(object):
         The init='none' option skips the initialization.
         :param init: Initial state - 'zeros' | 'random' | 'none'
         """
+        if self._lazy:
+            self._pending = len(self._model)
+            if self._sim is None:
+                self._sim = self._new_simulator()
         self._simulator.execute(self._model, init)
 
+    def set_checkpoints(self, every: int | None = None, max_bytes: int = CHECKPOINT_BYTES) -> None:
+        """Enable checkpoints so that re-execution resumes from a saved state.\n
+        The state is saved at barriers and, optionally, every 'every' gates.
+        When the circuit is re-executed, e.g. after appending gates with
+        auto_exec=False, execution resumes from the latest checkpoint whose
+        prefix of the circuit is unchanged.
+        :param every: also checkpoint every 'every' gates (None => barriers only)
+        :param max_bytes: memory budget in bytes (0 => disable)
+        """
+        self._simulator.set_checkpoints(every, max_bytes)
+
+    def set_profiler(self, profiler: Profiler | None) -> None:
+        """Attach a profiler to record the execution of each operation.
+        Pass None to disable profiling. See also 'profile'.
+        :param profiler: profiler (None => disable)
+        """
+        self._profiler = profiler
+        if self._sim is not None:
+            self._sim.profiler = profiler
+
+    def profile(self, by: str = 'name', trace: str | PathLike | None = None) -> str:
+        """Re-execute the circuit with profiling and return a summary table.
+        The table shows the count, time and memory bandwidth of each gate
+        type (or kernel), in decreasing order of time.
+        :param by: aggregate by 'name' (gate type) or 'kernel'
+        :param trace: file for a Chrome trace / Perfetto JSON export (or None)
+        :return: summary table
+        """
+        previous = self._profiler
+        profiler = Profiler()
+        self.set_profiler(profiler)
+        try:
+            self.execute()
+        finally:
+            self.set_profiler(previous)
+        if trace:
+            profiler.write_chrome_trace(trace)
+        return profiler.format_summary(by)
+
     def to_unitary(self):
         """Return unitary matrix of this circuit.
         The circuit must not contain measurements or resets.
@@ -206,6 +382,21 @@ class QCircuit(object):
         """
         return unitary_sim.UnitarySimulator().execute(self._model)
 
+    def amplitude(self, bitstrings: str | int | list[str | int],
+                  method: str = 'greedy') -> complex | ndarray:
+        """Return amplitudes <x|C|0...0> of the circuit for basis states 'x'.\n
+        The amplitudes are computed by tensor-network contraction of the circuit,
+        independently of the current state, so this works for shallow circuits
+        with too many qubits to simulate (use auto_exec=False and backend='sparse').
+        The circuit must not contain measurements or resets.
+        :param bitstrings: basis state, or list of basis states, as binary strings or integers
+        :param method: contraction path finder: 'greedy' | 'optimal'
+        :return: amplitude, or array of amplitudes
+        """
+        if isinstance(bitstrings, (str, Integral)):
+            return tensor_net.amplitudes(self._model, [bitstrings], method)[0].item()
+        return tensor_net.amplitudes(self._model, bitstrings, method)
+
     # -------------- Obtain information about the state -------------
 
     def format_state(self, mode='kets', decimals: int = 5, include_zeros: bool = False,
@@ -245,6 +436,7 @@ class QCircuit(object):
         """
         ltx = format.latex_state(self._simulator.state_vector, prefix=prefix,
                                  decimals=decimals, include_zeros=include_zeros, trim=trim)
+        from IPython.display import Math, display
         display(Math(ltx))
 
     def format_probabilities(self, *qubits: int, decimals: int = 5,
@@ -261,7 +453,7 @@ class QCircuit(object):
         if not qubits:
             qubits = range(self._nqubits)
 
-        probs = quantum.probabilities(self._simulator.state_vector, qubits)
+        probs = self._simulator.probabilities(list(qubits))
         return format_table(probs, decimals=decimals, include_zeros=include_zeros,
                             trim=trim, edge=edge)
 
@@ -270,9 +462,19 @@ class QCircuit(object):
             :param qubits: qubits (None => all)
             :return: dictionary mapping basis-state->probability value
         """
+        return self.probability_mapping(*qubits).to_dict()
+
+    def probability_mapping(self, *qubits: int) -> quantum.BitstringMapping:
+        """ Return a mapping of the probabilities of each outcome.
+
+        This behaves like 'probability_dict', but the keys are only created
+        when they are iterated, so it is cheap for many qubits.
+            :param qubits: qubits (None => all)
+            :return: mapping of basis-state->probability value
+        """
         if not qubits:
             qubits = range(self._nqubits)
-        return quantum.probability_dict(self._simulator.state_vector, qubits)
+        return quantum.BitstringMapping(len(qubits), self.probability_array(*qubits))
 
     # FIXME: Return type might change to be like state_vector (TBC)
     def probability_array(self, *qubits) -> ndarray:
@@ -282,64 +484,127 @@ class QCircuit(object):
         """
         if not qubits:
             qubits = range(self._nqubits)
-        return quantum.probabilities(self._simulator.state_vector, qubits)
+        return self._simulator.probabilities(list(qubits))
+
+    def reduced_density_matrix(self, *qubits: int) -> ndarray:
+        """ Return the reduced density matrix of some of the qubits.
+        The other qubits are traced out. The matrix has the qubits in the
+        given order, so its diagonal is 'probability_array(*qubits)'.
+            :param qubits: qubits to keep (None => all)
+            :return: density matrix of shape (2**len(qubits), 2**len(qubits))
+        """
+        if not qubits:
+            qubits = range(self._nqubits)
+        return quantum.partial_trace(self._simulator.state_vector, qubits)
+
+    def schmidt_values(self, partition: Iterable[int]) -> ndarray:
+        """ Return the Schmidt values of the state across a bipartition.
+            :param partition: qubits of one party (the rest form the other)
+            :return: Schmidt values in decreasing order
+        """
+        return entanglement.schmidt_values(self._simulator.state_vector, partition)
+
+    def entanglement_entropy(self, partition: Iterable[int] | None = None,
+                             base: float = 2) -> float | ndarray:
+        """ Return the entanglement entropy of the state across a bipartition.
+        If 'partition' is None, return the entropy for each cut between
+        adjacent qubits, where cut k separates qubits [0, k) from [k, n).
+            :param partition: qubits of one party (None => all cuts)
+            :param base: base of logarithm (2 => bits)
+            :return: entropy, or array of n-1 entropies for the cuts
+        """
+        state = self._simulator.state_vector
+        if partition is None:
+            return entanglement.cut_entropies(state, base)
+        return entanglement.entanglement_entropy(state, partition, base)
 
-    def _final_counts(self, qubits: range | list[int], runs: int):
+    def _final_counts(self, qubits: range | list[int], runs: int) -> tuple[ndarray, ndarray]:
         """Return counts of measuring circuit outputs.
         :param qubits: qubits to be measured
         :param runs: number of runs
+        :return: (outcomes, counts) for the outcomes that occurred
         """
         sim = self._simulator
-        names = quantum.basis_names(len(qubits))
-        count = np.zeros(2 ** len(qubits), dtype=int)
+        outcomes = np.empty(runs, dtype=np.int64)
         for run in range(runs):
             sim.execute(self._model)
-            probs = quantum.probabilities(sim.state_vector, qubits)
-            key = np.random.choice(len(probs), None, p=probs)
-            count[key] += 1
-        return dict(zip(names, count.tolist()))
+            probs = sim.probabilities(list(qubits))
+            outcomes[run] = np.random.choice(len(probs), None, p=probs)
+        return np.unique(outcomes, return_counts=True)
 
-    def _measurement_counts(self, qubits: range | list[int], runs) -> dict:
+    def _measurement_counts(self, qubits: range | list[int], runs) -> tuple[ndarray, ndarray]:
         """Return counts for specified qubits.
         :param qubits: qubits to be measured
         :param runs: number of runs
+        :return: (outcomes, counts) for the outcomes that occurred
         """
         nbits = len(qubits)
-        count = dict(zip(quantum.basis_names(nbits), [0] * 2 ** nbits))
+        outcomes = np.empty(runs, dtype=np.int64)
         for run in range(runs):
             self._simulator.execute(self._model)
             r = self._simulator.results()
-            k = 2 ** (nbits - 1)
             n = 0
-            for i, qi in enumerate(qubits):
-                n += k * r.get(qi, 0)
-                k //= 2
-            key = ''.join([i for i in bin(n)[2:].zfill(nbits)])
-            count[key] += 1
-        return count
-
-    def counts(self, *qubits: int, runs: int = 1000, mode: str = 'resample',
-               include_zeros: bool = False) -> dict[str, int]:
-        """ Return measurement counts for repeated experiment.
+            for qi in qubits:
+                n = 2 * n + r.get(qi, 0)
+            outcomes[run] = n
+        return np.unique(outcomes, return_counts=True)
+
+    def counts_array(self, *qubits: int, runs: int = 1000,
+                     mode: str = 'resample') -> tuple[ndarray, ndarray]:
+        """ Return measurement counts for repeated experiment as arrays.
+
+        Each outcome is encoded as an integer, with the first qubit as the
+        most significant bit, so no bitstrings are created.
+        See 'counts' for the modes.
         :param qubits: qubits (None => all)
         :param runs: Number of test runs (default=1000)
         :param mode: 'resample' | 'repeat' | 'measure'
-        :param include_zeros: True to include zero values (default=False)
-        :return: frequencies of outcomes as a dictionary
+        :return: (outcomes, counts) for the outcomes that occurred, in increasing order
         """
         if not qubits:
             qubits = range(self.n_qubits)
 
         match mode:
             case 'resample':
-                dic = quantum.counts_dict(self._simulator.state_vector, list(qubits), runs)
+                return self._simulator.sample_counts(list(qubits), runs)
             case 'repeat':
-                dic = self._final_counts(qubits, runs)
+                return self._final_counts(qubits, runs)
             case 'measure':
-                dic = self._measurement_counts(qubits, runs)
+                return self._measurement_counts(qubits, runs)
             case _:
                 raise ValueError(f'Invalid mode: {mode}')
-        return {k: v for k, v in dic.items() if include_zeros or v > 0}
+
+    def counts_mapping(self, *qubits: int, runs: int = 1000, mode: str = 'resample',
+                       include_zeros: bool = False) -> quantum.BitstringMapping:
+        """ Return measurement counts for repeated experiment as a mapping.
+
+        This behaves like 'counts', but the keys are only created when they
+        are iterated.
+        :param qubits: qubits (None => all)
+        :param runs: Number of test runs (default=1000)
+        :param mode: 'resample' | 'repeat' | 'measure'
+        :param include_zeros: True to include zero values (default=False)
+        :return: mapping of outcome->frequency
+        """
+        nbits = len(qubits) if qubits else self.n_qubits
+        outcomes, freqs = self.counts_array(*qubits, runs=runs, mode=mode)
+        if include_zeros:
+            dense = np.zeros(2 ** nbits, dtype=freqs.dtype)
+            dense[outcomes] = freqs
+            return quantum.BitstringMapping(nbits, dense)
+        return quantum.BitstringMapping(nbits, freqs, outcomes)
+
+    def counts(self, *qubits: int, runs: int = 1000, mode: str = 'resample',
+               include_zeros: bool = False) -> dict[str, int]:
+        """ Return measurement counts for repeated experiment.
+        :param qubits: qubits (None => all)
+        :param runs: Number of test runs (default=1000)
+        :param mode: 'resample' | 'repeat' | 'measure'
+        :param include_zeros: True to include zero values (default=False)
+        :return: frequencies of outcomes as a dictionary
+        """
+        return self.counts_mapping(*qubits, runs=runs, mode=mode,
+                                   include_zeros=include_zeros).to_dict()
 
     # ------------------ Measurement ------------------
 
@@ -366,60 +631,100 @@ class QCircuit(object):
         """
         self._schematic.set_labels(labels, numbers=numbers)
 
-    def draw(self, show: bool = True, save: str | None = None) -> None:
+    def draw(self, show: bool = True, save: str | None = None, start: int = 0,
+             stop: int | None = None, page_width: int | None = None) -> None:
         """Draw the quantum circuit.
+
+        A long circuit can be drawn as a window of its time slots (columns of
+        gates), or as a sequence of pages of 'page_width' slots.
             :param: show: show the quantum circuit
             :param: save: file to save image if required
+            :param: start: first time slot
+            :param: stop: time slot after the last one (None => end of circuit)
+            :param: page_width: number of time slots per page (None => one page)
+        """
+        self._schematic.draw(self._model, show=show, save=save, start=start, stop=stop,
+                             page_width=page_width)
+
+    def to_svg(self) -> str:
+        """Return the schematic of the quantum circuit as SVG.
+            This does not use matplotlib, so it suits headless batch jobs.
+            :return: SVG markup
+        """
+        return render.to_svg(self._schematic, self._model)
+
+    def to_text(self) -> str:
+        """Return the schematic of the quantum circuit as Unicode text.
+            :return: text drawing of the circuit
         """
-        self._schematic.draw(self._model, show=show, save=save)
+        return render.to_text(self._schematic, self._model)
 
     def plot_probabilities(self, *qubits: int, show=True, save: str | None = False,
-                           height: float = 1, ylim: list[float] | None = None) -> None:
+                           height: float = 1, ylim: list[float] | None = None,
+                           style: str = 'bars', k: int = TOP_K, bins: int = BINS) -> None:
         """Plot histogram of probabilities of measurement outcomes.
-        See the 'counts' method for further details.
+        See the 'counts' method for further details.\n
+        For many qubits, the 'top', 'bins' and 'line' styles keep the plot
+        readable and fast.
         :param qubits: qubits (None => all)
         :param show: show the plot
         :param save: file to save image if required
         :param height: Scaling factor for plot height (default=1)
         :param ylim: Y-axis limits [min, max]
+        :param style: 'bars' | 'top' | 'bins' | 'line' (see plotting.plot_bars)
+        :param k: number of bars for 'top' style
+        :param bins: maximum number of bins for 'bins' style
         """
         if not qubits:
             qubits = range(self._nqubits)
-        values = quantum.probabilities(self._simulator.state_vector, qubits)
-        plot_bars(quantum.basis_names(len(qubits)), [values], ylabels=['Probability'],
-                  show=show, save=save, height=height, ylims=[ylim])
+        values = self._simulator.probabilities(list(qubits))
+        plot_bars(len(qubits), [values], ylabels=['Probability'],
+                  show=show, save=save, height=height, ylims=[ylim], style=style, k=k, bins=bins)
 
     def plot_real_imag(self, show=True, save: str | None = False,
-                       height: float = 1, ylim: list[float] | None = None) -> None:
+                       height: float = 1, ylim: list[float] | None = None,
+                       style: str = 'bars', k: int = TOP_K, bins: int = BINS) -> None:
         """Plot state vector real and imaginary parts.
+        The 'bins' style shows the mean of each bin.
         :param show: show the plot
         :param save: file to save image if required
         :param height: Scaling factor for plot height (default=1)
         :param ylim: Y-axis limits [min, max]
+        :param style: 'bars' | 'top' | 'bins' | 'line' (see plotting.plot_bars)
+        :param k: number of bars for 'top' style
+        :param bins: maximum number of bins for 'bins' style
         """
         sv = self._simulator.state_vector
         nq = quantum.n_qubits(sv)
-        plot_bars(quantum.basis_names(nq), [sv.real, sv.imag], ylabels=['Real', 'Imag'],
-                  show=show, save=save, height=height, ylims=[ylim, ylim])
+        plot_bars(nq, [sv.real, sv.imag], ylabels=['Real', 'Imag'],
+                  show=show, save=save, height=height, ylims=[ylim, ylim],
+                  style=style, k=k, bins=bins, agg='mean')
 
     def plot_mag_phase(self, show=True, save: str | None = False,
-                       height: float = 1, ylim: list[float] | None = None) -> None:
+                       height: float = 1, ylim: list[float] | None = None,
+                       style: str = 'bars', k: int = TOP_K, bins: int = BINS) -> None:
         """Plot state vector magnitude and phase.
+        The 'bins' style shows the mean of each bin.
         :param show: show the plot
         :param save: file to save image if required
         :param height: Scaling factor for plot height (default=1)
         :param ylim: Y-axis limits for magnitude [min, max]
+        :param style: 'bars' | 'top' | 'bins' | 'line' (see plotting.plot_bars)
+        :param k: number of bars for 'top' style
+        :param bins: maximum number of bins for 'bins' style
         """
         sv = self._simulator.state_vector
         nq = quantum.n_qubits(sv)
         mag = np.absolute(sv)
         phase = np.atan2(sv.imag, sv.real) / np.pi
-        plot_bars(quantum.basis_names(nq), [mag, phase], ylabels=['Magnitude', f'Phase/{PI}'],
-                  ylims=[ylim, (-1.05, 1.05)], show=show, save=save, height=height)
+        plot_bars(nq, [mag, phase], ylabels=['Magnitude', f'Phase/{PI}'],
+                  ylims=[ylim, (-1.05, 1.05)], show=show, save=save, height=height,
+                  style=style, k=k, bins=bins, agg='mean')
 
     def plot_counts(self, *qubits: int, runs: int = 1000, mode: str = 'resample',
                     show=True, save: str | None = False, height: float = 1,
-                    ylim: list[float] | None = None) -> None:
+                    ylim: list[float] | None = None, style: str = 'bars', k: int = TOP_K,
+                    bins: int = BINS) -> None:
         """Plot histogram of measurement counts.
         See the 'probabilities' method for further details.
         :param qubits: qubits (None => all)
@@ -429,10 +734,13 @@ class QCircuit(object):
         :param save: file to save image if required
         :param height: Scaling factor for plot height (default=1)
         :param ylim: Y-axis limits for magnitude [min, max]
+        :param style: 'bars' | 'top' | 'bins' | 'line' (see plotting.plot_bars)
+        :param k: number of bars for 'top' style
+        :param bins: maximum number of bins for 'bins' style
         """
-        freq = self.counts(*qubits, runs=runs, mode=mode, include_zeros=True)
-        plot_bars(freq.keys(), [list(freq.values())], show=show, save=save,
-                  ylabels=['Counts'], height=height, ylims=[ylim])
+        freq = self.counts_mapping(*qubits, runs=runs, mode=mode, include_zeros=True)
+        plot_bars(len(qubits) if qubits else self._nqubits, [freq.array], show=show, save=save,
+                  ylabels=['Counts'], height=height, ylims=[ylim], style=style, k=k, bins=bins)
 
     def plot_bloch(self, show=True, save: str | None = False, scale: float = 1.0):
         """Draw the state vector on the Bloch sphere for a 1-qubit state.
@@ -445,6 +753,28 @@ class QCircuit(object):
             raise ValueError('Bloch sphere only works for 1-qubit states')
         bloch.plot_bloch(self._simulator.state_vector, show=show, save=save, scale=scale)
 
+    def bloch_vectors(self, *qubits: int) -> ndarray:
+        """Return the Bloch vector of the reduced state of each qubit.
+        The vectors of entangled qubits lie inside the Bloch sphere.
+        :param qubits: qubits (None => all)
+        :return: array of Bloch vectors (x, y, z) of shape (len(qubits), 3)
+        """
+        qubits = list(qubits) if qubits else None
+        return bloch.bloch_vectors(self._simulator.state_vector, qubits)
+
+    def plot_bloch_vectors(self, *qubits: int, ncols: int = 4, show=True,
+                           save: str | None = False, scale: float = 1.0):
+        """Draw the reduced state of each qubit on its own Bloch sphere.
+        :param qubits: qubits (None => all)
+        :param ncols: maximum number of spheres per row
+        :param show: show the plot
+        :param save: file to save image if required
+        :param scale: scaling factor (default=1)
+        """
+        qubits = list(qubits) if qubits else list(range(self._nqubits))
+        bloch.plot_bloch_vectors(self.bloch_vectors(*qubits), labels=[f'q{q}' for q in qubits],
+                                 ncols=ncols, show=show, save=save, scale=scale)
+
     # ------------------ I/O ------------------
 
     def to_qasm(self) -> str:
@@ -454,6 +784,76 @@ class QCircuit(object):
          """
         return qasm.to_qasm(self._model)
 
+    def save(self, path: str | PathLike) -> None:
+        """Save the circuit to a binary file.\n
+        The file is an uncompressed NPZ archive of the gate table, so it can
+        be loaded quickly by memory-mapping (see 'load').
+        :param path: file path
+        """
+        storage.save_model(self._model, path)
+
+    @classmethod
+    def load(cls, path: str | PathLike, backend: str = 'dense') -> 'QCircuit':
+        """Load a circuit saved by 'save'.\n
+        The gate table is memory-mapped rather than read, and the circuit is
+        returned in lazy mode, so it is only executed when the state is used.
+        :param path: file path
+        :param backend: simulator backend: 'dense' or 'sparse'
+        :return: circuit
+        """
+        return cls._from_model(storage.load_model(path), backend)
+
+    def save_state(self, path: str | PathLike) -> None:
+        """Save the quantum state to a binary file.\n
+        The raw amplitudes are saved with the number of qubits, qubit order,
+        dtype and a hash of the circuit model (see 'load_state').
+        :param path: file path
+        """
+        storage.save_state(self._simulator.state_vector, path,
+                           composite.structural_hash(self._model))
+
+    def load_state(self, path: str | PathLike, mmap: bool = True) -> dict:
+        """Replace the quantum state with one saved by 'save_state'.\n
+        With 'mmap', the dense backend uses a read-only memory-mapped view of
+        the file as its state, so a large state is not read into memory
+        until it is used. Gates then create new states, leaving the file
+        unchanged. The state is taken to be the result of all the gates
+        already in the circuit, so none of them are executed afterwards.
+        :param path: file path
+        :param mmap: memory-map the state
+        :return: metadata, including the hash of the model that produced the state
+        """
+        state, meta = storage.load_state(path, mmap)
+        if meta['nqubits'] != self._nqubits:
+            raise ValueError(f'State has {meta['nqubits']} qubits, expected {self._nqubits}')
+        if self._sim is None:
+            self._sim = self._new_simulator()
+        self._sim.state_vector = state
+        self._pending = len(self._model)
+        return meta
+
+    @classmethod
+    def from_qasm(cls, source: str | PathLike | Iterable[str], backend: str = 'dense') -> 'QCircuit':
+        """Create a circuit from OpenQASM 2 or 3.\n
+        The circuit is returned in lazy mode, so it is only executed when the
+        state is used.
+        :param source: path of a file, or iterable of lines
+        :param backend: simulator backend: 'dense' or 'sparse'
+        :return: circuit
+        """
+        return cls._from_model(qasm.from_qasm(source), backend)
+
+    @classmethod
+    def _from_model(cls, model: Model, backend: str) -> 'QCircuit':
+        """Create a lazy circuit from an existing model.
+        :param model: circuit model
+        :param backend: simulator backend: 'dense' or 'sparse'
+        :return: circuit
+        """
+        qc = cls(model.n_qubits, backend=backend, lazy=True)
+        qc._model = model
+        return qc
+
     # ------------------ Wrapper methods for gates ------------------
 
     # In the following, 'c' stands for control and 't' for target.
@@ -554,6 +954,20 @@ class QCircuit(object):
         qs = list(qubits)
         self._add_unitary(name, gates.cu(u), qs, {'controls': 1})
 
+    def composite(self, sub: 'QCircuit', name: str, *qubits) -> None:
+        """Add a composite gate defined by a sub-circuit.
+        The unitary of the sub-circuit is computed once and cached, so the
+        gate is executed as a single operation and drawn as a single box.
+        The sub-circuit must not contain measurements or resets.
+        :param sub: sub-circuit defining the gate
+        :param name: name of gate to appear in symbol
+        :param qubits: list of qubits (one for each qubit of 'sub')
+        """
+        if len(qubits) != sub.n_qubits:
+            raise ValueError(f'Wrong number of qubit indices, expected {sub.n_qubits}')
+        u = composite.composite_unitary(sub._model)
+        self._add_unitary(name, u, list(qubits), {}, check=False)  # Checked by the cache
+
     def cx(self, c: int, t: int) -> None:
         """Add a controlled-X (CX, aka CNOT) gate.
         :param c: control qubit
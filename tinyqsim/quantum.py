@@ -5,6 +5,7 @@ Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
+from collections.abc import Mapping
 from typing import Iterable
 
 import numpy as np
@@ -15,6 +16,7 @@ from numpy.linalg import norm
 from tinyqsim.utils import (is_unitary, normalize)
 
 RANGLE = '\u27E9'  # Unicode right bracket for ket
+CHUNK_BITS = 16  # log2 of the number of amplitudes processed at a time
 
 
 def zeros_state(nqubits: int) -> ndarray:
@@ -78,6 +80,80 @@ def basis_names(nqubits: int, kets: bool = False) -> list[str]:
     return [wrap(bin(i)[2:].zfill(nqubits)) for i in range(2 ** nqubits)]
 
 
+def bitstring(index: int, nbits: int) -> str:
+    """Return an integer-encoded outcome as a binary string.
+        The first qubit is the most significant bit (big-endian).
+        :param index: integer-encoded outcome
+        :param nbits: number of bits
+        :return: binary string
+    """
+    return bin(index)[2:].zfill(nbits)
+
+
+class BitstringMapping(Mapping):
+    """Read-only mapping from binary strings to values, backed by arrays.
+
+    The outcomes are held as integers, so no strings are created until the
+    keys are iterated. A lookup encodes the key as an integer instead.
+    The mapping compares equal to a dict with the same items.
+    """
+
+    def __init__(self, nbits: int, values: ndarray, indices: ndarray | None = None):
+        """Initialize mapping.
+        :param nbits: number of bits in each key
+        :param values: values for the keys
+        :param indices: sorted integer-encoded keys (None => 0...len(values)-1)
+        """
+        self._nbits = nbits
+        self._values = np.asarray(values)
+        self._indices = None if indices is None else np.asarray(indices)
+
+    @property
+    def indices(self) -> ndarray:
+        """Return the integer-encoded keys."""
+        return np.arange(len(self._values)) if self._indices is None else self._indices
+
+    @property
+    def array(self) -> ndarray:
+        """Return the values as an array."""
+        return self._values
+
+    def _position(self, key) -> int:
+        """Return the array position of a key, or raise KeyError.
+        :param key: binary string
+        :return: position
+        """
+        if not isinstance(key, str) or len(key) != self._nbits or key.strip('01'):
+            raise KeyError(key)
+        index = int(key, 2) if key else 0
+        if self._indices is None:
+            if index >= len(self._values):
+                raise KeyError(key)
+            return index
+        pos = int(np.searchsorted(self._indices, index))
+        if pos == len(self._indices) or self._indices[pos] != index:
+            raise KeyError(key)
+        return pos
+
+    def __getitem__(self, key):
+        return self._values[self._position(key)].item()
+
+    def __iter__(self):
+        nbits = self._nbits
+        for i in (range(len(self._values)) if self._indices is None else self._indices.tolist()):
+            yield bitstring(i, nbits)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> dict:
+        """Return the items as a dictionary."""
+        return dict(zip(self, self._values.tolist()))
+
+
 def state_to_tensor(a: ndarray) -> ndarray:
     """Convert state vector to tensor representation.
         :param a: state vector
@@ -214,6 +290,27 @@ def probability_dict(state: ndarray, qubits: Iterable[int] | None = 0) \
     return dict(zip(basis_names(len(qubits)), probs))
 
 
+def sample_counts(probs: ndarray, runs: int) -> tuple[ndarray, ndarray]:
+    """ Sample outcomes from a probability distribution.
+        :param probs: probability of each integer-encoded outcome
+        :param runs: number of samples
+        :return: (outcomes, counts) for the outcomes that occurred, in increasing order
+    """
+    samples = np.random.choice(len(probs), runs, p=probs)
+    return np.unique(samples, return_counts=True)
+
+
+def counts_array(state: ndarray, qubits: list[int], runs: int = 1000) -> tuple[ndarray, ndarray]:
+    """ Return measurement counts for repeated experiment as arrays.
+        The state is not changed (collapsed).
+        :param state: State vector
+        :param qubits: List of qubits
+        :param runs: Number of test runs (default=1000)
+        :return: (outcomes, counts) with integer-encoded outcomes that occurred
+    """
+    return sample_counts(probabilities(state, qubits), runs)
+
+
 def counts_dict(state: ndarray, qubits: list[int], runs: int = 1000) -> dict[str, int]:
     """ Return measurement counts for repeated experiment.
         The state is not changed (collapsed).
@@ -222,14 +319,82 @@ def counts_dict(state: ndarray, qubits: list[int], runs: int = 1000) -> dict[str
         :param runs: Number of test runs (default=1000)
         :return: Dictionary of counts for each state
     """
-    dic = probability_dict(state, qubits)
-    probs = list(dic.values())
-    n = len(probs)
-    freqs = [0] * n
-    for i in range(runs):
-        k = np.random.choice(n, None, p=probs)
-        freqs[k] += 1
-    return dict(zip(dic.keys(), freqs))
+    probs = probabilities(state, qubits)
+    freqs = np.bincount(np.random.choice(len(probs), runs, p=probs), minlength=len(probs))
+    return dict(zip(basis_names(len(qubits)), freqs.tolist()))
+
+
+# ------------------- Reduced states ------------------
+
+def qubit_density_matrices(state: ndarray, qubits: Iterable[int] | None = None) -> ndarray:
+    """ Return the reduced density matrix of each single qubit.
+        All the qubits are handled in one pass over the state, in chunks of
+        2**CHUNK_BITS amplitudes. Qubits whose axis lies within a chunk are
+        contracted in the chunk. For the leading qubits, each chunk pairs up
+        with the chunks that differ from it in one leading bit.
+        :param state: State vector
+        :param qubits: List of qubits (None => all)
+        :return: array of shape (len(qubits), 2, 2)
+    """
+    nq = n_qubits(state)
+    k = min(nq, CHUNK_BITS)  # Qubits within a chunk
+    m = nq - k  # Leading qubits that select a chunk
+    chunks = state.reshape(2 ** m, 2 ** k)
+    rho = np.zeros((nq, 2, 2), dtype=complex)
+    norms = np.empty(2 ** m)
+    for c in range(2 ** m):
+        chunk = chunks[c]
+        cc = chunk.conj()
+        norms[c] = np.vdot(chunk, chunk).real
+        for j in range(k):
+            shape = (2 ** j, 2, 2 ** (k - j - 1))
+            rho[m + j] += np.einsum('iaj,ibj->ab', chunk.reshape(shape), cc.reshape(shape))
+        for h in range(m):
+            bit = 1 << (m - h - 1)
+            if not c & bit:
+                rho[h, 0, 1] += np.vdot(chunks[c | bit], chunk)
+    for h in range(m):
+        p = norms.reshape(2 ** h, 2, -1).sum(axis=(0, 2))
+        rho[h, 0, 0], rho[h, 1, 1] = p
+        rho[h, 1, 0] = rho[h, 0, 1].conjugate()
+    return rho if qubits is None else rho[list(qubits)]
+
+
+def partial_trace(state: ndarray, keep: Iterable[int]) -> ndarray:
+    """ Return the reduced density matrix of a subset of the qubits.
+        The state tensor is contracted with its conjugate over the traced-out
+        axes, so the full density matrix of the state is never formed. Large
+        states are processed in chunks of about 2**CHUNK_BITS amplitudes, by
+        fixing the leading traced-out qubits of each chunk.
+        :param state: State vector
+        :param keep: List of qubits to keep, in the order of the result
+        :return: density matrix of shape (2**len(keep), 2**len(keep))
+    """
+    nq = n_qubits(state)
+    keep = list(keep)
+    assert len(set(keep)) == len(keep), 'duplicate qubits'
+    assert not keep or 0 <= min(keep) <= max(keep) < nq, 'qubit out of range'
+    traced = [q for q in range(nq) if q not in keep]
+    k = len(keep)
+    outer = traced[:max(0, nq - max(CHUNK_BITS, k))]  # Qubits fixed for each chunk
+    inner = [q for q in range(nq) if q not in outer]  # Axes of each chunk
+
+    # Einsum labels: inner axes share labels, except that the kept axes of
+    # the conjugate get new ones.
+    labels = {q: i for i, q in enumerate(inner)}
+    a = [labels[q] for q in inner]
+    b = [len(inner) + keep.index(q) if q in keep else labels[q] for q in inner]
+    out = [labels[q] for q in keep] + [len(inner) + i for i in range(k)]
+
+    t = state_to_tensor(state)
+    rho = np.zeros((2 ** k, 2 ** k), dtype=complex)
+    for c in range(2 ** len(outer)):
+        index = [slice(None)] * nq
+        for i, q in enumerate(outer):
+            index[q] = (c >> (len(outer) - i - 1)) & 1
+        chunk = t[tuple(index)]
+        rho += np.einsum(chunk, a, chunk.conj(), b, out, optimize=True).reshape(2 ** k, 2 ** k)
+    return rho
 
 
 # ------------------- Measurement of qubits states ------------------
@@ -0,0 +1,310 @@
+"""
+Renderers for circuit schematics that do not need matplotlib.
+
+The schematic is laid out on a Canvas by Schematic.layout, using the
+same gate drawing methods as the matplotlib schematic, and the canvas
+is then written out either as SVG markup or as Unicode box-drawing text.
+The time is linear in the number of gates.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+from collections.abc import Iterator
+from io import StringIO
+from math import floor
+from typing import TextIO
+from xml.sax.saxutils import escape
+
+from tinyqsim.schematic import (Canvas, Schematic, LINE_STYLES, G_COLOR, LEFT_MARGIN,
+                                QUBIT_FONT, QUBIT_PITCH, XSTEP, HBW, TOP_MARGIN, BOTTOM_MARGIN)
+
+PT_UNITS = 0.3528  # Display units per point (1/72 inch)
+CHAR_WIDTH = 0.6  # Approximate width of a character (in units of the font size)
+SVG_COLORS = {'w': 'white', 'k': 'black', 'b': 'blue'}
+
+SLOT_COLS = 7  # Text columns per time slot
+QUBIT_ROWS = 4  # Text rows per qubit
+
+# Box-drawing characters for a line through a cell: (left, right, up, down) -> char
+_BOX = {
+    (1, 1, 0, 0): '─', (0, 0, 1, 1): '│', (1, 1, 1, 1): '┼',
+    (0, 1, 0, 1): '┌', (1, 0, 0, 1): '┐', (0, 1, 1, 0): '└', (1, 0, 1, 0): '┘',
+    (1, 0, 1, 1): '┤', (0, 1, 1, 1): '├', (1, 1, 0, 1): '┬', (1, 1, 1, 0): '┴',
+    (1, 0, 0, 0): '─', (0, 1, 0, 0): '─', (0, 0, 1, 0): '│', (0, 0, 0, 1): '│',
+}
+_DIRS = {v: k for k, v in reversed(_BOX.items())}
+DOTTED_H = '┄'
+DOTTED_V = '┊'
+DOT = '●'
+TARGET = '⊕'
+CROSS = '╳'
+METER = '↗'
+
+
+def _svg_color(c: str) -> str:
+    """Return an SVG color for a matplotlib color.
+    :param c: color
+    :return: SVG color
+    """
+    return SVG_COLORS.get(c, c)
+
+
+# -------------------------------- SVG ---------------------------------
+
+def iter_svg(canvas: Canvas, labels: list[str], n_slots: int) -> Iterator[str]:
+    """Generate the SVG markup for a schematic.
+    :param canvas: canvas with the qubit lines and gates
+    :param labels: qubit labels
+    :param n_slots: number of time slots
+    :return: iterator of strings
+    """
+    nqubits = len(labels)
+    font = QUBIT_FONT * PT_UNITS
+    wlabels = max((len(t) for t in labels), default=0) * CHAR_WIDTH * font
+    xmin = -LEFT_MARGIN - wlabels
+    xmax = max(10, n_slots * XSTEP)
+    ymin = -HBW - TOP_MARGIN  # SVG y increases downwards
+    ymax = (nqubits - 1) * QUBIT_PITCH + HBW + BOTTOM_MARGIN
+    w, h = xmax - xmin, ymax - ymin
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{w / 10:.2f}cm" height="{h / 10:.2f}cm" '
+           f'viewBox="{xmin:.2f} {ymin:.2f} {w:.2f} {h:.2f}">\n')
+    yield '<g font-family="sans-serif" text-anchor="middle" dominant-baseline="central">\n'
+
+    # Lines in order of zorder, then shapes, then text (as for matplotlib)
+    for style in sorted(LINE_STYLES, key=lambda k: LINE_STYLES[k][3]):
+        polylines = canvas.lines[style]
+        if not polylines:
+            continue
+        color, width, dotted, _ = LINE_STYLES[style]
+        dash = f' stroke-dasharray="{width * PT_UNITS:.2f}"' if dotted else ''
+        yield (f'<g fill="none" stroke="{_svg_color(color)}" '
+               f'stroke-width="{width * PT_UNITS:.2f}"{dash}>\n')
+        for points in polylines:
+            pts = ' '.join(f'{x:g},{-y:g}' for (x, y) in points)
+            yield f'<polyline points="{pts}"/>\n'
+        yield '</g>\n'
+
+    yield f'<g stroke="{_svg_color(G_COLOR)}" stroke-width="{PT_UNITS:.2f}">\n'
+    for (x, y, w, h, c) in canvas.rects:
+        yield f'<rect x="{x:g}" y="{-y - h:g}" width="{w:g}" height="{h:g}" fill="{_svg_color(c)}"/>\n'
+    for (x, y, r, c) in canvas.circles:
+        yield f'<circle cx="{x:g}" cy="{-y:g}" r="{r:g}" fill="{_svg_color(c)}"/>\n'
+    yield '</g>\n'
+
+    for (x, y, text, color, fontsize) in canvas.texts:
+        yield (f'<text x="{x:g}" y="{-y:g}" fill="{_svg_color(color)}" '
+               f'font-size="{fontsize * PT_UNITS:.2f}">{escape(text)}</text>\n')
+    for q, text in enumerate(labels):
+        yield (f'<text x="{-LEFT_MARGIN:g}" y="{q * QUBIT_PITCH:g}" fill="{_svg_color(G_COLOR)}" '
+               f'font-size="{font:.2f}" text-anchor="end">{escape(text)}</text>\n')
+    yield '</g>\n</svg>\n'
+
+
+# -------------------------------- Text --------------------------------
+
+class TextGrid:
+    """Character grid onto which a canvas is rasterized."""
+
+    def __init__(self, nrows: int, ncols: int, row0: int, col0: int):
+        """Initialize text grid.
+        :param nrows: number of rows
+        :param ncols: number of columns
+        :param row0: row of y = 0
+        :param col0: column of x = 0
+        """
+        self._cells = [[' '] * ncols for _ in range(nrows)]
+        self._fixed = set()  # Cells holding symbols that text must not overwrite
+        self._row0 = row0
+        self._col0 = col0
+
+    def row(self, y: float) -> int:
+        """Return the row for a y coordinate."""
+        return self._row0 + floor(-y * QUBIT_ROWS / QUBIT_PITCH + 0.5)
+
+    def col(self, x: float) -> int:
+        """Return the column for an x coordinate."""
+        return self._col0 + floor(x * SLOT_COLS / XSTEP)
+
+    def put(self, r: int, c: int, ch: str, fixed: bool = False) -> None:
+        """Write a character to a cell, ignoring cells outside the grid.
+        :param r: row
+        :param c: column
+        :param ch: character
+        :param fixed: protect the cell from text
+        """
+        if 0 <= r < len(self._cells) and 0 <= c < len(self._cells[r]):
+            if fixed:
+                self._fixed.add((r, c))
+            elif (r, c) in self._fixed:
+                return
+            self._cells[r][c] = ch
+
+    def join(self, r: int, c: int, dirs: tuple[int, int, int, int]) -> None:
+        """Add line directions (left, right, up, down) to a box-drawing cell.
+        :param r: row
+        :param c: column
+        :param dirs: directions to add
+        """
+        if 0 <= r < len(self._cells) and 0 <= c < len(self._cells[r]):
+            old = _DIRS.get(self._cells[r][c], (0, 0, 0, 0))
+            new = tuple(a | b for a, b in zip(old, dirs))
+            self._cells[r][c] = _BOX.get(new, self._cells[r][c])
+
+    def text(self, r: int, c: int, s: str) -> None:
+        """Write text centered on a cell.
+        :param r: row
+        :param c: column
+        :param s: text
+        """
+        for i, ch in enumerate(s):
+            self.put(r, c - (len(s) - 1) // 2 + i, ch)
+
+    def lines(self) -> list[str]:
+        """Return the grid as lines of text, without trailing blanks."""
+        return [''.join(row).rstrip() for row in self._cells]
+
+
+def _draw_line(grid: TextGrid, points: list[tuple[float, float]], style: str) -> None:
+    """Rasterize a polyline onto a text grid.
+    :param grid: text grid
+    :param points: list of (x, y) points
+    :param style: line style
+    """
+    (x1, y1), (x2, y2) = points[0], points[-1]
+    r1, c1, r2, c2 = grid.row(y1), grid.col(x1), grid.row(y2), grid.col(x2)
+    if style == 'meter':
+        if len(points) == 2:  # Pointer of the meter
+            grid.put(r1, c1, METER, fixed=True)
+    elif style == 'symbol':  # Diagonal strokes of a swap cross
+        grid.put((r1 + r2) // 2, (c1 + c2) // 2, CROSS, fixed=True)
+    elif r1 == r2:
+        lo, hi = sorted((c1, c2))
+        for c in range(lo, hi + 1):
+            if style == 'dotted':
+                grid.put(r1, c, DOTTED_H)
+            else:
+                grid.join(r1, c, (int(c > lo), int(c < hi), 0, 0))
+    else:
+        lo, hi = sorted((r1, r2))
+        for r in range(lo, hi + 1):
+            if style == 'barrier':
+                grid.put(r, c1, DOTTED_V)
+            else:
+                grid.join(r, c1, (0, 0, int(r > lo), int(r < hi)))
+
+
+def text_lines(canvas: Canvas, labels: list[str], n_slots: int) -> list[str]:
+    """Render a schematic as lines of Unicode box-drawing text.
+    :param canvas: canvas with the qubit lines and gates
+    :param labels: qubit labels
+    :param n_slots: number of time slots
+    :return: list of lines
+    """
+    nqubits = len(labels)
+    wlabels = max((len(t) for t in labels), default=0) + 1
+    grid = TextGrid(QUBIT_ROWS * nqubits + 2, wlabels + SLOT_COLS * n_slots + 1, 2, wlabels)
+
+    # Lines under the gates first
+    for style in ('solid', 'barrier'):
+        for points in canvas.lines[style]:
+            _draw_line(grid, points, style)
+
+    boxes = {}  # Column -> rectangles centered on it
+    for (x, y, w, h, _) in canvas.rects:
+        boxes.setdefault(grid.col(x + w / 2), []).append((y, h))
+        r1, r2 = grid.row(y + h), grid.row(y)
+        c1, c2 = grid.col(x), grid.col(x + w)
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                grid.put(r, c, ' ')
+        # Border, joined to any lines entering the box
+        for c in range(c1 + 1, c2):
+            grid.put(r1, c, '─')
+            grid.put(r2, c, '─')
+        for r in range(r1 + 1, r2):
+            grid.put(r, c1, '│')
+            grid.put(r, c2, '│')
+        grid.put(r1, c1, '┌')
+        grid.put(r1, c2, '┐')
+        grid.put(r2, c1, '└')
+        grid.put(r2, c2, '┘')
+        for r in range(r1 + 1, r2):
+            if (r - grid.row(0)) % QUBIT_ROWS == 0:  # Qubit line
+                grid.put(r, c1, '┤')
+                grid.put(r, c2, '├')
+    for points in canvas.lines['solid']:  # Connections to the top and bottom of boxes
+        (x1, y1), (x2, y2) = points[0], points[-1]
+        if x1 == x2:
+            c = grid.col(x1)
+            lo, hi = sorted((grid.row(y1), grid.row(y2)))
+            for (y, h) in boxes.get(c, ()):
+                r1, r2 = grid.row(y + h), grid.row(y)
+                if lo < r1 <= hi:
+                    grid.put(r1, c, '┴')
+                if lo <= r2 < hi:
+                    grid.put(r2, c, '┬')
+
+    for (x, y, r, c) in canvas.circles:
+        grid.put(grid.row(y), grid.col(x), TARGET if c == 'w' else DOT, fixed=True)
+    for style in ('over', 'dotted', 'symbol', 'meter'):
+        for points in canvas.lines[style]:
+            _draw_line(grid, points, style)
+    for (x, y, text, _, _) in canvas.texts:
+        grid.text(grid.row(y), grid.col(x), text)
+
+    lines = grid.lines()
+    for q, label in enumerate(labels):
+        r = grid.row(-q * QUBIT_PITCH)
+        lines[r] = label.rjust(wlabels - 1) + ' ' + lines[r][wlabels:]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+# ----------------------------- Interface ------------------------------
+
+def write_svg(schematic: Schematic, model, stream: TextIO) -> None:
+    """Write the schematic of a circuit model as SVG.
+    :param schematic: schematic
+    :param model: circuit model
+    :param stream: text stream
+    """
+    canvas, n_slots = schematic.layout(model)
+    for s in iter_svg(canvas, schematic.labels, n_slots):
+        stream.write(s)
+
+
+def to_svg(schematic: Schematic, model) -> str:
+    """Return the schematic of a circuit model as SVG.
+    :param schematic: schematic
+    :param model: circuit model
+    :return: SVG markup
+    """
+    f = StringIO()
+    write_svg(schematic, model, f)
+    return f.getvalue()
+
+
+def write_text(schematic: Schematic, model, stream: TextIO) -> None:
+    """Write the schematic of a circuit model as Unicode text.
+    :param schematic: schematic
+    :param model: circuit model
+    :param stream: text stream
+    """
+    canvas, n_slots = schematic.layout(model)
+    for line in text_lines(canvas, schematic.labels, n_slots):
+        stream.write(line + '\n')
+
+
+def to_text(schematic: Schematic, model) -> str:
+    """Return the schematic of a circuit model as Unicode text.
+    :param schematic: schematic
+    :param model: circuit model
+    :return: text
+    """
+    f = StringIO()
+    write_text(schematic, model, f)
+    return f.getvalue()
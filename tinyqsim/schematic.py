@@ -1,13 +1,16 @@
 """ Graphics for QCircuit Schematic.
 
+The circuit is laid out on a Canvas of simple shapes, which is then
+rendered with matplotlib (see also the 'render' module for SVG and text).
+Matplotlib is only imported when a schematic is drawn.
+
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
 
 from pathlib import Path
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Circle, FancyArrow, Arc
+import numpy as np
 
 # Geometry constants
 UNITS_PER_CM = 10  # Base scale (display units per cm)
@@ -28,13 +31,30 @@ G_COLOR = 'b'  # Default gate color
 H_COLOR = '#00A000'  # Hadamard gate color
 BARRIER_COLOR = '#A0A0A0'
 QUBIT_COLOR = 'k'
+UNIT_CIRCLE = np.exp(1j * np.linspace(0, 2 * np.pi, 33)).view(float).reshape(-1, 2)
+METER_ARC = UNIT_CIRCLE[:17:2].tolist()  # Unit semicircle
+
+# Line styles: name -> (color, width, dotted, zorder)
+LINE_STYLES = {
+    'solid': (QUBIT_COLOR, 1, False, 0),  # Qubit lines and connections
+    'over': ('k', 1, False, 1.5),  # Control qubit lines crossing a gate
+    'dotted': ('k', 1, True, 1.5),  # Qubit lines passing through a gate
+    'symbol': (G_COLOR, 1.5, False, 2),  # Swap crosses
+    'meter': (G_COLOR, 1, False, 2),  # Measurement meters
+    'barrier': (BARRIER_COLOR, 3, True, 0),
+}
 
 
 class Scheduler:
-    """Simple time-slot scheduler for placing gates in schematic."""
+    """Simple time-slot scheduler for placing gates in schematic.
+       A gate is placed in the current slot unless the slot already has a
+       gate spanning any of its qubits, in which case it starts a new slot.
+       The slot that last used each qubit line is recorded, so scheduling a
+       gate costs time proportional to the number of qubits it spans.
+    """
 
     def __init__(self):
-        self._slots = []
+        self._last = []  # Last slot using each qubit line
         self._slot = 0
 
     def schedule(self, qubits) -> int:
@@ -44,14 +64,62 @@ class Scheduler:
         """
         lo = min(qubits)
         hi = max(qubits)
-        interval = set(range(lo, hi + 1))
-        if all([interval.isdisjoint(z) for z in self._slots]):
-            self._slots.append(interval)
-            return self._slot
-        else:
-            self._slots = [interval]
+        if hi >= len(self._last):
+            self._last.extend([-1] * (hi + 1 - len(self._last)))
+        if self._slot in self._last[lo:hi + 1]:
             self._slot += 1
-            return self._slot
+        self._last[lo:hi + 1] = [self._slot] * (hi + 1 - lo)
+        return self._slot
+
+
+class Canvas:
+    """Recorder for the graphical primitives of a schematic.
+       Gates are drawn into a canvas as plain tuples, so that the whole
+       schematic can then be rendered in a few batched operations, rather
+       than creating a separate artist for every shape.
+    """
+
+    def __init__(self):
+        self.rects = []  # (x, y, width, height, facecolor) with (x, y) the lower-left corner
+        self.circles = []  # (x, y, radius, facecolor)
+        self.lines = {style: [] for style in LINE_STYLES}  # style -> list of polylines
+        self.texts = []  # (x, y, text, color, fontsize)
+
+    def rect(self, x: float, y: float, w: float, h: float, facecolor='w') -> None:
+        """Add a rectangle.
+           :param x: left edge
+           :param y: bottom edge
+           :param w: width
+           :param h: height
+           :param facecolor: fill color
+        """
+        self.rects.append((x, y, w, h, facecolor))
+
+    def circle(self, x: float, y: float, r: float, facecolor='w') -> None:
+        """Add a circle.
+           :param x: x position of center
+           :param y: y position of center
+           :param r: radius
+           :param facecolor: fill color
+        """
+        self.circles.append((x, y, r, facecolor))
+
+    def line(self, points: list[tuple[float, float]], style: str = 'solid') -> None:
+        """Add a polyline.
+           :param points: list of (x, y) points
+           :param style: line style (see LINE_STYLES)
+        """
+        self.lines[style].append(points)
+
+    def text(self, x: float, y: float, text: str, color=G_COLOR, fontsize: int = FONT_SIZE) -> None:
+        """Add text centered on a point.
+           :param x: x position
+           :param y: y position
+           :param text: text
+           :param color: color
+           :param fontsize: font size
+        """
+        self.texts.append((x, y, text, color, fontsize))
 
 
 class Schematic:
@@ -65,6 +133,10 @@ class Schematic:
         self._qubit_pitch = QUBIT_PITCH
         self._xstep = XSTEP
         self._ax = None
+        self._canvas = None
+        self._layout_model = None  # Model whose gates have been scheduled
+        self._scheduler = None
+        self._slots = np.zeros(0, dtype=np.int64)
         self._labels = None
         self.set_default_labels()
 
@@ -86,20 +158,101 @@ class Schematic:
 
     # ------------------- Draw the quantum circuit ------------------
 
+    def schedule(self, model) -> np.ndarray:
+        """Return the time slot of each gate of a model.
+            The slots are cached, and only gates added since the last call
+            are scheduled, so the layout of a growing circuit is incremental.
+            :param: model: QCircuit model
+            :return: array of slot numbers (non-decreasing)
+        """
+        if model is not self._layout_model or len(model) < len(self._slots):
+            self._layout_model = model
+            self._scheduler = Scheduler()
+            self._slots = np.zeros(0, dtype=np.int64)
+        n = len(self._slots)
+        if len(model) > n:
+            new = [self._scheduler.schedule(qubits) for (_, qubits, _) in model.iter_items(n)]
+            self._slots = np.concatenate([self._slots, np.array(new, dtype=np.int64)])
+        return self._slots
+
+    def n_slots(self, model) -> int:
+        """Return the number of time slots needed to draw a model.
+            :param: model: QCircuit model
+            :return: number of slots
+        """
+        slots = self.schedule(model)
+        return int(slots[-1]) + 1 if len(slots) > 0 else 1
+
+    def layout(self, model, start: int = 0, stop: int | None = None) -> tuple[Canvas, int]:
+        """Lay out a window of time slots of the quantum circuit on a new canvas.
+            The qubit lines and gates are drawn, but not the qubit labels.
+            Every gate occupies a single slot, so the window contains whole gates.
+            Its first slot is drawn at the left edge of the canvas.
+            :param: model: QCircuit model
+            :param: start: first slot
+            :param: stop: slot after the last one (None => end of circuit)
+            :return: (canvas, number of time slots)
+        """
+        slots = self.schedule(model)
+        stop = self.n_slots(model) if stop is None else stop
+        i0, i1 = np.searchsorted(slots, [start, stop]).tolist()
+        self._canvas = Canvas()
+        x0 = self._xstep / 2  # Initial X position for first gate
+        for slot, (name, qubits, params) in zip(slots[i0:i1].tolist(), model.iter_items(i0, i1)):
+            ncontrol = params.get('controls', 0)
+            x = self._xstep * (slot - start) + x0
+            self.draw_gate(name, x, qubits[0:ncontrol], qubits[ncontrol:], params)
+        n_slots = max(1, stop - start)
+        self.draw_qubit_lines(max(10, n_slots * self._xstep))
+        canvas, self._canvas = self._canvas, None
+        return canvas, n_slots
+
+    @property
+    def labels(self) -> list[str]:
+        """Return the qubit labels.
+            :return: list of labels
+        """
+        return self._labels
+
+    def draw(self, model, show: bool = True, save: str = None, start: int = 0,
+             stop: int | None = None, page_width: int | None = None) -> None:
+        """ Draw the quantum circuit, or a window of its time slots.
+            With 'page_width', the window is drawn as a sequence of figures
+            of up to 'page_width' slots each, numbered 'name_1.png' etc. when
+            saved. The layout is cached, so drawing a page of a long circuit
+            only costs time for the gates on that page.
+            :param: model: QCircuit model
+            :param: show: show quantum circuit
+            :param: save: File name to save image (or None)
+            :param: start: first time slot
+            :param: stop: time slot after the last one (None => end of circuit)
+            :param: page_width: number of time slots per page (None => one page)
+        """
+        stop = self.n_slots(model) if stop is None else min(stop, self.n_slots(model))
+        if page_width is None:
+            self.draw_page(model, start, stop, show, save)
+            return
+        if page_width < 1:
+            raise ValueError(f'Invalid page width: {page_width}')
+        for page, p0 in enumerate(range(start, stop, page_width)):
+            fname = save and str(Path(save).with_stem(f'{Path(save).stem}_{page + 1}'))
+            self.draw_page(model, p0, min(p0 + page_width, stop), show, fname)
+
     # This is all in one method so it can run in a single notebook cell.
-    def draw(self, model, show: bool = True, save: str = None) -> None:
-        """ Draw the quantum circuit.
+    def draw_page(self, model, start: int, stop: int, show: bool = True, save: str = None) -> None:
+        """ Draw a window of time slots of the quantum circuit as one figure.
+            The gates are first drawn into a Canvas and then rendered as one
+            collection per style, so the time is roughly linear in the number
+            of gates.
             :param: model: QCircuit model
+            :param: start: first time slot
+            :param: stop: time slot after the last one
             :param: show: show quantum circuit
             :param: save: File name to save image (or None)
         """
+        import matplotlib.pyplot as plt
 
-        # Count  number of time slots needed
-        scheduler = Scheduler()
-        n_slots = 0
-        for (_, qubits, _) in model.items:
-            n_slots = scheduler.schedule(qubits)
-        n_slots += 1
+        canvas, n_slots = self.layout(model, start, stop)
 
         # Calculate drawing parameters
         xlength = max(10, n_slots * self._xstep)  # Length of qubit lines
@@ -118,25 +271,16 @@ class Schematic:
         self._ax.set_xlim((xmin, xmax))
         self._ax.set_ylim((ymin, ymax))
 
-        # Draw the qubit lines and labels
+        # Draw the qubit labels
         wmax = self.draw_qubit_labels(fig)
-        self.draw_qubit_lines(xlength)
 
         # Adjust figure size for labels
         self._ax.set_xlim((-wmax, xmax))
         plot_width *= (1 + wmax / xmax)
         fig.set_size_inches(plot_width, plot_height, forward=True)
 
-        # Draw the gates
-        scheduler = Scheduler()
-        x0 = self._xstep / 2  # Initial X position for first gate
-        for (name, qubits, params) in model.items:
-            slot = scheduler.schedule(qubits)
-            ncontrol = params.get('controls', 0)
-            x = self._xstep * slot + x0
-            cqubits = qubits[0:ncontrol]
-            tqubits = qubits[ncontrol:]
-            self.draw_gate(name, x, cqubits, tqubits, params)
+        # Render the qubit lines and gates
+        self.render(canvas, self._ax)
 
         # Save figure to PNG file
         if save:
@@ -148,11 +292,41 @@ class Schematic:
             plt.show()
         self._ax = None
 
+    @staticmethod
+    def render(canvas: Canvas, ax) -> None:
+        """Render the contents of a canvas on matplotlib axes.
+           :param canvas: canvas
+           :param ax: matplotlib axes
+        """
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        for style, polylines in canvas.lines.items():
+            if polylines:
+                color, width, dotted, zorder = LINE_STYLES[style]
+                ax.add_collection(LineCollection(polylines, colors=color, linewidths=width,
+                                                 linestyles=':' if dotted else '-',
+                                                 zorder=zorder))
+        if canvas.rects:
+            x, y, w, h = np.array([r[:4] for r in canvas.rects], dtype=float).T
+            verts = np.stack([np.stack([x, y], 1), np.stack([x, y + h], 1),
+                              np.stack([x + w, y + h], 1), np.stack([x + w, y], 1)], 1)
+            ax.add_collection(PolyCollection(verts, facecolors=[r[4] for r in canvas.rects],
+                                             edgecolors=G_COLOR, linewidths=1, zorder=1))
+        if canvas.circles:
+            xyr = np.array([c[:3] for c in canvas.circles], dtype=float)
+            verts = xyr[:, None, :2] + xyr[:, None, 2:] * UNIT_CIRCLE
+            ax.add_collection(PolyCollection(verts, facecolors=[c[3] for c in canvas.circles],
+                                             edgecolors=G_COLOR, linewidths=1, zorder=1))
+        for (x, y, text, color, fontsize) in canvas.texts:
+            ax.text(x, y, text, color=color, fontsize=fontsize, ha='center', va='center', zorder=3)
+
     def draw_qubit_labels(self, fig) -> float:
         """Draw labels for qubit lines.
             :param: fig: Figure
             :return: Maximum label width
         """
+        import matplotlib.pyplot as plt
+
         renderer = fig.canvas.get_renderer()
         wmax = 0
         for qubit in range(self._nqubits):
@@ -173,7 +347,7 @@ class Schematic:
         """
         for qubit in range(self._nqubits):
             y = -qubit * self._qubit_pitch
-            _ = self._ax.plot([0, xlength], [y, y], '-', c=QUBIT_COLOR, lw=1, zorder=0)
+            self._canvas.line([(0, y), (xlength, y)])
 
     def draw_gate(self, name: str, x: float, cqubits: list[int], tqubits: list[int], params=None) -> None:
         """Draw a gate.
@@ -264,9 +438,7 @@ class Schematic:
         high_qubit = max(qubits)
         y = -self._qubit_pitch * low_qubit
         dy = (high_qubit - low_qubit) * self._qubit_pitch
-        p = Rectangle((x - w / 2, y + h / 2), w, -dy - h, linewidth=1,
-                      edgecolor=G_COLOR, facecolor=color)
-        self._ax.add_patch(p)
+        self._canvas.rect(x - w / 2, y - h / 2 - dy, w, dy + h, color)
 
         # Draw the control dots
         if len(cqubits) > 0:
@@ -274,20 +446,21 @@ class Schematic:
                 self.draw_dot(x, q, 1.5)
 
         # Draw dotted line for qubits that just pass through
-        for qubit in range(low_qubit, high_qubit + 1):
-            if qubit not in qubits:
-                yn = -self._qubit_pitch * qubit
-                line = '-' if qubit in cqubits else ':'
-                _ = self._ax.plot([x - w / 2, x + w / 2], [yn, yn], line, c='k',
-                                  lw=1, zorder=1)
+        if high_qubit > low_qubit:
+            targets = set(qubits)
+            controls = set(cqubits)
+            for qubit in range(low_qubit, high_qubit + 1):
+                if qubit not in targets:
+                    yn = -self._qubit_pitch * qubit
+                    style = 'over' if qubit in controls else 'dotted'
+                    self._canvas.line([(x - w / 2, yn), (x + w / 2, yn)], style)
 
         # Label connections with argument numbers
         if len(qubits) > 1:
             ncntrl = len(cqubits)
             for i, q in enumerate(qubits):
                 y1 = -self._qubit_pitch * q
-                self._ax.annotate(str(i + ncntrl), (x, y1), color=G_COLOR,
-                                  fontsize=10, ha='center', va='center')
+                self._canvas.text(x, y1, str(i + ncntrl), fontsize=10)
 
         # Add text for name of the gate
         if text:
@@ -296,14 +469,12 @@ class Schematic:
             if len(qubits) > 1:
                 ytext -= self._qubit_pitch * 0.5 - 1
             text_color = G_COLOR if color == 'w' else 'w'
-            self._ax.annotate(text, (x, ytext), color=text_color,
-                              fontsize=font, ha='center', va='center')
+            self._canvas.text(x, ytext, text, text_color, font)
 
         # Add annotation
         if label:
             y = -self._qubit_pitch * high_qubit
-            self._ax.annotate(label, (x, y - 9), color=G_COLOR,
-                              fontsize=TINY_FONT, ha='center', va='center')
+            self._canvas.text(x, y - 9, label, fontsize=TINY_FONT)
 
     # ------------------ Gates with special symbols -----------------
 
@@ -375,10 +546,8 @@ class Schematic:
             y = -self._qubit_pitch * qubit
             self.draw_square(x, qubit)
             # FIXME: Derive constants from w & h
-            p = Arc((x, y - 1), 6, 6, theta1=0, theta2=180, color=G_COLOR)
-            self._ax.add_patch(p)
-            p = FancyArrow(x, y - 1, 2, 3, lw=1, color=G_COLOR, head_width=0)
-            self._ax.add_patch(p)
+            self._canvas.line([(x + 3 * c, y - 1 + 3 * s) for (c, s) in METER_ARC], 'meter')
+            self._canvas.line([(x, y - 1), (x + 2, y + 2)], 'meter')
 
     def draw_barrier(self, x: float, label: str = None) -> None:
         """ Draw barrier.
@@ -391,9 +560,8 @@ class Schematic:
         if label:
             y2 += pitch / 2 - 5
             ylabel = -pitch * (self._nqubits - 1) - 9
-            self._ax.annotate(label, (x, ylabel), color=G_COLOR,
-                              fontsize=TINY_FONT, ha='center', va='center')
-        _ = self._ax.plot([x, x], [y1, y2], ':', c=BARRIER_COLOR, lw=3, zorder=0)
+            self._canvas.text(x, ylabel, label, fontsize=TINY_FONT)
+        self._canvas.line([(x, y1), (x, y2)], 'barrier')
 
     # ------------- Draw basic shapes needed for gates --------------
 
@@ -409,12 +577,10 @@ class Schematic:
         w = BW
         h = BW
         y = -self._qubit_pitch * qubit
-        p = Rectangle((x - w / 2, y - h / 2), w, h, linewidth=1, edgecolor=G_COLOR, facecolor=color)
-        self._ax.add_patch(p)
+        self._canvas.rect(x - w / 2, y - h / 2, w, h, color)
         if text:
             text_color = G_COLOR if color == 'w' else 'w'
-            self._ax.annotate(text, (x, y - 1), color=text_color,
-                              fontsize=fontsize, ha='center', va='center')
+            self._canvas.text(x, y - 1, text, text_color, fontsize)
 
     def draw_circle(self, x: float, qubit: int, r=HBW, text: str = None, color='w',
                     fontsize: int = FONT_SIZE) -> None:
@@ -427,12 +593,10 @@ class Schematic:
             :param: fontsize: fontsize
         """
         y = -self._qubit_pitch * qubit
-        p = Circle((x, y), r, edgecolor=G_COLOR, facecolor='w')
-        self._ax.add_patch(p)
+        self._canvas.circle(x, y, r)
         if text:
             text_color = G_COLOR if color == 'w' else 'w'
-            self._ax.annotate(text, (x, y), color=text_color,
-                              fontsize=fontsize, ha='center', va='center')
+            self._canvas.text(x, y, text, text_color, fontsize)
 
     def draw_dot(self, x: float, qubit: int, r: float, color=G_COLOR) -> None:
         """ Draw dot.
@@ -442,8 +606,7 @@ class Schematic:
             :param: color: fill color
         """
         y = -self._qubit_pitch * qubit
-        p = Circle((x, y), r, edgecolor=G_COLOR, facecolor=color)
-        self._ax.add_patch(p)
+        self._canvas.circle(x, y, r, color)
 
     def draw_cross(self, x: float, qubit: int) -> None:
         """ Draw cross.
@@ -452,10 +615,8 @@ class Schematic:
         """
         y = -self._qubit_pitch * qubit
         r = 2
-        p = FancyArrow(x - r, y - r, 2 * r, 2 * r, lw=1.5, color=G_COLOR, head_width=0)
-        self._ax.add_patch(p)
-        p = FancyArrow(x - r, y + r, 2 * r, -2 * r, lw=1.5, color=G_COLOR, head_width=0)
-        self._ax.add_patch(p)
+        self._canvas.line([(x - r, y - r), (x + r, y + r)], 'symbol')
+        self._canvas.line([(x - r, y + r), (x + r, y - r)], 'symbol')
 
     def draw_vline(self, x: float, q1: int, q2: int) -> None:
         """ Draw vertical line between two qubit lines.
@@ -465,4 +626,4 @@ class Schematic:
         """
         y1 = -self._qubit_pitch * q1
         y2 = -self._qubit_pitch * q2
-        _ = self._ax.plot([x, x], [y1, y2], '-', c='k', lw=1, zorder=0)
+        self._canvas.line([(x, y1), (x, y2)])
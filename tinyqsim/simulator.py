@@ -4,13 +4,20 @@ Simulator for quantum circuit execution.
 Licensed under MIT license: see LICENSE.txt
 Copyright (c) 2024 Jon Brumfitt
 """
+from collections import OrderedDict
+from contextlib import nullcontext
+from hashlib import blake2b
+
 import numpy as np
 from numpy import ndarray
 
 from tinyqsim import quantum, gates
-from tinyqsim.model import Model
-from tinyqsim.quantum import (state_to_tensor, tensor_to_state,
-                              unitary_to_tensor, apply_tensor)
+from tinyqsim.kernels import apply_gate
+from tinyqsim.model import Model, item_bytes
+from tinyqsim.profiler import Profiler
+from tinyqsim.quantum import state_to_tensor, tensor_to_state
+
+CHECKPOINT_BYTES = 2 ** 28  # Default memory budget for checkpoints
 
 
 class Simulator:
@@ -26,9 +33,22 @@ class Simulator:
         self._state = None  # State tensor
         self._results = {}  # Measurement results
         self._gates = gates.GATES
+        self._checkpoints: OrderedDict[bytes, tuple] = OrderedDict()  # Prefix hash -> snapshot
+        self._checkpoint_every = None  # Checkpoint interval in gates (None => barriers only)
+        self._checkpoint_bytes = 0  # Checkpoint memory budget (0 => disabled)
+        self._checkpoint_size = 0  # Memory used by checkpoints
+        self._profiler: Profiler | None = None  # Profiler (None => disabled)
+        if init == 'none':
+            raise ValueError(f'Invalid init state: {init}')
+        self._initialize(init)
 
-        # Initialize state
+    def _initialize(self, init: str) -> None:
+        """Initialize the state.
+        :param init: Initial state - 'zeros' | 'random' | 'none'
+        """
         match init:
+            case 'none':
+                pass
             case 'zeros':
                 self._state = state_to_tensor(quantum.zeros_state(self._nqubits))
             case 'random':
@@ -54,13 +74,37 @@ class Simulator:
         """Return results of quantum measurements."""
         return self._results
 
-    def apply(self, u: ndarray, qubits: list[int]) -> None:
+    def probabilities(self, qubits: list[int]) -> ndarray:
+        """Return the probability of each measurement outcome.
+        :param qubits: qubits to be measured
+        :return: array of probabilities
+        """
+        return quantum.probabilities(self.state_vector, qubits)
+
+    def sample_counts(self, qubits: list[int], runs: int) -> tuple[ndarray, ndarray]:
+        """Sample measurement outcomes without collapsing the state.
+        :param qubits: qubits to be measured
+        :param runs: number of samples
+        :return: (outcomes, counts) for the outcomes that occurred
+        """
+        return quantum.sample_counts(self.probabilities(qubits), runs)
+
+    def apply(self, u: ndarray, qubits: list[int], kind: str | None = None,
+              tensor: ndarray | None = None) -> None:
         """ Apply a unitary matrix to specified qubits of state.
             :param u: unitary matrix
             :param qubits: qubits
+            :param kind: gate structure (None => classify the matrix)
+            :param tensor: tensor form of the matrix (None => reshape it when needed)
         """
-        tu = unitary_to_tensor(u)
-        self._state = apply_tensor(self._state, tu, qubits)
+        self._state = apply_gate(self._state, u, qubits, kind, tensor)
+
+    def apply_info(self, info: gates.GateInfo, qubits: list[int]) -> None:
+        """ Apply a gate from the gate registry to specified qubits of state.
+            :param info: gate information
+            :param qubits: qubits
+        """
+        self.apply(info.matrix, qubits, info.kind, info.tensor)
 
     def measure(self, qubits: list[int]) -> ndarray:
         """ Measure specified qubits."
@@ -79,8 +123,61 @@ class Simulator:
         # Measure qubit and then apply X if it is |1>
         m, self.state_vector = quantum.measure_qubits(self.state_vector, [qubit])
         if m == 1:
-            tu = unitary_to_tensor(self._gates['X'])
-            self._state = apply_tensor(self._state, tu, [qubit])
+            self.apply_info(gates.gate_info('X'), [qubit])
+
+    # ------------------------- Checkpoints -------------------------
+
+    def set_checkpoints(self, every: int | None = None, max_bytes: int = CHECKPOINT_BYTES) -> None:
+        """Enable or disable checkpoints for incremental re-execution.\n
+        When enabled, 'execute' saves copies of the state at barriers and,
+        optionally, every 'every' gates. Each checkpoint is keyed by a rolling
+        hash of the model prefix that produced it, so re-execution of a model
+        with the same prefix resumes from the latest matching checkpoint.
+        The least recently used checkpoints are discarded to stay within the
+        memory budget. Checkpoints are only used for the 'zeros' initial state
+        and up to the first measurement or reset.
+        :param every: also checkpoint every 'every' gates (None => barriers only)
+        :param max_bytes: memory budget in bytes (0 => disable)
+        """
+        self._checkpoint_every = every
+        self._checkpoint_bytes = max_bytes
+        self.clear_checkpoints()
+
+    def clear_checkpoints(self) -> None:
+        """Discard all checkpoints."""
+        self._checkpoints.clear()
+        self._checkpoint_size = 0
+
+    def _snapshot(self) -> tuple:
+        """Return a copy of the state for a checkpoint.
+        :return: snapshot
+        """
+        return self._state.copy(),
+
+    def _restore(self, snapshot: tuple) -> None:
+        """Restore the state from a checkpoint.
+        :param snapshot: snapshot returned by '_snapshot'
+        """
+        self._state = snapshot[0].copy()
+
+    def _save_checkpoint(self, key: bytes) -> None:
+        """Save the state as a checkpoint, within the memory budget.
+        :param key: hash of the model prefix
+        """
+        if key in self._checkpoints:
+            self._checkpoints.move_to_end(key)
+            return
+        snapshot = self._snapshot()
+        size = sum(a.nbytes for a in snapshot if a is not None)
+        if size > self._checkpoint_bytes:
+            return
+        while self._checkpoint_size + size > self._checkpoint_bytes:
+            _, old = self._checkpoints.popitem(last=False)
+            self._checkpoint_size -= sum(a.nbytes for a in old if a is not None)
+        self._checkpoints[key] = snapshot
+        self._checkpoint_size += size
+
+    # -------------------------- Execution --------------------------
 
     def execute(self, model: Model, init='zeros') -> None:
         """Initialize the state and execute the circuit.
@@ -88,36 +185,141 @@ class Simulator:
         :param model: Model to execute
         :param init: Initial state - 'zeros' | 'random' | 'none'
         """
-        match init:
-            case 'none':
+        self._results = {}
+        if init != 'zeros' or self._checkpoint_bytes <= 0:
+            with self._phase('initialize'):
+                self._initialize(init)
+            self.run(model.items)
+            return
+
+        # Rolling hash of each prefix of the model, up to the first measure/reset
+        items = list(model.items)
+        keys = []
+        h = b''
+        for (name, qubits, params) in items:
+            if name in ('measure', 'reset'):
+                break
+            h = blake2b(h + item_bytes(name, qubits, params), digest_size=16).digest()
+            keys.append(h)
+
+        # Resume from the latest matching checkpoint
+        start = 0
+        for i in range(len(keys) - 1, -1, -1):
+            snapshot = self._checkpoints.get(keys[i])
+            if snapshot is not None:
+                self._checkpoints.move_to_end(keys[i])
+                with self._phase('restore'):
+                    self._restore(snapshot)
+                start = i + 1
+                break
+        else:
+            with self._phase('initialize'):
+                self._initialize(init)
+
+        every = self._checkpoint_every
+        step = self._step()
+        for i in range(start, len(keys)):
+            name, qubits, params = items[i]
+            step(name, qubits, params)
+            if name == 'barrier' or (every and (i + 1) % every == 0):
+                with self._phase('checkpoint'):
+                    self._save_checkpoint(keys[i])
+        self.run(items[len(keys):])
+
+    def run(self, items) -> None:
+        """Execute a sequence of model items on the current state.
+        :param items: iterable of (name, qubits, params)
+        """
+        step = self._step()
+        for (name, qubits, params) in items:
+            step(name, qubits, params)
+
+    def _run_item(self, name: str, qubits: list[int], params: dict) -> None:
+        """Execute a single model item on the current state.
+        :param name: name of gate
+        :param qubits: qubits
+        :param params: parameter dictionary
+        """
+        match name:
+            case 'U':  # Custom unitary
+                u = params['unitary']
+                self.apply(u, qubits)
+
+            case 'P' | 'CP' | 'CRX' | 'CRY' | 'CRZ' | 'RX' | 'RY' | 'RZ':  # Parameterized gate
+                self.apply_info(gates.gate_info(name, params['args']), qubits)
+
+            case 'measure':  # Measurement
+                self.measure(qubits)
+
+            case 'reset':  # Reset
+                self.reset(qubits[0])
+
+            case 'barrier':  # Barrier
                 pass
-            case 'zeros':
-                self._state = state_to_tensor(quantum.zeros_state(self._nqubits))
-            case 'random':
-                self._state = state_to_tensor(quantum.random_state(self._nqubits))
-            case _:
-                raise ValueError(f'Invalid init state: {init}')
 
-        self._results = {}
+            case _:  # Simple non-parameterized gate
+                self.apply_info(gates.gate_info(name), qubits)
 
-        for (name, qubits, params) in model.items:
-            match name:
-                case 'U':  # Custom unitary
-                    u = params['unitary']
-                    self.apply(u, qubits)
+    # -------------------------- Profiling --------------------------
 
-                case 'P' | 'CP' | 'CRX' | 'CRY' | 'CRZ' | 'RX' | 'RY' | 'RZ':  # Parameterized gate
-                    u = self._gates[name](params['args'])
-                    self.apply(u, qubits)
+    @property
+    def profiler(self) -> Profiler | None:
+        """Return the profiler, or None if profiling is disabled."""
+        return self._profiler
 
-                case 'measure':  # Measurement
-                    self.measure(qubits)
+    @profiler.setter
+    def profiler(self, profiler: Profiler | None) -> None:
+        """Attach a profiler to record subsequent execution (None => disable).
+        :param profiler: profiler
+        """
+        self._profiler = profiler
 
-                case 'reset':  # Reset
-                    self.reset(qubits[0])
+    def _phase(self, name: str):
+        """Return a context manager that records a phase of execution.
+        :param name: name of phase
+        :return: context manager
+        """
+        return nullcontext() if self._profiler is None else self._profiler.phase(name)
 
-                case 'barrier':  # Barrier
-                    pass
+    def _step(self):
+        """Return the function that executes each model item.
+        The choice is made once per sequence, so execution without a
+        profiler has no extra cost per item.
+        :return: function (name, qubits, params) -> None
+        """
+        return self._run_item if self._profiler is None else self._run_profiled
+
+    def _run_profiled(self, name: str, qubits: list[int], params: dict) -> None:
+        """Execute a single model item, recording it with the profiler.
+        :param name: name of gate
+        :param qubits: qubits
+        :param params: parameter dictionary
+        """
+        kernel, nbytes = self._profile_info(name, qubits, params)
+        with self._profiler.record(name, qubits, kernel, nbytes):
+            self._run_item(name, qubits, params)
 
-                case _:  # Simple non-parameterized gate
-                    self.apply(self._gates[name], qubits)
+    @staticmethod
+    def _item_info(name: str, params: dict) -> gates.GateInfo:
+        """Return the gate information of a unitary model item.
+        :param name: name of gate
+        :param params: parameter dictionary
+        :return: gate information
+        """
+        if name == 'U':
+            return gates.matrix_info(params['unitary'])
+        if name in gates.PARAM_GATES:
+            return gates.gate_info(name, params['args'])
+        return gates.gate_info(name)
+
+    def _profile_info(self, name: str, qubits: list[int], params: dict) -> tuple[str, int]:
+        """Return the kernel that executes a model item and the bytes of state it touches.
+        :param name: name of gate
+        :param qubits: qubits
+        :param params: parameter dictionary
+        :return: (kernel, bytes)
+        """
+        if name in ('measure', 'reset', 'barrier'):
+            return name, 0 if name == 'barrier' else self._state.nbytes
+        info = self._item_info(name, params)
+        return info.kind, self._state.nbytes >> (info.controls if info.kind == 'controlled' else 0)
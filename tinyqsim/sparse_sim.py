@@ -0,0 +1,278 @@
+"""
+Sparse simulator for circuits that keep few nonzero amplitudes.
+
+The state is held as parallel arrays of basis-state indices and complex
+amplitudes. Gates are applied by grouping the indices on the bits of the
+target qubits, so the cost depends on the number of nonzero amplitudes
+rather than on 2^n. When the fill ratio exceeds a threshold, the
+simulator switches to the dense tensor representation.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import numpy as np
+from numpy import ndarray
+
+from tinyqsim.gates import gate_info
+from tinyqsim.quantum import state_to_tensor
+from tinyqsim.simulator import Simulator
+
+MAX_QUBITS = 63  # Limit imposed by 64-bit indices
+DENSE_THRESHOLD = 0.1  # Fill ratio above which the state becomes dense
+SPARSE_TOL = 1e-14  # Amplitudes smaller than this are dropped
+
+
+class SparseSimulator(Simulator):
+    """Simulator holding the state as sparse index/amplitude arrays.
+       It behaves like the dense Simulator, but switches to the dense
+       representation automatically once the state fills up.
+    """
+
+    def __init__(self, nqubits: int, init='zeros', threshold: float = DENSE_THRESHOLD):
+        """Initialize sparse simulator.
+        :param nqubits: Number of qubits
+        :param init: Initial state - 'zeros' or 'random'
+        :param threshold: fill ratio at which to switch to dense
+        """
+        if nqubits > MAX_QUBITS:
+            raise ValueError(f'Sparse simulator supports at most {MAX_QUBITS} qubits')
+        self._indices = None  # Indices of nonzero amplitudes (None => dense)
+        self._values = None  # Nonzero amplitudes
+        self._threshold = threshold
+        super().__init__(nqubits, init)
+
+    def _initialize(self, init: str) -> None:
+        """Initialize the state.
+        :param init: Initial state - 'zeros' | 'random' | 'none'
+        """
+        match init:
+            case 'zeros':
+                self._state = None
+                self._indices = np.zeros(1, dtype=np.int64)
+                self._values = np.ones(1, dtype=complex)
+            case _:  # Random states are dense
+                super()._initialize(init)
+                if init == 'random':
+                    self._indices = None
+
+    def _snapshot(self) -> tuple:
+        """Return a copy of the state for a checkpoint.
+        :return: snapshot
+        """
+        if self.is_dense:
+            return super()._snapshot() + (None, None)
+        return None, self._indices.copy(), self._values.copy()
+
+    def _restore(self, snapshot: tuple) -> None:
+        """Restore the state from a checkpoint.
+        :param snapshot: snapshot returned by '_snapshot'
+        """
+        state, indices, values = snapshot
+        self._state = None if state is None else state.copy()
+        self._indices = None if indices is None else indices.copy()
+        self._values = None if values is None else values.copy()
+
+    # -------------------------- Properties --------------------------
+
+    @property
+    def is_dense(self) -> bool:
+        """Return True if the state has switched to dense representation."""
+        return self._indices is None
+
+    @property
+    def state_vector(self) -> ndarray:
+        """Return quantum state as a (dense) vector.
+        :return: quantum state vector
+        """
+        if self.is_dense:
+            return super().state_vector
+        state = np.zeros(2 ** self._nqubits, dtype=complex)
+        state[self._indices] = self._values
+        return state
+
+    @state_vector.setter
+    def state_vector(self, state: ndarray) -> None:
+        """Setter for state vector.
+        :param state: State vector
+        """
+        indices = np.flatnonzero(state)
+        self._indices = indices.astype(np.int64)
+        self._values = np.asarray(state)[indices].astype(complex)
+        self._state = None
+        self._check_fill()
+
+    def sparse_state(self) -> tuple[ndarray, ndarray]:
+        """Return the nonzero amplitudes and their indices, in index order.
+        :return: (indices, amplitudes)
+        """
+        if self.is_dense:
+            sv = super().state_vector
+            indices = np.flatnonzero(sv)
+            return indices, sv[indices]
+        order = np.argsort(self._indices)
+        return self._indices[order], self._values[order]
+
+    # ------------------------ Bit manipulation ------------------------
+
+    def _shifts(self, qubits: list[int]) -> ndarray:
+        """Return the bit positions of big-endian qubits in an index.
+        :param qubits: distinct qubit indices
+        :return: bit positions
+        """
+        qs = np.asarray(qubits, dtype=np.int64)
+        if np.any(qs < 0) or np.any(qs >= self._nqubits):
+            raise ValueError(f'Qubit indices out of range: {list(qubits)}')
+        if len(np.unique(qs)) != len(qs):
+            raise ValueError(f'Repeated qubit indices: {list(qubits)}')
+        return self._nqubits - 1 - qs
+
+    def _local_index(self, shifts: ndarray) -> ndarray:
+        """Return the bits of each index on the given positions as an integer.
+        :param shifts: bit positions, most significant first
+        :return: local index in range(2 ** len(shifts))
+        """
+        k = len(shifts)
+        local = np.zeros(len(self._indices), dtype=np.int64)
+        for i, s in enumerate(shifts):
+            local |= ((self._indices >> s) & 1) << (k - 1 - i)
+        return local
+
+    @staticmethod
+    def _offsets(shifts: ndarray) -> ndarray:
+        """Return the index bits corresponding to each local index.
+        :param shifts: bit positions, most significant first
+        :return: array of offsets of length 2 ** len(shifts)
+        """
+        k = len(shifts)
+        local = np.arange(2 ** k, dtype=np.int64)
+        offsets = np.zeros(2 ** k, dtype=np.int64)
+        for i, s in enumerate(shifts):
+            offsets |= ((local >> (k - 1 - i)) & 1) << s
+        return offsets
+
+    # --------------------------- Operations ---------------------------
+
+    def _check_fill(self) -> None:
+        """Switch to the dense representation if the state has filled up."""
+        if len(self._indices) > self._threshold * 2 ** self._nqubits:
+            state = self.state_vector
+            self._indices = None
+            self._values = None
+            self._state = state_to_tensor(state)
+
+    def apply(self, u: ndarray, qubits: list[int], kind: str | None = None,
+              tensor: ndarray | None = None) -> None:
+        """ Apply a unitary matrix to specified qubits of state.
+            :param u: unitary matrix
+            :param qubits: qubits
+            :param kind: gate structure (None => classify the matrix)
+            :param tensor: tensor form of the matrix (None => reshape it when needed)
+        """
+        if self.is_dense:
+            super().apply(u, qubits, kind, tensor)
+            return
+
+        shifts = self._shifts(qubits)
+        mask = int(np.bitwise_or.reduce(np.int64(1) << shifts))
+        local = self._local_index(shifts)
+        base = self._indices & ~mask
+        offsets = self._offsets(shifts)
+
+        u = np.asarray(u)
+        nonzero = u != 0
+        if (kind in ('diagonal', 'permutation') if kind
+                else np.all(np.count_nonzero(nonzero, axis=0) == 1)):
+            # Permutation with phases: each index maps to exactly one index
+            rows = np.argmax(nonzero, axis=0)[local]
+            self._indices = base | offsets[rows]
+            self._values = self._values * u[rows, local]
+        else:
+            # Group amplitudes that differ only in the target bits
+            bases, inverse = np.unique(base, return_inverse=True)
+            block = np.zeros((len(bases), len(u)), dtype=complex)
+            block[inverse, local] = self._values
+            values = (block @ np.transpose(u)).ravel()
+            indices = (bases[:, None] | offsets[None, :]).ravel()
+            keep = np.abs(values) > SPARSE_TOL
+            self._indices = indices[keep]
+            self._values = values[keep]
+            self._check_fill()
+
+    def _profile_info(self, name: str, qubits: list[int], params: dict) -> tuple[str, int]:
+        """Return the kernel that executes a model item and the bytes of state it touches.
+        :param name: name of gate
+        :param qubits: qubits
+        :param params: parameter dictionary
+        :return: (kernel, bytes)
+        """
+        if self.is_dense:
+            return super()._profile_info(name, qubits, params)
+        nbytes = self._indices.nbytes + self._values.nbytes
+        if name in ('measure', 'reset', 'barrier'):
+            return name, 0 if name == 'barrier' else nbytes
+        kind = self._item_info(name, params).kind
+        return 'sparse-' + ('permutation' if kind in ('diagonal', 'permutation') else 'general'), nbytes
+
+    def probabilities(self, qubits: list[int]) -> ndarray:
+        """Return the probability of each measurement outcome.
+        :param qubits: qubits to be measured
+        :return: array of probabilities
+        """
+        if self.is_dense:
+            return super().probabilities(qubits)
+        local = self._local_index(self._shifts(qubits))
+        probs = np.bincount(local, weights=np.abs(self._values) ** 2,
+                            minlength=2 ** len(qubits))
+        return probs / np.sum(probs)
+
+    def sample_counts(self, qubits: list[int], runs: int) -> tuple[ndarray, ndarray]:
+        """Sample measurement outcomes without collapsing the state.
+        Samples are drawn from the nonzero amplitudes, so the cost does not
+        depend on the number of possible outcomes.
+        :param qubits: qubits to be measured
+        :param runs: number of samples
+        :return: (outcomes, counts) for the outcomes that occurred
+        """
+        if self.is_dense:
+            return super().sample_counts(qubits, runs)
+        local = self._local_index(self._shifts(qubits))
+        probs = np.abs(self._values) ** 2
+        samples = np.random.choice(len(probs), runs, p=probs / np.sum(probs))
+        return np.unique(local[samples], return_counts=True)
+
+    def _measure_qubit(self, qubit: int) -> int:
+        """Measure a single qubit with collapse.
+        :param qubit: qubit to be measured
+        :return: measured value
+        """
+        probs = self.probabilities([qubit])
+        measured = int(np.random.choice([0, 1], None, p=probs))
+        keep = ((self._indices >> self._shifts([qubit])[0]) & 1) == measured
+        self._indices = self._indices[keep]
+        values = self._values[keep]
+        self._values = values / np.linalg.norm(values)
+        return measured
+
+    def measure(self, qubits: list[int]) -> ndarray:
+        """ Measure specified qubits."
+            :param qubits: qubits to be measured
+            :return: measured values
+        """
+        if self.is_dense:
+            return super().measure(qubits)
+        m = np.array([self._measure_qubit(q) for q in qubits], dtype=int)
+        for i, q in enumerate(qubits):
+            self._results[q] = m[i].item()
+        return m
+
+    def reset(self, qubit: int) -> None:
+        """ Reset specified qubit."
+            :param qubit: qubit to be reset
+        """
+        if self.is_dense:
+            super().reset(qubit)
+            return
+        if self._measure_qubit(qubit) == 1:
+            self.apply_info(gate_info('X'), [qubit])
+
@@ -0,0 +1,137 @@
+"""
+Binary storage of circuits and states.
+
+Data is stored as an uncompressed NPZ file, i.e. a zip archive of '.npy'
+arrays plus a JSON metadata member. Because the members are stored
+uncompressed, loading can memory-map each array directly from the file,
+so even very large files load in milliseconds and the pages are shared
+between processes that open the same file.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import json
+import struct
+import zipfile
+from os import PathLike
+
+import numpy as np
+from numpy import ndarray
+
+from tinyqsim.model import Model
+
+META = '__meta__'  # Name of the metadata member
+FORMAT_VERSION = 1
+
+
+def save_arrays(path: str | PathLike, arrays: dict[str, ndarray], meta: dict) -> None:
+    """Save arrays and metadata to an uncompressed NPZ file.
+    :param path: file path
+    :param arrays: dictionary of name -> array
+    :param meta: JSON-serializable metadata
+    """
+    meta = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays, **{META: meta})
+
+
+def _member_offset(f, info: zipfile.ZipInfo) -> int:
+    """Return the offset of the data of a stored zip member.
+    :param f: binary file
+    :param info: zip member information
+    :return: file offset
+    """
+    f.seek(info.header_offset)
+    header = f.read(30)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def load_arrays(path: str | PathLike, mmap: bool = True) -> tuple[dict[str, ndarray], dict]:
+    """Load arrays and metadata from an NPZ file.
+    Uncompressed members are memory-mapped read-only if 'mmap' is True.
+    :param path: file path
+    :param mmap: memory-map the arrays
+    :return: (dictionary of name -> array, metadata)
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as z, open(path, 'rb') as f:
+        for info in z.infolist():
+            name = info.filename.removesuffix('.npy')
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                f.seek(_member_offset(f, info))
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+                if not dtype.hasobject and np.prod(shape) > 0:
+                    arrays[name] = np.memmap(f, dtype=dtype, mode='r', offset=f.tell(),
+                                             shape=shape, order='F' if fortran else 'C')
+                    continue
+            with z.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+    meta = json.loads(arrays.pop(META).tobytes().decode())
+    return arrays, meta
+
+
+def save_model(model: Model, path: str | PathLike) -> None:
+    """Save a circuit model to a binary file.
+    :param model: circuit model
+    :param path: file path
+    """
+    arrays, meta = model.to_arrays()
+    meta |= {'format': 'tinyqsim-circuit', 'version': FORMAT_VERSION}
+    save_arrays(path, arrays, meta)
+
+
+def load_model(path: str | PathLike, mmap: bool = True) -> Model:
+    """Load a circuit model from a binary file.
+    :param path: file path
+    :param mmap: memory-map the arrays
+    :return: circuit model
+    """
+    arrays, meta = load_arrays(path, mmap)
+    if meta.get('format') != 'tinyqsim-circuit':
+        raise ValueError(f'Not a circuit file: {path}')
+    if meta.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f'Unsupported file version: {meta['version']}')
+    return Model.from_arrays(arrays, meta)
+
+
+def save_state(state: ndarray, path: str | PathLike, model_hash: str | None = None) -> None:
+    """Save a state vector to a binary file.
+    The amplitudes are written as a raw array, together with the number
+    of qubits, qubit order, dtype and (optionally) a hash of the model
+    that produced the state.
+    :param state: state vector
+    :param path: file path
+    :param model_hash: hash of the circuit model
+    """
+    state = np.asarray(state).reshape(-1)
+    nqubits = len(state).bit_length() - 1
+    if len(state) != 2 ** nqubits:
+        raise ValueError(f'State vector length is not a power of 2: {len(state)}')
+    meta = {'format': 'tinyqsim-state', 'version': FORMAT_VERSION, 'nqubits': nqubits,
+            'qubit_order': 'big-endian', 'dtype': state.dtype.str, 'model_hash': model_hash}
+    save_arrays(path, {'state': state}, meta)
+
+
+def load_state(path: str | PathLike, mmap: bool = True) -> tuple[ndarray, dict]:
+    """Load a state vector from a binary file.
+    If 'mmap' is True, the state is a read-only memory-mapped view of the
+    file, so only the pages that are used are read.
+    :param path: file path
+    :param mmap: memory-map the state
+    :return: (state vector, metadata)
+    """
+    arrays, meta = load_arrays(path, mmap)
+    if meta.get('format') != 'tinyqsim-state':
+        raise ValueError(f'Not a state file: {path}')
+    if meta.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f'Unsupported file version: {meta['version']}')
+    state = arrays['state']
+    if len(state) != 2 ** meta['nqubits']:
+        raise ValueError(f'State vector should have length {2 ** meta['nqubits']}')
+    return state, meta
@@ -0,0 +1,269 @@
+"""
+Amplitudes of basis states by tensor-network contraction.
+
+The circuit is converted into a network of gate tensors, capped by |0>
+vectors on the inputs and by basis vectors <x| on the outputs. Contracting
+the network gives the amplitude <x|C|0...0> without ever creating the state
+vector, so it works for circuits with too many qubits to simulate, provided
+they are shallow enough for the intermediate tensors to stay small.
+
+Licensed under MIT license: see LICENSE.txt
+Copyright (c) 2024 Jon Brumfitt
+"""
+
+import heapq
+from itertools import count
+from numbers import Integral
+
+import numpy as np
+from numpy import ndarray
+
+from tinyqsim.gates import gate_info, matrix_info
+from tinyqsim.model import Model
+
+MAX_RANK = 30  # Maximum rank of an intermediate tensor
+MAX_OPTIMAL = 10  # Maximum number of tensors for 'optimal' path finder
+
+KET0 = np.array([1, 0], dtype=complex)
+KET1 = np.array([0, 1], dtype=complex)
+
+
+class TensorNetwork:
+    """ Closed tensor network for the amplitude <x|C|0...0> of a circuit.
+        The network structure does not depend on 'x', so a contraction path
+        can be found once and reused for several bitstrings.
+    """
+
+    def __init__(self, model: Model):
+        """Build the tensor network for a circuit model.
+        :param model: circuit model
+        """
+        nq = model.n_qubits
+        labels = count()
+        wires = [next(labels) for _ in range(nq)]  # Current label of each qubit wire
+        self._tensors: list[ndarray] = [KET0] * nq
+        self._indices: list[list[int]] = [[w] for w in wires]
+
+        for (name, qubits, params) in model.items:
+            match name:
+                case 'U':  # Custom unitary
+                    info = matrix_info(params['unitary'])
+                case 'P' | 'CP' | 'RX' | 'RY' | 'RZ' | 'CRX' | 'CRY' | 'CRZ':  # Param gate
+                    info = gate_info(name, params['args'])
+                case 'measure' | 'reset':
+                    raise ValueError('Circuit is not unitary')
+                case 'barrier':
+                    continue
+                case _:  # Simple non-parameterized gate
+                    info = gate_info(name)
+
+            outputs = [next(labels) for _ in qubits]
+            self._tensors.append(info.tensor)
+            self._indices.append(outputs + [wires[q] for q in qubits])
+            for q, w in zip(qubits, outputs):
+                wires[q] = w
+
+        self._outputs = wires  # Output label of each qubit wire
+        self._nqubits = nq
+
+    @property
+    def n_tensors(self) -> int:
+        """Return the number of tensors including the output caps."""
+        return len(self._tensors) + self._nqubits
+
+    def _network(self, bits: list[int]) -> tuple[list[ndarray], list[list[int]]]:
+        """Return the tensors and indices of the network capped by basis state 'bits'.
+        :param bits: output bit values for each qubit
+        :return: (tensors, indices)
+        """
+        caps = [KET1 if b else KET0 for b in bits]
+        return self._tensors + caps, self._indices + [[w] for w in self._outputs]
+
+    def path(self, method: str = 'greedy') -> list[tuple[int, int]]:
+        """Return a pairwise contraction path.
+        The path is in the format used by numpy.einsum_path: each pair of
+        positions is removed from the list and the result appended to it.
+        :param method: 'greedy' | 'optimal'
+        :return: list of pairs of tensor positions
+        """
+        _, indices = self._network([0] * self._nqubits)
+        match method:
+            case 'greedy':
+                return greedy_path(indices)
+            case 'optimal':
+                return optimal_path(indices)
+            case _:
+                raise ValueError(f'Invalid path method: {method}')
+
+    def amplitude(self, bits: list[int], path: list[tuple[int, int]]) -> complex:
+        """Contract the network for one output basis state.
+        :param bits: output bit values for each qubit
+        :param path: contraction path
+        :return: amplitude <bits|C|0...0>
+        """
+        tensors, indices = self._network(bits)
+        return complex(contract(tensors, indices, path))
+
+
+# ------------------------ Contraction paths ------------------------
+
+def _pair_labels(ia: list[int], ib: list[int]) -> list[int]:
+    """Return the labels left open after contracting two tensors.
+    Every label of a closed network appears in exactly two tensors, so
+    the shared labels are summed and the rest remain.
+    """
+    shared = set(ia) & set(ib)
+    return [i for i in ia if i not in shared] + [i for i in ib if i not in shared]
+
+
+def greedy_path(indices: list[list[int]]) -> list[tuple[int, int]]:
+    """Find a contraction path by greedily contracting connected pairs.
+    At each step, the pair of tensors sharing an index whose contraction
+    reduces the total size the most is contracted first.
+    :param indices: index labels of each tensor
+    :return: contraction path in numpy.einsum_path format
+    """
+    live = {i: list(ix) for i, ix in enumerate(indices)}
+    owners: dict[int, set[int]] = {}  # Label -> tensors having it
+    for i, ix in live.items():
+        for label in ix:
+            owners.setdefault(label, set()).add(i)
+
+    def cost(a, b):
+        result = len(_pair_labels(live[a], live[b]))
+        return 2 ** result - 2 ** len(live[a]) - 2 ** len(live[b])
+
+    heap = []
+
+    def push_neighbours(a):
+        for label in live[a]:
+            for b in owners[label]:
+                if b != a:
+                    heapq.heappush(heap, (cost(a, b), min(a, b), max(a, b)))
+
+    for i in list(live):
+        push_neighbours(i)
+
+    # Contract in terms of tensor ids, then convert to einsum_path positions
+    steps = []
+    next_id = len(indices)
+    while heap:
+        _, a, b = heapq.heappop(heap)
+        if a not in live or b not in live:
+            continue  # Stale entry
+        ia, ib = live.pop(a), live.pop(b)
+        labels = _pair_labels(ia, ib)
+        for label in ia + ib:
+            owners[label].discard(a)
+            owners[label].discard(b)
+        for label in labels:
+            owners[label].add(next_id)
+        live[next_id] = labels
+        steps.append((a, b))
+        push_neighbours(next_id)
+        next_id += 1
+
+    # Multiply any disconnected scalars together
+    rest = sorted(live)
+    while len(rest) > 1:
+        a, b = rest.pop(0), rest.pop(0)
+        steps.append((a, b))
+        rest.append(next_id)
+        next_id += 1
+
+    return _ids_to_positions(len(indices), steps)
+
+
+def optimal_path(indices: list[list[int]]) -> list[tuple[int, int]]:
+    """Find an optimal contraction path using numpy.einsum_path.
+    The search time grows factorially with the number of tensors, so this
+    is only practical for very small networks.
+    :param indices: index labels of each tensor
+    :return: contraction path in numpy.einsum_path format
+    """
+    if len(indices) > MAX_OPTIMAL:
+        raise ValueError(f'Too many tensors for optimal path: {len(indices)}')
+    labels = sorted({i for ix in indices for i in ix})
+    relabel = {k: i for i, k in enumerate(labels)}
+    operands = []
+    for ix in indices:
+        operands += [np.empty([2] * len(ix)), [relabel[i] for i in ix]]
+    path, _ = np.einsum_path(*operands, [], optimize='optimal')
+    return [tuple(p) for p in path[1:]]
+
+
+def _ids_to_positions(n: int, steps: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Convert pairs of tensor ids into einsum_path list positions.
+    :param n: number of tensors in the network
+    :param steps: pairs of tensor ids (new ids are numbered from n)
+    :return: path in numpy.einsum_path format
+    """
+    order = list(range(n))
+    path = []
+    next_id = n
+    for a, b in steps:
+        pa, pb = order.index(a), order.index(b)
+        path.append((pa, pb))
+        for p in sorted((pa, pb), reverse=True):
+            del order[p]
+        order.append(next_id)
+        next_id += 1
+    return path
+
+
+# --------------------------- Contraction ---------------------------
+
+def contract(tensors: list[ndarray], indices: list[list[int]],
+             path: list[tuple[int, int]]) -> ndarray:
+    """Contract a closed tensor network pairwise along a path.
+    :param tensors: list of tensors
+    :param indices: index labels of each tensor
+    :param path: contraction path in numpy.einsum_path format
+    :return: result of the contraction
+    """
+    tensors = list(tensors)
+    indices = [list(ix) for ix in indices]
+    for pa, pb in path:
+        ia, ib = indices[pa], indices[pb]
+        labels = _pair_labels(ia, ib)
+        if len(labels) > MAX_RANK:
+            raise ValueError(f'Intermediate tensor too large: rank {len(labels)}')
+        relabel = {k: i for i, k in enumerate(dict.fromkeys(ia + ib))}
+        t = np.einsum(tensors[pa], [relabel[i] for i in ia],
+                      tensors[pb], [relabel[i] for i in ib],
+                      [relabel[i] for i in labels])
+        for p in sorted((pa, pb), reverse=True):
+            del tensors[p]
+            del indices[p]
+        tensors.append(t)
+        indices.append(labels)
+    return tensors[0]
+
+
+def to_bits(bitstring: str | int, nqubits: int) -> list[int]:
+    """Convert a bitstring or integer basis index into a list of bits.
+    :param bitstring: binary string (big-endian) or integer index
+    :param nqubits: number of qubits
+    :return: list of bits
+    """
+    if isinstance(bitstring, str):
+        if len(bitstring) != nqubits or set(bitstring) - {'0', '1'}:
+            raise ValueError(f'Invalid bitstring: {bitstring}')
+        return [int(c) for c in bitstring]
+    if not 0 <= bitstring < 2 ** nqubits:
+        raise ValueError(f'Basis index out of range: {bitstring}')
+    return [(bitstring >> (nqubits - 1 - q)) & 1 for q in range(nqubits)]
+
+
+def amplitudes(model: Model, bitstrings: list[str | int], method: str = 'greedy') -> ndarray:
+    """Return the amplitudes <x|C|0...0> of a circuit for a list of basis states.
+    :param model: circuit model (without measurements or resets)
+    :param bitstrings: basis states as binary strings or integer indices
+    :param method: contraction path finder: 'greedy' | 'optimal'
+    :return: array of amplitudes
+    """
+    net = TensorNetwork(model)
+    path = net.path(method)
+    nq = model.n_qubits
+    return np.array([net.amplitude(to_bits(x, nq), path) for x in bitstrings],
+                    dtype=complex)
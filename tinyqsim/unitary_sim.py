@@ -8,9 +8,11 @@ Copyright (c) 2024 Jon Brumfitt
 import numpy as np
 from numpy import ndarray
 
-from tinyqsim.gates import GATES
+from tinyqsim.gates import GateInfo, gate_info, matrix_info
+from tinyqsim.kernels import apply_gate
 from tinyqsim.model import Model
-from tinyqsim.quantum import unitary_to_tensor, tensor_to_unitary, compose_tensor
+
+CHUNK_BYTES = 2 ** 26  # Size of the working block of columns (bytes)
 
 
 class UnitarySimulator:
@@ -18,33 +20,55 @@ class UnitarySimulator:
         The circuit must not contain measurements or resets.
     """
 
-    def execute(self, model: Model) -> ndarray:
-        """Create unitary matrix from a circuit model.
-        :param model: circuit model
-        :return: unitary matrix
+    def __init__(self, chunk_bytes: int = CHUNK_BYTES):
+        """Initialize unitary simulator.
+        :param chunk_bytes: memory for each block of columns (bytes)
         """
-        nq = model.n_qubits
-        gates = GATES
-        unitary = unitary_to_tensor(np.eye(2 ** nq))
+        self._chunk_bytes = chunk_bytes
 
-        # For each gate, create a tensor that applies the gate to the
-        # specified qubits, then use this to update the circuit unitary.
+    @staticmethod
+    def _operations(model: Model) -> list[tuple[GateInfo, list[int]]]:
+        """Return the gates of a model as (gate information, qubits) pairs.
+        :param model: circuit model
+        :return: list of operations
+        """
+        ops = []
         for (name, qubits, params) in model.items:
-            ug = None
             match name:
                 case 'U':  # Custom unitary
-                    ug = params['unitary']
+                    info = matrix_info(params['unitary'])
                 case 'P' | 'CP' | 'RX' | 'RY' | 'RZ' | 'CRX' | 'CRY' | 'CRZ':  # Param gate
-                    ug = gates[name](params['args'])
+                    info = gate_info(name, params['args'])
                 case 'measure' | 'reset':
                     raise ValueError('Circuit is not unitary')
                 case 'barrier':
-                    pass
+                    continue
                 case _:  # Simple non-parameterized gate
-                    ug = gates[name]
+                    info = gate_info(name)
+            ops.append((info, qubits))
+        return ops
 
-            if ug is not None:
-                tgate = unitary_to_tensor(ug)
-                unitary = compose_tensor(unitary, tgate, qubits)
+    def execute(self, model: Model) -> ndarray:
+        """Create unitary matrix from a circuit model.
+        Each column of the unitary is the circuit applied to a basis state,
+        so blocks of columns of the identity are evolved as a batch of states
+        using the state-vector kernels. The block size bounds the working
+        memory and each block is written directly into the result.
+        :param model: circuit model
+        :return: unitary matrix
+        """
+        nq = model.n_qubits
+        dim = 2 ** nq
+        ops = self._operations(model)
+        chunk = max(1, min(dim, self._chunk_bytes // (16 * dim)))
 
-        return tensor_to_unitary(unitary).T
+        unitary = np.empty((dim, dim), dtype=complex)
+        for c0 in range(0, dim, chunk):
+            width = min(chunk, dim - c0)
+            block = np.zeros((dim, width), dtype=complex)
+            block[np.arange(c0, c0 + width), np.arange(width)] = 1
+            ts = block.reshape([2] * nq + [width])
+            for info, qubits in ops:
+                ts = apply_gate(ts, info.matrix, qubits, info.kind, info.tensor)
+            unitary[:, c0:c0 + width] = ts.reshape(dim, width)
+        return unitary